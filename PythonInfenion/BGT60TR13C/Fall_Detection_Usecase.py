@@ -3,59 +3,12 @@ from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWid
 from PyQt5.QtCore import QTimer, Qt, QUrl
 from PyQt5.QtGui import QColor, QFont, QPixmap
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
-import numpy as np
-from scipy import signal
-from scipy.ndimage import convolve
 from ifxradarsdk.fmcw import DeviceFmcw
 from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwSequenceChirp
-from helpers.fft_spectrum import fft_spectrum 
+from helpers.FallDetectionAlgo import FallDetectionAlgo
 from radar_data_acquisition import initialize_radar, get_radar_data
 
 
-class FallDetectionAlgo:
-    def __init__(self, num_samples_per_chirp, num_chirps_per_frame, chirp_repetition_time_s, start_frequency_Hz):
-        self.num_samples_per_chirp = num_samples_per_chirp
-        self.num_chirps_per_frame = num_chirps_per_frame
-        self.chirp_repetition_time_s = chirp_repetition_time_s
-        self.start_frequency_Hz = start_frequency_Hz
-        self.window = signal.windows.blackmanharris(num_samples_per_chirp).reshape(1, num_samples_per_chirp)
-        self.fall_threshold = 1
-        self.alpha = 0.4
-        self.slow_avg = None
-        self.fast_avg = None
-        self.first_run = True
-
-    def detect_fall(self, mat):
-        mat_fil = mean_filter(mat)
-        range_fft = fft_spectrum(mat_fil, self.window)
-        fft_spec_abs = abs(range_fft)
-        fft_norm = np.divide(fft_spec_abs.sum(axis=0), self.num_chirps_per_frame)
-        radial_velocity = self.calculate_radial_velocity(mat)
-        fft_norm = radial_velocity
-        if self.first_run:
-            self.slow_avg = fft_norm
-            self.fast_avg = fft_norm
-            self.first_run = False
-        self.slow_avg = self.slow_avg * (1 - self.alpha) + fft_norm * self.alpha
-        self.fast_avg = self.fast_avg * self.alpha + fft_norm * (1 - self.alpha)
-        data = self.fast_avg - self.slow_avg
-        fall_detected = np.max(data) > self.fall_threshold
-        write_ndarray_to_file(mat, 'mat_data.txt')
-        fall_detected = abs(radial_velocity) > 0.6
-        return fall_detected
-
-    def calculate_radial_velocity(self, mat_fil):
-        doppler_fft = np.fft.fftshift(np.fft.fft2(mat_fil, axes=(0, 1)), axes=0)
-        doppler_freq = np.fft.fftfreq(self.num_chirps_per_frame, self.chirp_repetition_time_s)
-        doppler_freq = np.fft.fftshift(doppler_freq)
-        doppler_spectrum = np.abs(doppler_fft).sum(axis=1)
-        doppler_spectrum[32] = 0
-        peak_index = np.argmax(doppler_spectrum)
-        c = 3e8  # Speed of light in m/s
-        wavelength = c / self.start_frequency_Hz
-        velocity = doppler_freq[peak_index] * wavelength / 2
-        return velocity
-
 class FallDetectionApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -113,8 +66,7 @@ class FallDetectionApp(QMainWindow):
             self.algo = FallDetectionAlgo(
                 config.chirp.num_samples, 
                 config.num_chirps, 
-                config.chirp_repetition_time_s, 
-                config.chirp.start_frequency_Hz
+                self.radar_data.geometry
                 )
             self.frame_timer.start(100) 
         except Exception as e:
@@ -143,6 +95,8 @@ class FallDetectionApp(QMainWindow):
 
     def reset_fall_flag(self):
         self.fall_detected_flag = False
+        if self.algo:
+            self.algo.reset()
         self.red_light.setStyleSheet("background-color: grey; border-radius: 30px;")
 
     def show_error_message(self, message):
@@ -153,26 +107,6 @@ class FallDetectionApp(QMainWindow):
             self.radar_data.stop()
         event.accept()
 
-def write_ndarray_to_file(arr, file_path):
-    with open(file_path, 'a') as file:
-        file.write('[\n')
-        for row in arr:
-            line = ' '.join(map(str, row)) + '\n'
-            file.write(line)
-        file.write(']\n\n')
-
-def mean_filter(data, kernel_size=3):
-    if data.ndim == 1:
-        kernel = np.ones(kernel_size) / kernel_size
-        filtered_data = np.convolve(data, kernel, mode='same')
-    elif data.ndim == 2:
-        kernel = np.ones((kernel_size, kernel_size)) / (kernel_size ** 2)
-        filtered_data = convolve(data, kernel, mode='reflect')
-    else:
-        raise ValueError("Input data must be a 1D or 2D array.")
-
-    return filtered_data
-
 def main():
     app = QApplication(sys.argv)
     ex = FallDetectionApp()
@@ -1,90 +1,6 @@
-import numpy as np
-from scipy.signal import find_peaks
-from collections import namedtuple
-from scipy import signal
-from helpers.fft_spectrum import fft_spectrum
-from sklearn.cluster import DBSCAN
+from helpers.PresenceAlgo import PresenceAlgo
 from radar_data_acquisition import initialize_radar, get_radar_data
 
-class PresenceAlgo:
-    def __init__(self, num_samples_per_chirp, num_chirps_per_frame):
-        self.num_samples_per_chirp = num_samples_per_chirp
-        self.num_chirps_per_frame = num_chirps_per_frame
-
-        self.detect_start_sample = num_samples_per_chirp // 8
-        self.detect_end_sample = (3 * num_samples_per_chirp) // 4
-
-        self.threshold_presence = 0.0001
-
-        self.alpha_slow = 0.001
-        self.alpha_med = 0.05
-        self.alpha_fast = 0.6
-
-        self.presence_status = False
-        self.first_run = True
-
-        self.window = signal.windows.blackmanharris(num_samples_per_chirp).reshape(1, num_samples_per_chirp)
-
-    def presence(self, mat):
-        alpha_slow = self.alpha_slow
-        alpha_med = self.alpha_med
-        alpha_fast = self.alpha_fast
-
-        range_fft = fft_spectrum(mat, self.window)
-
-        fft_spec_abs = abs(range_fft)
-        fft_norm = np.divide(fft_spec_abs.sum(axis=0), self.num_chirps_per_frame)
-
-        if self.first_run:  
-            self.slow_avg = fft_norm
-            self.fast_avg = fft_norm
-            self.first_run = False
-
-        if not self.presence_status:
-            alpha_used = alpha_med
-        else:
-            alpha_used = alpha_slow
-
-        self.slow_avg = self.slow_avg * (1 - alpha_used) + fft_norm * alpha_used
-        self.fast_avg = self.fast_avg * (1 - alpha_fast) + fft_norm * alpha_fast
-        data = self.fast_avg - self.slow_avg
-
-        self.presence_status = np.max(data[self.detect_start_sample:self.detect_end_sample]) > self.threshold_presence
-
-        peaks, _ = find_peaks(data[self.detect_start_sample:self.detect_end_sample], height=self.threshold_presence)
-        num_persons = len(peaks)
-
-        return namedtuple("state", ["presence", "num_persons", "peaks", "data"])(self.presence_status, num_persons, peaks, data)
-
-    def estimate_aoa(self, mat, peaks, antenna_distance, wavelength):
-        num_antennas = mat.shape[0]
-        aoa_estimates = []
-
-        for peak in peaks:
-            phase_diffs = []
-            for i in range(1, num_antennas):
-                phase_diff = np.angle(mat[i, :, peak]) - np.angle(mat[0, :, peak])
-                phase_diffs.append(np.mean(phase_diff))
-            
-            phase_diffs = np.array(phase_diffs)
-            sin_theta = phase_diffs * wavelength / (2 * np.pi * antenna_distance)
-            sin_theta = np.clip(sin_theta, -1, 1)  
-            theta = np.arcsin(sin_theta)
-            aoa_estimates.append(np.degrees(theta))
-
-        return aoa_estimates
-    
-    def cluster_peaks(self, peaks, aoa_estimates):
-        features = np.column_stack((peaks, aoa_estimates))
-
-        epsilon = 0.2 
-        min_samples = 7
-        db = DBSCAN(eps=epsilon, min_samples=min_samples).fit(features)
-
-        labels = db.labels_
-
-        return labels
-
 def run_presence_detection(radar_data):
     config = radar_data.config
     algo = PresenceAlgo(config.chirp.num_samples, config.num_chirps)
@@ -103,12 +19,12 @@ def run_presence_detection(radar_data):
                 aoa_estimates_all = []
                 peaks_all = []
 
-                for i in range(num_rx_antennas):
-                    frame = frame_contents[i]
+                range_fft = algo.range_spectrum(frame_contents)
 
-                    mat = frame[0, :, :]
+                for i in range(num_rx_antennas):
+                    mat = frame_contents[i]
 
-                    state = algo.presence(mat)
+                    state = algo.presence(mat, range_fft[i])
 
                     if state.presence:
                         presence_detected = True
@@ -116,7 +32,7 @@ def run_presence_detection(radar_data):
                     total_num_persons += state.num_persons
 
                     if state.num_persons > 0:
-                        aoa_estimates = algo.estimate_aoa(frame_contents, state.peaks, antenna_distance, wavelength)
+                        aoa_estimates = algo.estimate_aoa(range_fft, state.peaks, antenna_distance, wavelength)
                         aoa_estimates_all.extend(aoa_estimates)
                         peaks_all.extend(state.peaks)
                     
@@ -2,8 +2,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 from collections import deque
 from matplotlib.image import imread
-from helpers.DigitalBeamForming import DigitalBeamForming
-from helpers.DopplerAlgo import DopplerAlgo
+from helpers.PresenceDetectionAlgo import PresenceDetectionAlgo
+from helpers.blit import BlitRenderer
 import time
 from PyQt5.QtCore import QObject, pyqtSignal, QTimer
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
@@ -40,7 +40,10 @@ class SegmentPlot(FigureCanvas):
 
         self.angle_history = deque(maxlen=7)
         self.is_window_open = True
-        
+        self.shown_segment_idx = None
+
+        # the room image is static, only the bars are redrawn
+        self.blitter = BlitRenderer(self, self.bars)
         self.draw() 
 
     def set_background_image(self, image_path):
@@ -54,6 +57,8 @@ class SegmentPlot(FigureCanvas):
         segment_idx = np.digitize([angle], self.segments) - 1
         self.angle_history.append(segment_idx)
         avg_segment_idx = int(np.round(np.mean(self.angle_history)))
+        if avg_segment_idx == self.shown_segment_idx:
+            return
 
         for idx, bar in enumerate(self.bars):
             if idx == avg_segment_idx:
@@ -64,10 +69,11 @@ class SegmentPlot(FigureCanvas):
                 bar.set_height(0)
                 bar.set_visible(False)
 
-        self.draw()
+        if self.blitter.update():
+            self.shown_segment_idx = avg_segment_idx
 
 class PresenceDetection:
-    def __init__(self, max_angle_degrees: float, image_path: str, start_height: float, end_height: float, num_bars: int, margin_ratio: float):
+    def __init__(self, max_angle_degrees: float, image_path: str, start_height: float, end_height: float, num_bars: int, margin_ratio: float, range_bins: slice = None):
         self.max_angle_degrees = max_angle_degrees
         self.image_path = image_path
         self.start_height = start_height
@@ -76,12 +82,9 @@ class PresenceDetection:
         self.margin_ratio = margin_ratio
         
         # These values should match the radar configuration
-        self.num_samples = 128
-        self.num_chirps = 64
-        self.num_rx_antennas = 2
-        
-        self.doppler = DopplerAlgo(self.num_samples, self.num_chirps, self.num_rx_antennas)
-        self.dbf = DigitalBeamForming(self.num_rx_antennas, num_beams=80, max_angle_degrees=max_angle_degrees)
+        self.algo = PresenceDetectionAlgo(num_samples=128, num_chirps=64, num_rx_antennas=2,
+                                          max_angle_degrees=max_angle_degrees, range_bins=range_bins)
+        self.angle_axis = self.algo.angle_axis
         
         self.plot = None
         self.signals = PresenceDetectionSignals()
@@ -92,23 +95,10 @@ class PresenceDetection:
         return self.plot
 
     def process_frame(self, frame):
-        rd_spectrum = np.zeros((self.num_samples, 2 * self.num_chirps, self.num_rx_antennas), dtype=complex)
-        beam_range_energy = np.zeros((self.num_samples, 80))
-
-        for i_ant in range(self.num_rx_antennas):
-            mat = frame[i_ant, :, :]
-            dfft_dbfs = self.doppler.compute_doppler_map(mat, i_ant)
-            rd_spectrum[:, :, i_ant] = dfft_dbfs
-
-        rd_beam_formed = self.dbf.run(rd_spectrum)
-        for i_beam in range(80):
-            doppler_i = rd_beam_formed[:, :, i_beam]
-            beam_range_energy[:, i_beam] += np.linalg.norm(doppler_i, axis=1) / np.sqrt(80)
-
-        max_idx = np.unravel_index(beam_range_energy.argmax(), beam_range_energy.shape)
-        angle_degrees = np.linspace(-self.max_angle_degrees, self.max_angle_degrees, 80)[max_idx[1]]
+        return self.algo.process_frame(frame)
 
-        return angle_degrees
+    def angle_from_beams(self, rd_beam_formed):
+        return self.algo.angle_from_beams(rd_beam_formed)
 
     def run_presence_detection(self):
         from radar_data_acquisition import get_radar_data
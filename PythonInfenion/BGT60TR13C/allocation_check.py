@@ -0,0 +1,125 @@
+import argparse
+import sys
+import tracemalloc
+
+import numpy as np
+
+from dsp_benchmark import PROFILES, synthetic_frames
+from helpers.RadarGeometry import RadarGeometry
+from helpers.recording import config_from_dict
+
+# Checks that the per-frame processing allocates no arrays once it has run
+# for a few frames. Every step runs over the frames of a profile with
+# tracemalloc watching: the peak of traced memory during a call, above what
+# was allocated before it, is the memory the call allocated, whether it was
+# freed again or not. NumPy reports its array buffers to tracemalloc, so an
+# array of a frame's size is hard to miss; the few hundred bytes of Python
+# objects (array views, shape tuples, scalars) are below the limit.
+
+
+# -------------------------------------------------
+# Steps
+# -------------------------------------------------
+# Every step takes the config and geometry of a profile and returns a
+# function that is called with a frame
+
+def step_shared_products(config, geometry):
+    # the range FFT, range-Doppler maps and beams of the frame pipeline
+    from helpers.usecases import shared_products
+    range_fft, rd_maps, beams = [stage.func for stage in shared_products(config, geometry)]
+
+    def run(frame):
+        range_fft(frame)
+        beams(rd_maps(frame))
+    return run
+
+
+def step_presence_angle(config, geometry):
+    from helpers.PresenceDetectionAlgo import PresenceDetectionAlgo
+    algo = PresenceDetectionAlgo(config.chirp.num_samples, config.num_chirps, geometry.num_rx_antennas,
+                                 max_angle_degrees=60)
+    return algo.process_frame
+
+
+def step_doppler_map(config, geometry):
+    from helpers.DopplerAlgo import DopplerAlgo
+    doppler = DopplerAlgo(config.chirp.num_samples, config.num_chirps, geometry.num_rx_antennas)
+    rd_maps = np.empty((config.chirp.num_samples, 2 * config.num_chirps, geometry.num_rx_antennas), dtype=complex)
+
+    def run(frame):
+        for i_ant in range(geometry.num_rx_antennas):
+            doppler.compute_doppler_map(frame[i_ant], i_ant, out=rd_maps[:, :, i_ant])
+    return run
+
+
+STEPS = {
+    "shared_products": step_shared_products,
+    "presence_angle": step_presence_angle,
+    "doppler_map": step_doppler_map,
+}
+
+
+def check(profiles, steps, num_frames, warmup):
+    # returns (profile/step, largest allocation per call in bytes, bytes
+    # still allocated after all frames) of every step
+    results = []
+    for profile in profiles:
+        config = config_from_dict(PROFILES[profile])
+        geometry = RadarGeometry.from_config(config)
+        frames = synthetic_frames(config, geometry, num_frames)
+        for name in steps:
+            func = STEPS[name](config, geometry)
+            for i in range(warmup):
+                func(frames[i % num_frames])
+
+            tracemalloc.start()
+            try:
+                start_bytes = tracemalloc.get_traced_memory()[0]
+                largest = 0
+                for frame in frames:
+                    before = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    func(frame)
+                    largest = max(largest, tracemalloc.get_traced_memory()[1] - before)
+                retained = tracemalloc.get_traced_memory()[0] - start_bytes
+            finally:
+                tracemalloc.stop()
+            results.append((f"{profile}/{name}", largest, retained))
+    return results
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Checks with tracemalloc that the per-frame processing
+                                                    allocates no arrays in steady state''')
+    parser.add_argument('-p', '--profiles', default=",".join(PROFILES),
+                        help="comma separated profiles out of " + ", ".join(PROFILES) + ", default all")
+    parser.add_argument('-s', '--steps', default=",".join(STEPS),
+                        help="comma separated steps out of " + ", ".join(STEPS) + ", default all")
+    parser.add_argument('-n', '--frames', type=int, default=50, help="frames checked per step, default 50")
+    parser.add_argument('-w', '--warmup', type=int, default=3, help="frames run before checking, default 3")
+    parser.add_argument('-l', '--limit', type=int, default=2048,
+                        help="bytes a call may allocate (Python objects, no arrays), default 2048")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+
+    profiles = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    steps = [name.strip() for name in args.steps.split(",") if name.strip()]
+    unknown = [name for name in profiles if name not in PROFILES] + [name for name in steps if name not in STEPS]
+    if unknown:
+        raise SystemExit(f"Unknown profiles or steps: {', '.join(unknown)}")
+
+    failed = []
+    print(f"{'step':<28} {'allocated per call':>20} {'retained':>12}")
+    for key, largest, retained in check(profiles, steps, args.frames, args.warmup):
+        flag = ""
+        if largest > args.limit or retained > args.limit:
+            flag = "  ALLOCATES"
+            failed.append(key)
+        print(f"{key:<28} {largest:18d} B {retained:10d} B{flag}")
+
+    if failed:
+        print(f"\n{len(failed)} steps allocate in steady state: {', '.join(failed)}")
+        sys.exit(1)
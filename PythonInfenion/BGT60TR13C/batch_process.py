@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from helpers.RadarGeometry import RadarGeometry
+from helpers.recording import Session, find_sessions
+from helpers.usecases import USE_CASES, create_use_cases
+
+DONE_FILE = "done.json"
+
+
+# -------------------------------------------------
+# Processing
+# -------------------------------------------------
+def is_done(output_dir, use_cases, all_frames=True):
+    # a session is done if a previous run processed all requested use cases,
+    # and all frames unless idle stretches are skipped or a start is given
+    try:
+        with open(os.path.join(output_dir, DONE_FILE)) as f:
+            done = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if all_frames and done.get("frames_processed", done["num_frames"]) < done["num_frames"]:
+        return False
+    return set(use_cases) <= set(done["use_cases"])
+
+
+def save_columns(path, rows):
+    # rows of dictionaries -> one array per column
+    columns = {name: np.array([row[name] for row in rows]) for name in rows[0]} if rows else {}
+    np.savez(path, **columns)
+
+
+def process_session(session_path, use_cases, output_root, skip_idle=False, start_s=0.0):
+    # Processes the frames of a session with the selected use cases and
+    # writes the per-frame features and the detections of every use case.
+    # With skip_idle, only the frames outside the idle stretches of the
+    # session index; processing starts start_s seconds into the session.
+    session = Session(session_path)
+    output_dir = os.path.join(output_root, session.name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    geometry = RadarGeometry.from_config(session.config, max_range_m=session.max_range_m)
+    runners = create_use_cases(use_cases, session.config, geometry)
+    rows = {name: [] for name in use_cases}
+
+    first = session.frame_at(start_s) if start_s else 0
+    frames = session.active_frames() if skip_idle else np.arange(len(session))
+    frames = frames[frames >= first]
+
+    start = time.perf_counter()
+    for i_frame in frames:
+        frame = np.asarray(session[i_frame])
+        for name, runner in runners.items():
+            row = {"frame": i_frame, "timestamp": session.timestamps[i_frame]}
+            row.update(runner.process(frame))
+            rows[name].append(row)
+    duration_s = time.perf_counter() - start
+
+    for name, runner in runners.items():
+        save_columns(os.path.join(output_dir, f"{name}_features.npz"), rows[name])
+        if runner.detection:
+            save_columns(os.path.join(output_dir, f"{name}_detections.npz"),
+                         [row for row in rows[name] if row[runner.detection]])
+
+    # written last: marks the session as complete for reruns
+    with open(os.path.join(output_dir, DONE_FILE), "w") as f:
+        json.dump({"use_cases": sorted(use_cases), "num_frames": len(session), "frames_processed": len(frames),
+                   "duration_s": duration_s}, f)
+
+    return session.name, len(frames), duration_s
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Runs use cases on recorded sessions, one session per process''')
+    parser.add_argument('input', help="directory with recorded sessions")
+    parser.add_argument('-o', '--output', default="batch_output", help="output directory, default batch_output")
+    parser.add_argument('-u', '--usecases', default=",".join(USE_CASES),
+                        help="comma separated use cases out of " + ", ".join(USE_CASES) + ", default all")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="number of worker processes, default number of cores")
+    parser.add_argument('--force', action='store_true', help="process sessions again that are already done")
+    parser.add_argument('--skip-idle', action='store_true',
+                        help="process only the frames with motion in the session index and a second around them")
+    parser.add_argument('--start', type=float, default=0.0, help="start this many seconds into every session")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+
+    use_cases = [name.strip() for name in args.usecases.split(",") if name.strip()]
+    unknown = [name for name in use_cases if name not in USE_CASES]
+    if unknown:
+        raise SystemExit(f"Unknown use cases: {', '.join(unknown)}")
+
+    sessions = find_sessions(args.input)
+    pending = [path for path in sessions
+               if args.force or not is_done(os.path.join(args.output, os.path.basename(path)), use_cases,
+                                            not args.skip_idle and not args.start)]
+    print(f"{len(sessions)} sessions found, {len(sessions) - len(pending)} already done")
+
+    total_frames = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(process_session, path, use_cases, args.output, args.skip_idle, args.start): path
+                   for path in pending}
+        for future in as_completed(futures):
+            try:
+                name, num_frames, duration_s = future.result()
+            except Exception as e:
+                print(f"Error processing {futures[future]}: {e}")
+                continue
+            total_frames += num_frames
+            print(f"{name}: {num_frames} frames in {duration_s:.1f}s ({num_frames / max(duration_s, 1e-9):.1f} frames/s)")
+
+    elapsed_s = time.perf_counter() - start
+    print(f"Processed {total_frames} frames in {elapsed_s:.1f}s: {total_frames / max(elapsed_s, 1e-9):.1f} frames/s")
@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from helpers import profiling
+from helpers.pipeline import FramePipeline, Stage
+from helpers.quality import QualityController
+from helpers.usecases import (USE_CASES, create_use_cases, json_default, quality_levels, shared_products,
+                              use_case_stage)
+
+# Headless detection daemon. Runs the selected use cases on the frame
+# pipeline and writes an event as one JSON line whenever the state of a use
+# case changes (every frame with --every-frame). Only NumPy and the selected
+# algorithm modules are imported, no GUI toolkit. With --adaptive, use cases
+# switch to cheaper variants while the frames take longer than the frame
+# repetition time (see helpers.usecases.quality_levels). With --db, the
+# state transitions are also stored in an SQLite event store
+# (helpers.event_store), see query_events.py. With --timeseries, continuous
+# metrics of every frame go to round-robin tiers (helpers.timeseries), see
+# query_metrics.py. With --occupancy, the range x angle energy of every frame
+# is summed into an occupancy heatmap (helpers.occupancy), saved every
+# OCCUPANCY_SAVE_S and on exit, see query_occupancy.py.
+
+OCCUPANCY_SAVE_S = 600
+
+# use case -> metric name -> result, the metrics stored with --timeseries
+METRICS = {
+    "people_count": {"presence_score": "presence_score", "people_count": "num_persons"},
+    "fall": {"activity_energy": "energy"},
+}
+
+
+class EventWriter:
+    """Writes the results of the use cases as JSON lines"""
+
+    def __init__(self, use_cases: dict, output=sys.stdout, every_frame: bool = False, store=None):
+        # store: EventStore that gets the state of every frame and keeps the
+        #        transitions, or None
+        self.use_cases = use_cases
+        self.output = output
+        self.every_frame = every_frame
+        self.store = store
+        self.last_state = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, name, frame_number, results):
+        # called from the pipeline threads
+        value = results[self.use_cases[name].state]
+        if self.store is not None:
+            self.store.record(name, value, frame_number, results)
+        with self.lock:
+            if not self.every_frame and name in self.last_state and self.last_state[name] == value:
+                return
+            self.last_state[name] = value
+            event = {"time": time.time(), "frame": frame_number, "type": name, "value": value}
+            event.update(results)
+            self.output.write(json.dumps(event, default=json_default) + "\n")
+            self.output.flush()
+
+
+def create_pipeline(radar_data, use_cases: dict, on_results, quality=None):
+    """Frame pipeline running the use cases on the shared products"""
+    pipeline = FramePipeline(radar_data, quality=quality)
+    for stage in shared_products(radar_data.config, radar_data.geometry):
+        pipeline.add_product(stage)
+    for name, use_case in use_cases.items():
+        pipeline.register(name, [use_case_stage(name, use_case, on_results)])
+    return pipeline
+
+
+class MetricWriter:
+    """Adds the METRICS of the results to a TimeSeriesStore and passes the
+    results on"""
+
+    def __init__(self, store, on_results):
+        self.store = store
+        self.on_results = on_results
+
+    def __call__(self, name, frame_number, results):
+        now = time.time()
+        for metric, key in METRICS.get(name, {}).items():
+            self.store.add(metric, results[key], now)
+        self.on_results(name, frame_number, results)
+
+
+class QualityApplier:
+    """on_change of the QualityController, called between two frames: the
+    use cases whose options differ at the new level take them in place if
+    they have apply_options(), and keep their state; the others are created
+    again and registered in place of the old ones"""
+
+    def __init__(self, radar_data, use_cases: dict, on_results):
+        self.radar_data = radar_data
+        self.use_cases = use_cases
+        self.on_results = on_results
+        self.pipeline = None
+        self.options = {}
+
+    def __call__(self, level):
+        changed = [name for name in self.use_cases if level.options.get(name) != self.options.get(name)]
+        self.options = level.options
+        created = [name for name in changed if not hasattr(self.use_cases[name], "apply_options")]
+        for name in changed:
+            if name not in created:
+                self.use_cases[name].apply_options(**self.options.get(name, {}))
+        self.use_cases.update(create_use_cases(created, self.radar_data.config, self.radar_data.geometry,
+                                               self.options))
+        for name in created:
+            self.pipeline.register(name, [use_case_stage(name, self.use_cases[name], self.on_results)])
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Headless detection daemon, writes use case events as JSON
+                                                    lines''')
+    parser.add_argument('-u', '--usecases', default="fall,people_count",
+                        help="comma separated use cases out of " + ", ".join(USE_CASES) +
+                             ", default fall,people_count")
+    parser.add_argument('-o', '--output', help="append the events to this file instead of stdout")
+    parser.add_argument('--every-frame', action='store_true', help="write the results of every frame")
+    parser.add_argument('--db', help="also store the state transitions in this SQLite event store")
+    parser.add_argument('--occupancy', metavar='FILE',
+                        help="sum the range x angle energy of every frame into this occupancy heatmap (.npz), "
+                             "continued if it exists")
+    parser.add_argument('--occupancy-mode', default="energy",
+                        help="energy: sum the energy of every cell, mask: count the cells near the peak of "
+                             "every frame, default energy")
+    parser.add_argument('--timeseries', metavar='DIRECTORY',
+                        help="store " + ", ".join(metric for metrics in METRICS.values() for metric in metrics) +
+                             " of every frame in the round-robin tiers of this directory")
+    parser.add_argument('--session', help="replay a recorded session instead of using the radar")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed, default 1.0")
+    parser.add_argument('--start', type=float, default=0.0, help="start the replay this many seconds into the session")
+    parser.add_argument('--skip-idle', action='store_true',
+                        help="replay only the stretches with motion in the session index")
+    parser.add_argument('-f', '--frames', type=int, default=0, help="stop after this many frames, default never")
+    parser.add_argument('--metrics-port', type=int,
+                        help="record the processing time of every stage and serve it on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--profile-log', type=float, metavar='SECONDS',
+                        help="print p50, p99 and max of every stage to stderr at this interval")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="lower the quality of the use cases while frames overrun the frame repetition time, "
+                             "quality changes are logged to stderr")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+    names = [name.strip() for name in args.usecases.split(",") if name.strip()]
+    unknown = [name for name in names if name not in USE_CASES]
+    if unknown:
+        raise SystemExit(f"Unknown use cases: {', '.join(unknown)}")
+
+    if args.session:
+        from helpers.recording import SessionPlayer
+        try:
+            radar_data = SessionPlayer(args.session, speed=args.speed, loop=False, start_s=args.start,
+                                       skip_idle=args.skip_idle)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    else:
+        from radar_data_acquisition import initialize_radar, get_radar_data
+        initialize_radar()
+        radar_data = get_radar_data()
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    use_cases = create_use_cases(names, radar_data.config, radar_data.geometry)
+    store = None
+    if args.db:
+        from helpers.event_store import EventStore
+        store = EventStore(args.db)
+    on_results = EventWriter(use_cases, output, args.every_frame, store)
+    timeseries = None
+    if args.timeseries:
+        from helpers.timeseries import TimeSeriesStore
+        timeseries = TimeSeriesStore(args.timeseries)
+        on_results = MetricWriter(timeseries, on_results)
+    quality = applier = None
+    if args.adaptive:
+        applier = QualityApplier(radar_data, use_cases, on_results)
+        quality = QualityController(quality_levels(radar_data.geometry), radar_data.config.frame_repetition_time_s,
+                                    on_change=applier, name="detection", output=sys.stderr)
+    pipeline = create_pipeline(radar_data, use_cases, on_results, quality)
+    if applier is not None:
+        applier.pipeline = pipeline
+
+    started = list(names)
+    occupancy = None
+    if args.occupancy:
+        from helpers.occupancy import OccupancyAccumulator
+        if os.path.isfile(args.occupancy):
+            occupancy = OccupancyAccumulator.load(args.occupancy)
+            if occupancy.shape != (radar_data.geometry.num_samples, 80):
+                raise SystemExit(f"{args.occupancy} has {occupancy.shape[0]} range bins x {occupancy.shape[1]} "
+                                 f"beams, expected {radar_data.geometry.num_samples} x 80")
+        else:
+            try:
+                occupancy = OccupancyAccumulator(radar_data.geometry.range_axis_m,
+                                                 radar_data.geometry.angle_axis_deg(80, 60), args.occupancy_mode)
+            except ValueError as e:
+                raise SystemExit(str(e))
+        # the shared beams: 80 beams over +-60 degrees of all range bins
+        pipeline.register("occupancy", [Stage("occupancy", lambda beams: occupancy.add_beams(beams, time.time()),
+                                              ["beams"])])
+        started.append("occupancy")
+
+    metrics_server = profile_logger = None
+    if args.metrics_port or args.profile_log:
+        profiling.enable()
+    if args.metrics_port:
+        metrics_server = profiling.serve_metrics(args.metrics_port)
+    if args.profile_log:
+        # stdout carries the events
+        profile_logger = profiling.SummaryLogger(args.profile_log, sys.stderr).start()
+
+    for name in started:
+        pipeline.start(name)
+    if args.session:
+        # once the pipeline waits for frames, none of the replay is lost
+        radar_data.start()
+    last_save = time.monotonic()
+    try:
+        while radar_data.running and not (args.frames and pipeline.frames_processed >= args.frames):
+            time.sleep(0.1)
+            if occupancy is not None and time.monotonic() - last_save > OCCUPANCY_SAVE_S:
+                occupancy.save(args.occupancy)
+                last_save = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        radar_data.stop()
+        if quality is not None:
+            print(f"Quality: {quality.stats()}", file=sys.stderr)
+        if occupancy is not None:
+            occupancy.save(args.occupancy)
+        if timeseries is not None:
+            timeseries.close()
+        if store is not None:
+            store.close()
+            print(f"Event store: {store.stats()}", file=sys.stderr)
+        if profile_logger is not None:
+            profile_logger.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if args.output:
+            output.close()
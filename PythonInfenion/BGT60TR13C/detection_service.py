@@ -0,0 +1,376 @@
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+
+from helpers import profiling, usecases
+from helpers.RadarGeometry import angle_axis_deg
+from helpers.pipeline import FramePipeline, Stage
+from helpers.websocket import server_handshake
+
+# Headless detection service. Runs the use cases on the frame pipeline and
+# serves the results on localhost:
+#
+#   GET /state      current value of every use case (JSON)
+#   GET /map        latest decimated range-angle map (JSON)
+#   GET /stats      subscribers, dropped messages, stage timings (JSON)
+#   GET /metrics    per-stage processing time histograms (Prometheus text),
+#                   recorded with --profile
+#   WS  /events     a message per state change of a use case
+#   WS  /maps       decimated range-angle maps at most every map_interval_s
+#
+# Every WebSocket client has its own bounded queue. Messages are serialized
+# once in the pipeline thread and handed to the event loop; when a client
+# does not keep up, the oldest message in its queue is dropped, so a slow
+# client never holds back frame processing or the other clients.
+
+# the use cases of the registry plus the published range-angle map
+USE_CASES = list(usecases.USE_CASES) + ["map"]
+DEFAULT_USE_CASES = ["fall", "people_count", "posture", "gesture", "map"]
+
+SEND_BUFFER_SIZE = 64 * 1024
+
+# header lines of a request, a line is limited by the stream reader (64 KiB)
+MAX_HEADERS = 100
+
+
+class Subscriber:
+    """Bounded message queue of a WebSocket client, drops the oldest message when full"""
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(queue_size)
+        self.sent = 0
+        self.dropped = 0
+
+    def put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class DetectionService:
+    def __init__(self, radar_data, use_cases=DEFAULT_USE_CASES, host: str = "127.0.0.1", port: int = 8765,
+                 queue_size: int = 32, map_decimation=(4, 4), map_interval_s: float = 1.0):
+        """Create the service
+
+        Parameters:
+            - radar_data:       started RadarDataAcquisition, or a SessionPlayer
+                                started after serve() started the pipeline
+            - use_cases:        names of the use cases to run
+            - host, port:       address to listen on, localhost by default
+            - queue_size:       messages buffered per WebSocket client
+            - map_decimation:   (range, angle) reduction of the published maps
+            - map_interval_s:   minimum time between two published maps
+        """
+        self.radar_data = radar_data
+        self.use_cases = list(use_cases)
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.map_decimation = map_decimation
+        self.map_interval_s = map_interval_s
+
+        self.loop = None
+        self.subscribers = {"events": set(), "maps": set()}
+        self.dropped_disconnected = 0
+        # written by the pipeline threads, read by the event loop
+        self.state = {}
+        self.state_lock = threading.Lock()
+        self.latest_map = None
+        self.last_map_time = 0.0
+
+        self._build_pipeline()
+
+    # -------------------------------------------------
+    # Pipeline
+    # -------------------------------------------------
+    def _build_pipeline(self):
+        # Same shared products as the GUI, the use case stages publish
+        # their state instead of updating widgets
+        config = self.radar_data.config
+        geometry = self.radar_data.geometry
+        self.angle_axis = angle_axis_deg(80, 60)
+
+        self.pipeline = FramePipeline(self.radar_data)
+        for stage in usecases.shared_products(config, geometry):
+            self.pipeline.add_product(stage)
+
+        self.detectors = usecases.create_use_cases([name for name in self.use_cases if name != "map"],
+                                                   config, geometry)
+        for name, use_case in self.detectors.items():
+            self.pipeline.register(name, [usecases.use_case_stage(name, use_case, self._on_results)])
+        if "map" in self.use_cases:
+            self.pipeline.register("map", [self._map_stage()])
+
+    def _on_results(self, name, frame_number, results):
+        self.set_state(name, results[self.detectors[name].state], frame_number)
+
+    def _map_stage(self):
+        geometry = self.radar_data.geometry
+
+        def stage(frame_number, beams):
+            now = time.time()
+            with self.state_lock:
+                if now - self.last_map_time < self.map_interval_s:
+                    return
+                self.last_map_time = now
+
+            # range-angle power, Doppler integrated, then the strongest cell
+            # of every decimation block in dB relative to the maximum
+            power = np.sum(np.abs(beams) ** 2, axis=1)
+            step_r, step_a = self.map_decimation
+            num_range = power.shape[0] // step_r * step_r
+            num_angle = power.shape[1] // step_a * step_a
+            blocks = power[:num_range, :num_angle].reshape(num_range // step_r, step_r, num_angle // step_a, step_a)
+            decimated = blocks.max(axis=(1, 3))
+
+            dB = 10 * np.log10(decimated / max(decimated.max(), 1e-20) + 1e-12)
+            image = np.clip((dB + 60) * (255 / 60), 0, 255).astype(np.uint8)
+
+            i_range, i_angle = np.unravel_index(np.argmax(power), power.shape)
+            message = json.dumps({
+                "type": "map",
+                "frame": frame_number,
+                "time": now,
+                "max_range_m": geometry.max_range_m,
+                "max_angle_degrees": 60,
+                "dynamic_range_dB": 60,
+                "shape": list(image.shape),
+                "data": image.ravel().tolist(),
+                "peak": {"range_m": float(geometry.range_axis_m[i_range]),
+                         "angle_degrees": float(self.angle_axis[i_angle])},
+            })
+            with self.state_lock:
+                self.latest_map = message
+            self.publish("maps", message)
+        return Stage("map", stage, ["frame_number", "beams"])
+
+    # -------------------------------------------------
+    # Publishing (called from the pipeline threads)
+    # -------------------------------------------------
+    def set_state(self, use_case: str, value, frame_number: int):
+        # updates the state of a use case, publishes an event if it changed
+        entry = {"value": value, "frame": frame_number, "time": time.time()}
+        with self.state_lock:
+            previous = self.state.get(use_case)
+            self.state[use_case] = entry
+        if previous is None or previous["value"] != value:
+            self.publish("events", json.dumps(dict(entry, type=use_case), default=usecases.json_default))
+
+    def state_snapshot(self) -> dict:
+        with self.state_lock:
+            return dict(self.state)
+
+    def map_snapshot(self):
+        # latest map message, None before the first map
+        with self.state_lock:
+            return self.latest_map
+
+    def publish(self, topic: str, message: str):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._broadcast, topic, message)
+
+    def _broadcast(self, topic, message):
+        for subscriber in self.subscribers[topic]:
+            subscriber.put(message)
+
+    # -------------------------------------------------
+    # HTTP / WebSocket
+    # -------------------------------------------------
+    def stats(self) -> dict:
+        subscribers = [s for topic in self.subscribers.values() for s in topic]
+        return {
+            "frames_processed": self.pipeline.frames_processed,
+            "subscribers": {topic: len(s) for topic, s in self.subscribers.items()},
+            "messages_sent": sum(s.sent for s in subscribers),
+            "messages_dropped": sum(s.dropped for s in subscribers) + self.dropped_disconnected,
+            "stage_timings_ms": {name: {"mean": t.mean_s * 1e3, "max": t.max_s * 1e3, "count": t.count}
+                                 for name, t in self.pipeline.stage_timings().items()},
+        }
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                if len(headers) >= MAX_HEADERS:
+                    raise ValueError("too many header lines")
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except (asyncio.LimitOverrunError, ValueError):
+            # a line over the limit of the stream reader, or too many lines
+            await self._respond(writer, 400, {"error": "bad request"})
+            return
+
+        if len(request_line) < 2 or request_line[0] != "GET":
+            await self._respond(writer, 405, {"error": "method not allowed"})
+            return
+        path = request_line[1].split("?")[0]
+
+        if headers.get("upgrade", "").lower() == "websocket" and path in ("/events", "/maps"):
+            websocket = await server_handshake(reader, writer, headers)
+            if websocket is not None:
+                await self._stream(websocket, path[1:])
+        elif path == "/state":
+            await self._respond(writer, 200, self.state_snapshot())
+        elif path == "/map":
+            latest_map = self.map_snapshot()
+            await self._respond(writer, 200, json.loads(latest_map) if latest_map else {})
+        elif path == "/stats":
+            await self._respond(writer, 200, self.stats())
+        elif path == "/metrics":
+            await self._respond(writer, 200, profiling.prometheus_text(), "text/plain; version=0.0.4")
+        else:
+            await self._respond(writer, 404, {"error": "not found"})
+
+    async def _respond(self, writer, status, body, content_type="application/json"):
+        # body: a string sent as is, anything else as JSON
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}[status]
+        if isinstance(body, str):
+            payload = body.encode()
+        else:
+            payload = json.dumps(body, default=usecases.json_default).encode()
+        writer.write((f"HTTP/1.1 {status} {reason}\r\n"
+                      f"Content-Type: {content_type}\r\n"
+                      f"Content-Length: {len(payload)}\r\n"
+                      "Connection: close\r\n\r\n").encode() + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def _stream(self, websocket, topic):
+        # a small socket buffer makes the bounded queue the place where a
+        # slow client loses data, instead of megabytes of stale messages
+        # piling up in the kernel
+        sock = websocket.writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers[topic].add(subscriber)
+        if topic == "events":
+            # a new client first gets the current state of every use case
+            for use_case, entry in self.state_snapshot().items():
+                subscriber.put(json.dumps(dict(entry, type=use_case), default=usecases.json_default))
+        else:
+            latest_map = self.map_snapshot()
+            if latest_map:
+                subscriber.put(latest_map)
+
+        async def send():
+            while True:
+                message = await subscriber.queue.get()
+                await websocket.send(message)
+                subscriber.sent += 1
+
+        async def receive():
+            # nothing is expected from clients, reading detects the close
+            while True:
+                await websocket.recv()
+
+        tasks = [asyncio.ensure_future(send()), asyncio.ensure_future(receive())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.subscribers[topic].discard(subscriber)
+            self.dropped_disconnected += subscriber.dropped
+            await websocket.close()
+
+    async def serve(self, started: asyncio.Event = None):
+        """Run the pipeline and the server until cancelled"""
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+        for use_case in self.use_cases:
+            self.pipeline.start(use_case)
+        print(f"Detection service on http://{self.host}:{self.port} running {', '.join(self.use_cases)}")
+        if started is not None:
+            started.set()
+
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # the pipeline thread must not publish into a closed loop
+            await self.loop.run_in_executor(None, self.pipeline.stop)
+            self.loop = None
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Headless detection service, serves use case state, events and
+                                                    range-angle maps over HTTP and WebSocket''')
+    parser.add_argument('--host', default="127.0.0.1", help="address to listen on, default 127.0.0.1")
+    parser.add_argument('-p', '--port', type=int, default=8765, help="port, default 8765")
+    parser.add_argument('-u', '--usecases', default=",".join(DEFAULT_USE_CASES),
+                        help="comma separated use cases out of " + ", ".join(USE_CASES) + ", default " +
+                             ", ".join(DEFAULT_USE_CASES))
+    parser.add_argument('-q', '--queue', type=int, default=32, help="messages buffered per client, default 32")
+    parser.add_argument('--session', help="replay a recorded session instead of using the radar")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed, default 1.0")
+    parser.add_argument('--profile', action='store_true',
+                        help="record the processing time of every stage, served on /metrics")
+    parser.add_argument('--profile-log', type=float, metavar='SECONDS',
+                        help="print p50, p99 and max of every stage at this interval, implies --profile")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+
+    use_cases = [name.strip() for name in args.usecases.split(",") if name.strip()]
+    unknown = [name for name in use_cases if name not in USE_CASES]
+    if unknown:
+        raise SystemExit(f"Unknown use cases: {', '.join(unknown)}")
+
+    if args.session:
+        from helpers.recording import SessionPlayer
+        try:
+            radar_data = SessionPlayer(args.session, speed=args.speed)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    else:
+        from radar_data_acquisition import initialize_radar, get_radar_data
+        initialize_radar()
+        radar_data = get_radar_data()
+
+    profile_logger = None
+    if args.profile or args.profile_log:
+        profiling.enable()
+    if args.profile_log:
+        profile_logger = profiling.SummaryLogger(args.profile_log).start()
+
+    service = DetectionService(radar_data, use_cases, host=args.host, port=args.port, queue_size=args.queue)
+
+    async def main():
+        started = asyncio.Event()
+        serving = asyncio.ensure_future(service.serve(started))
+        await started.wait()
+        if args.session:
+            # the replay starts once the pipeline waits for frames
+            radar_data.start()
+        await serving
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if profile_logger is not None:
+            profile_logger.stop()
+        radar_data.stop()
@@ -0,0 +1,250 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from helpers.RadarGeometry import RadarGeometry
+from helpers.recording import config_from_dict
+
+# Micro-benchmark of the DSP kernels in helpers, for every sensor profile
+# the use cases run with. Frames are synthetic and deterministic: a few
+# moving reflectors plus noise, so that peak searches and clustering find
+# something to work on. Stateful kernels (MTI, averaging, fall state
+# machine) run over a cycle of frames like they would on live data.
+#
+# Results are written as JSON; with --baseline, every kernel is compared
+# against an earlier run and the exit code is 1 if any got slower by more
+# than the threshold.
+
+CHIRP = {"tx_mask": 1, "tx_power_level": 31, "lp_cutoff_Hz": 500000, "hp_cutoff_Hz": 80000}
+
+# configurations of radar_data_acquisition.initialize_radar() and 3D_Plot_Generation.py
+PROFILES = {
+    "presence": {"frame_repetition_time_s": 0.5, "chirp_repetition_time_s": 0.001, "num_chirps": 64,
+                 "tdm_mimo": False,
+                 "chirp": dict(CHIRP, start_frequency_Hz=60e9, end_frequency_Hz=61.5e9, sample_rate_Hz=2e6,
+                               num_samples=128, rx_mask=5, if_gain_dB=33)},
+    "posture": {"frame_repetition_time_s": 0.5, "chirp_repetition_time_s": 0.001, "num_chirps": 64,
+                "tdm_mimo": False,
+                "chirp": dict(CHIRP, start_frequency_Hz=60e9, end_frequency_Hz=61.5e9, sample_rate_Hz=2e6,
+                              num_samples=128, rx_mask=7, if_gain_dB=33)},
+    "fall": {"frame_repetition_time_s": 0.5, "chirp_repetition_time_s": 283e-6, "num_chirps": 64,
+             "tdm_mimo": False,
+             "chirp": dict(CHIRP, start_frequency_Hz=60e9, end_frequency_Hz=63.5e9, sample_rate_Hz=1e6,
+                           num_samples=128, rx_mask=5, if_gain_dB=45)},
+    "gesture": {"frame_repetition_time_s": 0.5, "chirp_repetition_time_s": 283e-6, "num_chirps": 64,
+                "tdm_mimo": False,
+                "chirp": dict(CHIRP, start_frequency_Hz=60e9, end_frequency_Hz=61.5e9, sample_rate_Hz=1e6,
+                              num_samples=128, rx_mask=5, if_gain_dB=33)},
+    "3d": {"frame_repetition_time_s": 0.05, "chirp_repetition_time_s": 0.0005, "num_chirps": 64,
+           "tdm_mimo": False,
+           "chirp": dict(CHIRP, start_frequency_Hz=60e9, end_frequency_Hz=61.5e9, sample_rate_Hz=1e6,
+                         num_samples=32, rx_mask=7, if_gain_dB=45)},
+}
+
+# (range m, radial speed m/s, angle degrees, amplitude) of the synthetic reflectors
+TARGETS = [(1.2, 0.4, -15.0, 0.05), (2.6, -0.8, 20.0, 0.03), (0.8, 0.0, 0.0, 0.02)]
+
+
+def synthetic_frames(config, geometry, num_frames, seed=0):
+    # num_frames x num_rx_antennas x num_chirps x num_samples, ADC scale 0 .. 1
+    rng = np.random.default_rng(seed)
+    num_samples, num_chirps = config.chirp.num_samples, config.num_chirps
+    samples = np.arange(num_samples)
+    chirps = np.arange(num_chirps)[:, None]
+    frames = np.empty((num_frames, geometry.num_rx_antennas, num_chirps, num_samples))
+    for i_frame in range(num_frames):
+        frame = np.full((geometry.num_rx_antennas, num_chirps, num_samples), 0.5)
+        for range_m, speed_m_s, angle_deg, amplitude in TARGETS:
+            range_m += speed_m_s * config.frame_repetition_time_s * i_frame
+            # beat frequency in cycles per sample, Doppler and angle as phase steps
+            beat = range_m / geometry.range_bin_length / geometry.range_fft_size
+            doppler = 4 * np.pi * speed_m_s * config.chirp_repetition_time_s / geometry.wavelength
+            for i_ant in range(geometry.num_rx_antennas):
+                phase = np.pi * np.sin(np.radians(angle_deg)) * i_ant
+                frame[i_ant] += amplitude * np.cos(2 * np.pi * beat * samples + doppler * chirps + phase)
+        frames[i_frame] = frame + rng.normal(0, 0.002, frame.shape)
+    return frames
+
+
+# -------------------------------------------------
+# Kernels
+# -------------------------------------------------
+# Every kernel takes the config, geometry and frames of a profile and
+# returns a function that is called with the frame index
+
+def kernel_fft_spectrum(config, geometry, frames):
+    from helpers.fft_spectrum import fft_spectrum
+    return lambda i: fft_spectrum(frames[i], geometry.range_window)
+
+
+def kernel_doppler_map(config, geometry, frames):
+    from helpers.DopplerAlgo import DopplerAlgo
+    doppler = DopplerAlgo(config.chirp.num_samples, config.num_chirps, geometry.num_rx_antennas)
+    return lambda i: doppler.compute_doppler_map(frames[i, 0], 0)
+
+
+def range_doppler_maps(config, geometry, frames):
+    from helpers.DopplerAlgo import DopplerAlgo
+    doppler = DopplerAlgo(config.chirp.num_samples, config.num_chirps, geometry.num_rx_antennas)
+    return [np.stack([doppler.compute_doppler_map(frame[i_ant], i_ant) for i_ant in range(len(frame))], axis=-1)
+            for frame in frames]
+
+
+def kernel_beamforming(num_beams):
+    def kernel(config, geometry, frames):
+        from helpers.DigitalBeamForming import DigitalBeamForming
+        dbf = DigitalBeamForming(geometry.num_rx_antennas, num_beams=num_beams, max_angle_degrees=60)
+        rd_maps = range_doppler_maps(config, geometry, frames)
+        return lambda i: dbf.run(rd_maps[i])
+    return kernel
+
+
+def kernel_distance(config, geometry, frames):
+    from helpers.DistanceAlgo import DistanceAlgo
+    algo = DistanceAlgo(config.chirp, config.num_chirps)
+    return lambda i: algo.compute_distance(frames[i, 0])
+
+
+def kernel_presence(config, geometry, frames):
+    from helpers.PresenceAlgo import PresenceAlgo
+    algo = PresenceAlgo(config.chirp.num_samples, config.num_chirps)
+    return lambda i: algo.presence(frames[i, 0])
+
+
+def kernel_fall(config, geometry, frames):
+    # on the shared range-Doppler map, as in the frame pipeline
+    from helpers.FallDetectionAlgo import FallDetectionAlgo
+    algo = FallDetectionAlgo(config.chirp.num_samples, config.num_chirps, geometry)
+    rd_maps = range_doppler_maps(config, geometry, frames)
+    return lambda i: algo.detect_fall(None, rd_maps[i][:, :, 0])
+
+
+def kernel_targets_3d(config, geometry, frames):
+    # Doppler, 2D beamforming, point cloud and clustering of Radar3DProcessing
+    from helpers.point_cloud import TargetDetector
+    detector = TargetDetector(config, geometry)
+    return lambda i: detector.detect(frames[i])
+
+
+KERNELS = {
+    "fft_spectrum": kernel_fft_spectrum,
+    "doppler_map": kernel_doppler_map,
+    "beamforming_27": kernel_beamforming(27),
+    "beamforming_40": kernel_beamforming(40),
+    "beamforming_80": kernel_beamforming(80),
+    "distance": kernel_distance,
+    "presence": kernel_presence,
+    "fall": kernel_fall,
+    "targets_3d": kernel_targets_3d,
+}
+
+
+# -------------------------------------------------
+# Measurement
+# -------------------------------------------------
+def measure(funcs, num_frames, repeat, rounds=5, warmup=10):
+    # The kernels take turns in rounds, so that a transient slowdown of the
+    # machine spreads over all of them instead of hitting a single one
+    for func in funcs.values():
+        for i in range(warmup):
+            func(i % num_frames)
+
+    calls = max(repeat // rounds, 1)
+    times = {name: [] for name in funcs}
+    for i_round in range(rounds):
+        for name, func in funcs.items():
+            for i in range(calls):
+                start = time.perf_counter()
+                func(i % num_frames)
+                times[name].append(time.perf_counter() - start)
+
+    results = {}
+    for name, samples in times.items():
+        samples = np.array(samples) * 1e6
+        results[name] = {"median_us": float(np.median(samples)), "p90_us": float(np.percentile(samples, 90)),
+                         "min_us": float(samples.min()), "repeat": len(samples)}
+    return results
+
+
+def run(profiles, kernels, repeat, num_frames=16):
+    results = {}
+    for profile in profiles:
+        config = config_from_dict(PROFILES[profile])
+        geometry = RadarGeometry.from_config(config)
+        frames = synthetic_frames(config, geometry, num_frames)
+        funcs = {kernel: KERNELS[kernel](config, geometry, frames) for kernel in kernels}
+        for kernel, result in measure(funcs, num_frames, repeat).items():
+            key = f"{profile}/{kernel}"
+            results[key] = result
+            print(f"{key:<28} median {result['median_us']:9.1f} us   p90 {result['p90_us']:9.1f} us")
+    return results
+
+
+def compare(results, baseline, threshold):
+    # prints the change of every kernel against the baseline, returns the
+    # keys that got slower by more than 'threshold'
+    regressions = []
+    print(f"\n{'kernel':<28} {'baseline':>10} {'now':>10}   change")
+    for key, result in results.items():
+        if key not in baseline:
+            print(f"{key:<28} {'-':>10} {result['median_us']:10.1f}   new")
+            continue
+        before, now = baseline[key]["median_us"], result["median_us"]
+        change = now / before - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key:<28} {before:10.1f} {now:10.1f}   {change:+6.1%}{flag}")
+    not_run = [key for key in baseline if key not in results]
+    if not_run:
+        print(f"{len(not_run)} kernels of the baseline not run")
+    return regressions
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Micro-benchmark of the DSP kernels on synthetic frames of
+                                                    every sensor profile''')
+    parser.add_argument('-p', '--profiles', default=",".join(PROFILES),
+                        help="comma separated profiles out of " + ", ".join(PROFILES) + ", default all")
+    parser.add_argument('-k', '--kernels', default=",".join(KERNELS),
+                        help="comma separated kernels out of " + ", ".join(KERNELS) + ", default all")
+    parser.add_argument('-n', '--repeat', type=int, default=200, help="calls per kernel, default 200")
+    parser.add_argument('-o', '--output', help="write the results to this JSON file")
+    parser.add_argument('-b', '--baseline', help="JSON file of an earlier run to compare against")
+    parser.add_argument('-t', '--threshold', type=float, default=0.15,
+                        help="relative slowdown of the median flagged as regression, default 0.15")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+
+    profiles = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    kernels = [name.strip() for name in args.kernels.split(",") if name.strip()]
+    unknown = [name for name in profiles if name not in PROFILES] + [name for name in kernels if name not in KERNELS]
+    if unknown:
+        raise SystemExit(f"Unknown profiles or kernels: {', '.join(unknown)}")
+
+    results = run(profiles, kernels, args.repeat)
+
+    if args.output:
+        report = {
+            "meta": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                     "processor": platform.processor(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,286 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from helpers.RadarGeometry import RadarGeometry
+from helpers.recording import Session, find_sessions
+from helpers.usecases import USE_CASES, create_use_cases
+
+# Replays labelled sessions (see helpers.recording.LABELS_FILE) through the
+# use cases, once with the default processing and once per variant, and
+# reports the detection quality next to the throughput. Variants trade
+# accuracy for speed; the Pareto column marks the variants no other variant
+# beats in both, so a faster approximation is accepted on evidence.
+#
+# Every use case runs on its own, computing everything it needs from the
+# frame, so frames/s and CPU per frame are those of the use case alone. The
+# variants of a use case take turns every ROUND_FRAMES frames, so that a
+# transient slowdown of the machine spreads over all of them, and the
+# throughput is taken from the median time per frame.
+
+# use case -> kind of metric: boolean events, counts, classes or angles
+METRICS = {
+    "fall": "events",
+    "gesture": "events",
+    "people_count": "count",
+    "posture": "class",
+    "presence": "angle",
+}
+
+
+def range_gated(geometry, max_range_m):
+    # only the range bins up to max_range_m, from the default first bin of
+    # every use case so that distances derived from peak positions stay the
+    # same and the leakage bins stay out of people count and posture
+    options = {name: {"max_range_m": max_range_m} for name in ("presence", "people_count", "posture")}
+    options["fall"] = {"range_bins": geometry.range_bins(None, max_range_m)}
+    return options
+
+
+# Variants of the default processing:
+#   - options:      keyword options of the use cases by name, from the geometry
+# A variant runs for the use cases it has options for.
+VARIANTS = {
+    "baseline": {},
+    "beams_40": {"options": lambda geometry: {"presence": {"num_beams": 40}}},
+    "beams_27": {"options": lambda geometry: {"presence": {"num_beams": 27}}},
+    "range_3m": {"options": lambda geometry: range_gated(geometry, 3.0)},
+    "range_2m": {"options": lambda geometry: range_gated(geometry, 2.0)},
+}
+
+# frames processed before timing a use case
+WARMUP_FRAMES = 5
+# frames a variant processes before the next variant takes its turn
+ROUND_FRAMES = 10
+
+
+def variant_use_cases(variant, names, geometry):
+    # the use cases out of 'names' a variant applies to, with their options
+    spec = VARIANTS[variant]
+    options = spec["options"](geometry) if "options" in spec else {}
+    if variant == "baseline":
+        return names, options
+    return [name for name in names if name in options], options
+
+
+# -------------------------------------------------
+# Labels and metrics
+# -------------------------------------------------
+def label_values(labels, num_frames):
+    # the labelled value of every frame and the mask of labelled frames
+    values = np.empty(num_frames, dtype=object)
+    labelled = np.zeros(num_frames, dtype=bool)
+    for interval in labels:
+        start, stop = max(interval["start"], 0), min(interval["stop"], num_frames)
+        values[start:stop] = [interval["value"]] * max(stop - start, 0)
+        labelled[start:stop] = True
+    return values, labelled
+
+
+def runs(active):
+    # (start, stop) of every run of True
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def count_metrics(kind, predicted, values, labelled):
+    # sums over the labelled frames of a session, added up over all
+    # sessions and turned into metrics by metrics()
+    if kind == "events":
+        # a labelled event is detected if any frame of it has a detection, a
+        # detection is correct if any of its frames is in a labelled event
+        truth = np.array([bool(v) for v in values]) & labelled
+        detected = np.array([bool(p) for p in predicted]) & labelled
+        truth_events, detected_events = runs(truth), runs(detected)
+        return {"events": len(truth_events),
+                "events_detected": sum(detected[start:stop].any() for start, stop in truth_events),
+                "detections": len(detected_events),
+                "detections_correct": sum(truth[start:stop].any() for start, stop in detected_events)}
+
+    frames = np.flatnonzero(labelled)
+    if kind == "angle":
+        errors = [abs(float(predicted[i]) - float(values[i])) for i in frames]
+        return {"frames": len(frames), "abs_error_sum": float(sum(errors))}
+    correct = sum(predicted[i] == values[i] for i in frames)
+    counts = {"frames": len(frames), "correct": int(correct)}
+    if kind == "count":
+        counts["abs_error_sum"] = float(sum(abs(predicted[i] - values[i]) for i in frames))
+    return counts
+
+
+def metrics(kind, counts):
+    # (metric values, score), a higher score is better, None without labels
+    if kind == "events":
+        if not counts:
+            return {}, None
+        if not counts["events"]:
+            # labelled frames without events: every detection is a false one
+            return {"events": 0, "false_detections": counts["detections"]}, -counts["detections"]
+        precision = counts["detections_correct"] / counts["detections"] if counts["detections"] else 0.0
+        recall = counts["events_detected"] / counts["events"] if counts["events"] else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {"precision": precision, "recall": recall, "f1": f1}, f1
+
+    if not counts.get("frames"):
+        return {}, None
+    if kind == "angle":
+        mae = counts["abs_error_sum"] / counts["frames"]
+        return {"mae_deg": mae}, -mae
+    accuracy = counts["correct"] / counts["frames"]
+    if kind == "count":
+        return {"accuracy": accuracy, "mae": counts["abs_error_sum"] / counts["frames"]}, accuracy
+    return {"accuracy": accuracy}, accuracy
+
+
+def format_metrics(values):
+    if not values:
+        return "no labels"
+    if "false_detections" in values:
+        return f"no events, {values['false_detections']} false detections"
+    return ", ".join(f"{name} {value:.3f}" if name != "mae_deg" else f"MAE {value:.1f} deg"
+                     for name, value in values.items())
+
+
+# -------------------------------------------------
+# Evaluation
+# -------------------------------------------------
+def evaluate_session(session, names, variants, max_frames=None):
+    # per (use case, variant): metric sums, frames, wall and CPU seconds of
+    # every frame
+    geometry = RadarGeometry.from_config(session.config, max_range_m=session.max_range_m)
+    num_frames = min(len(session), max_frames) if max_frames else len(session)
+
+    # (use case, variant) -> use case object, variants of a use case together
+    use_cases = {}
+    for name in names:
+        for variant in variants:
+            variant_names, options = variant_use_cases(variant, names, geometry)
+            if name not in variant_names:
+                continue
+            # a few untimed frames on a separate object, so the first variant
+            # does not pay for warming the caches
+            use_case = create_use_cases([name], session.config, geometry, options)[name]
+            for i_frame in range(min(WARMUP_FRAMES, num_frames)):
+                use_case.process(np.asarray(session[i_frame]))
+            use_cases[(name, variant)] = create_use_cases([name], session.config, geometry, options)[name]
+
+    predicted = {key: np.empty(num_frames, dtype=object) for key in use_cases}
+    wall_s = {key: np.empty(num_frames) for key in use_cases}
+    cpu_s = {key: np.empty(num_frames) for key in use_cases}
+    for first in range(0, num_frames, ROUND_FRAMES):
+        frames = [np.asarray(session[i_frame]) for i_frame in range(first, min(first + ROUND_FRAMES, num_frames))]
+        for key, use_case in use_cases.items():
+            # every use case object still sees all frames in order
+            for i_frame, frame in enumerate(frames, first):
+                start_wall, start_cpu = time.perf_counter(), time.process_time()
+                result = use_case.process(frame)
+                wall_s[key][i_frame] = time.perf_counter() - start_wall
+                cpu_s[key][i_frame] = time.process_time() - start_cpu
+                predicted[key][i_frame] = result[use_case.state]
+
+    results = {}
+    for key in use_cases:
+        name = key[0]
+        counts = {}
+        if name in session.labels:
+            values, labelled = label_values(session.labels[name], num_frames)
+            counts = count_metrics(METRICS[name], predicted[key], values, labelled)
+        results[key] = {"counts": counts, "frames": num_frames, "wall_s": wall_s[key], "cpu_s": cpu_s[key]}
+    return results
+
+
+def merge(total, results):
+    for key, result in results.items():
+        entry = total.setdefault(key, {"counts": {}, "frames": 0, "wall_s": [], "cpu_s": []})
+        for name, value in result["counts"].items():
+            entry["counts"][name] = entry["counts"].get(name, 0) + value
+        entry["frames"] += result["frames"]
+        entry["wall_s"].append(result["wall_s"])
+        entry["cpu_s"].append(result["cpu_s"])
+
+
+def pareto_table(total):
+    # rows per use case with metrics, throughput and whether the variant is
+    # on the Pareto front of score against frames/s
+    rows = []
+    for key, entry in total.items():
+        name, variant = key
+        values, score = metrics(METRICS[name], entry["counts"])
+        # medians over the frames of all sessions
+        wall_s = np.median(np.concatenate(entry["wall_s"])) if entry["frames"] else 0.0
+        cpu_s = np.median(np.concatenate(entry["cpu_s"])) if entry["frames"] else 0.0
+        rows.append({"use_case": name, "variant": variant, "metrics": values, "score": score,
+                     "frames_per_s": float(1 / wall_s) if wall_s else 0.0,
+                     "cpu_ms_per_frame": float(1e3 * cpu_s), "frames": entry["frames"]})
+
+    for row in rows:
+        others = [other for other in rows if other["use_case"] == row["use_case"] and other is not row]
+        if row["score"] is None:
+            row["pareto"] = None
+            continue
+        row["pareto"] = not any(other["score"] is not None and other["score"] >= row["score"] and
+                                other["frames_per_s"] >= row["frames_per_s"] and
+                                (other["score"] > row["score"] or other["frames_per_s"] > row["frames_per_s"])
+                                for other in others)
+    return sorted(rows, key=lambda row: (row["use_case"], -row["frames_per_s"]))
+
+
+def print_table(rows):
+    baseline = {row["use_case"]: row["frames_per_s"] for row in rows if row["variant"] == "baseline"}
+    print(f"{'use case':<14} {'variant':<16} {'frames/s':>9} {'speedup':>8} {'CPU ms':>8} {'Pareto':>7}   quality")
+    for row in rows:
+        speedup = row["frames_per_s"] / baseline[row["use_case"]] if baseline.get(row["use_case"]) else float("nan")
+        pareto = "-" if row["pareto"] is None else ("yes" if row["pareto"] else "")
+        print(f"{row['use_case']:<14} {row['variant']:<16} {row['frames_per_s']:9.1f} {speedup:7.2f}x "
+              f"{row['cpu_ms_per_frame']:8.2f} {pareto:>7}   {format_metrics(row['metrics'])}")
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Detection quality against throughput of the use cases and
+                                                    their variants on labelled recorded sessions''')
+    parser.add_argument('input', help="recorded session, or directory with recorded sessions")
+    parser.add_argument('-u', '--usecases', default=",".join(METRICS),
+                        help="comma separated use cases out of " + ", ".join(METRICS) + ", default all")
+    parser.add_argument('-v', '--variants', default=",".join(VARIANTS),
+                        help="comma separated variants out of " + ", ".join(VARIANTS) + ", default all")
+    parser.add_argument('-f', '--frames', type=int, help="evaluate at most this many frames per session")
+    parser.add_argument('--unlabelled', action='store_true',
+                        help="include sessions without labels (throughput only)")
+    parser.add_argument('-o', '--output', help="write the table to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+
+    names = [name.strip() for name in args.usecases.split(",") if name.strip()]
+    variants = [name.strip() for name in args.variants.split(",") if name.strip()]
+    unknown = [name for name in names if name not in METRICS] + [name for name in variants if name not in VARIANTS]
+    if unknown:
+        raise SystemExit(f"Unknown use cases or variants: {', '.join(unknown)}")
+    if "baseline" not in variants:
+        variants.insert(0, "baseline")
+    assert set(METRICS) <= set(USE_CASES)
+
+    sessions = [Session(path) for path in find_sessions(args.input)]
+    if not args.unlabelled:
+        sessions = [session for session in sessions if session.labels]
+    if not sessions:
+        raise SystemExit(f"No {'' if args.unlabelled else 'labelled '}sessions found in {args.input}")
+
+    total = {}
+    for session in sessions:
+        start = time.perf_counter()
+        merge(total, evaluate_session(session, names, variants, args.frames))
+        print(f"{session.name}: labels for {', '.join(sorted(session.labels)) or 'none'}, "
+              f"evaluated in {time.perf_counter() - start:.1f}s")
+
+    rows = pareto_table(total)
+    print()
+    print_table(rows)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"sessions": [session.name for session in sessions], "rows": rows}, f, indent=2)
@@ -0,0 +1,278 @@
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from helpers.DigitalBeamForming import DigitalBeamForming
+from helpers.DopplerAlgo import DopplerAlgo
+from helpers.RadarGeometry import RadarGeometry, angle_axis_deg
+from helpers.recording import Session
+
+# Renders the views of a recorded session to video files. The session is
+# cut into chunks that are rendered with the Agg backend in a process pool.
+# Every chunk is encoded into a segment by its own ffmpeg process, and the
+# segments are joined in order without encoding them again.
+#
+# The MTI filter and the fading point cloud depend on earlier frames, so a
+# chunk first processes the frames before it without rendering them.
+
+VIEWS = ["range_doppler", "range_angle", "pointcloud"]
+MTI_WARMUP_FRAMES = 10
+
+
+def find_ffmpeg():
+    # ffmpeg on the PATH, or the binary of the imageio-ffmpeg package
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        return None
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def linear_to_dB(x):
+    return 20 * np.log10(abs(x))
+
+
+# -------------------------------------------------
+# Views
+# -------------------------------------------------
+class RangeDopplerView:
+    """Range-Doppler maps of all antennas, as shown by range_doppler_map.py"""
+
+    def __init__(self, config, geometry, options):
+        from helpers.range_doppler_map import Draw
+        self.num_rx_antennas = geometry.num_rx_antennas
+        self.plot = Draw(geometry.max_speed_m_s, geometry.max_range_m, self.num_rx_antennas,
+                         levels=options["range_doppler_levels"])
+        self.figure = self.plot._fig
+        self.rd_maps = None
+
+    def process(self, frame_number, frame, rd_maps):
+        self.rd_maps = rd_maps
+
+    def render(self):
+        self.plot.draw([linear_to_dB(self.rd_maps[:, :, i_ant]) for i_ant in range(self.num_rx_antennas)])
+
+
+class RangeAngleView:
+    """Range-angle map and dominant angle, as shown by range_angle_map.py"""
+
+    num_beams = 27
+    max_angle_degrees = 40
+
+    def __init__(self, config, geometry, options):
+        from helpers.range_angle_map import LivePlot
+        self.dbf = DigitalBeamForming(geometry.num_rx_antennas, num_beams=self.num_beams,
+                                      max_angle_degrees=self.max_angle_degrees)
+        self.angle_axis = angle_axis_deg(self.num_beams, self.max_angle_degrees)
+        self.plot = LivePlot(self.max_angle_degrees, geometry.max_range_m)
+        self.figure = self.plot._fig
+        self.rd_maps = None
+
+    def process(self, frame_number, frame, rd_maps):
+        self.rd_maps = rd_maps
+
+    def render(self):
+        rd_beam_formed = self.dbf.run(self.rd_maps)
+        beam_range_energy = np.linalg.norm(rd_beam_formed, axis=1) / np.sqrt(self.num_beams)
+
+        # same scaling as the live plot, the maximum is always at 0
+        beam_range_energy = 150 * (beam_range_energy / np.max(beam_range_energy) - 1)
+        _, idx = np.unravel_index(beam_range_energy.argmax(), beam_range_energy.shape)
+        angle_degrees = self.angle_axis[idx]
+        self.plot.draw(beam_range_energy, f"Range-Angle map using DBF, angle={angle_degrees:+02.0f} degrees")
+
+
+class PointCloudView:
+    """Clustered 3D targets fading over 'history' frames, as shown by Radar3DProcessing"""
+
+    def __init__(self, config, geometry, options):
+        from helpers.point_cloud import PointBuffer, PointCloudRenderer, TargetDetector
+        self.detector = TargetDetector(config, geometry)
+        self.targets = PointBuffer(2048)
+        self.figure = plt.figure(figsize=(10, 8))
+        ax = self.figure.add_subplot(111, projection='3d')
+        self.renderer = PointCloudRenderer(ax, self.targets, self.detector.range_axis_m[-1], options["history"])
+
+    def process(self, frame_number, frame, rd_maps):
+        self.targets.append(self.detector.detect(frame), frame_number)
+
+    def render(self):
+        self.renderer.update()
+
+
+VIEW_CLASSES = {
+    "range_doppler": RangeDopplerView,
+    "range_angle": RangeAngleView,
+    "pointcloud": PointCloudView,
+}
+
+
+# -------------------------------------------------
+# Rendering
+# -------------------------------------------------
+def start_encoder(ffmpeg, path, width, height, fps):
+    # raw RGBA frames on stdin, H.264 out (yuv420p needs even dimensions)
+    command = [ffmpeg, "-loglevel", "error", "-y",
+               "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", f"{fps}", "-i", "-",
+               "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264", "-preset", "veryfast",
+               "-pix_fmt", "yuv420p", path]
+    return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+
+def render_chunk(session_path, views, start, stop, segment_paths, options):
+    # Renders the frames start .. stop-1 of every view into its segment file
+    matplotlib.rcParams["figure.dpi"] = options["dpi"]
+    session = Session(session_path)
+    geometry = RadarGeometry.from_config(session.config, max_range_m=session.max_range_m)
+    num_rx_antennas = geometry.num_rx_antennas
+    doppler = DopplerAlgo(session.config.chirp.num_samples, session.config.num_chirps, num_rx_antennas)
+    rd_maps = np.zeros((session.config.chirp.num_samples, 2 * session.config.num_chirps, num_rx_antennas),
+                       dtype=complex)
+
+    renderers = {name: VIEW_CLASSES[name](session.config, geometry, options) for name in views}
+    warmup = MTI_WARMUP_FRAMES
+    if "pointcloud" in views:
+        warmup = max(warmup, options["history"])
+
+    encoders = {}
+    try:
+        for i_frame in range(max(0, start - warmup), stop):
+            frame = np.asarray(session[i_frame])
+            for i_ant in range(num_rx_antennas):
+                rd_maps[:, :, i_ant] = doppler.compute_doppler_map(frame[i_ant, :, :], i_ant)
+            for view in renderers.values():
+                view.process(i_frame, frame, rd_maps)
+            if i_frame < start:
+                continue
+
+            for name, view in renderers.items():
+                view.render()
+                image = np.asarray(view.figure.canvas.buffer_rgba())
+                if name not in encoders:
+                    encoders[name] = start_encoder(options["ffmpeg"], segment_paths[name], image.shape[1],
+                                                   image.shape[0], options["fps"])
+                encoders[name].stdin.write(image.tobytes())
+    finally:
+        for encoder in encoders.values():
+            encoder.stdin.close()
+            encoder.wait()
+        plt.close("all")
+
+    failed = [name for name, encoder in encoders.items() if encoder.returncode != 0]
+    if failed:
+        raise RuntimeError(f"ffmpeg failed for {', '.join(failed)}")
+    return start, stop
+
+
+def range_doppler_levels(session, num_frames=50):
+    # common colour scale of all chunks, from the start of the session
+    geometry = RadarGeometry.from_config(session.config, max_range_m=session.max_range_m)
+    doppler = DopplerAlgo(session.config.chirp.num_samples, session.config.num_chirps, geometry.num_rx_antennas)
+    maps = []
+    for i_frame in range(min(num_frames, len(session))):
+        frame = np.asarray(session[i_frame])
+        for i_ant in range(geometry.num_rx_antennas):
+            rd_map = linear_to_dB(doppler.compute_doppler_map(frame[i_ant, :, :], i_ant))
+            if i_frame >= min(MTI_WARMUP_FRAMES, len(session) - 1):
+                maps.append(rd_map)
+    maps = np.array(maps)
+    maps = maps[np.isfinite(maps)]
+    return float(np.percentile(maps, 1)), float(np.max(maps))
+
+
+def concat_segments(ffmpeg, segment_paths, path):
+    # joins the segments in order, without encoding them again
+    list_path = path + ".txt"
+    with open(list_path, "w") as f:
+        for segment_path in segment_paths:
+            f.write(f"file '{os.path.abspath(segment_path)}'\n")
+    try:
+        subprocess.run([ffmpeg, "-loglevel", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                        "-c", "copy", path], check=True)
+    finally:
+        os.remove(list_path)
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Renders the views of a recorded session to video files,
+                                                    chunks of frames are rendered in parallel''')
+    parser.add_argument('session', help="recorded session directory")
+    parser.add_argument('-o', '--output', default="videos", help="output directory, default videos")
+    parser.add_argument('-v', '--views', default=",".join(VIEWS),
+                        help="comma separated views out of " + ", ".join(VIEWS) + ", default all")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="number of worker processes, default number of cores")
+    parser.add_argument('-c', '--chunk', type=int, default=600, help="frames per chunk, default 600")
+    parser.add_argument('--fps', type=float, help="frame rate of the videos, default the frame rate of the session")
+    parser.add_argument('--history', type=int, default=20,
+                        help="frames over which targets fade out of the point cloud, default 20")
+    parser.add_argument('--dpi', type=int, default=100, help="resolution of the figures, default 100")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+
+    views = [name.strip() for name in args.views.split(",") if name.strip()]
+    unknown = [name for name in views if name not in VIEW_CLASSES]
+    if unknown:
+        raise SystemExit(f"Unknown views: {', '.join(unknown)}")
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise SystemExit("ffmpeg not found, install it or the imageio-ffmpeg package")
+
+    session = Session(args.session)
+    if not len(session):
+        raise SystemExit(f"{session.name} has no frames")
+    options = {
+        "ffmpeg": ffmpeg,
+        "fps": args.fps or 1 / session.config.frame_repetition_time_s,
+        "history": args.history,
+        "dpi": args.dpi,
+        "range_doppler_levels": range_doppler_levels(session) if "range_doppler" in views else None,
+    }
+    chunks = [(start, min(start + args.chunk, len(session))) for start in range(0, len(session), args.chunk)]
+
+    os.makedirs(args.output, exist_ok=True)
+    start_time = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=args.output) as segment_dir:
+        def segment_path(view, i_chunk):
+            return os.path.join(segment_dir, f"{view}_{i_chunk:05d}.mp4")
+
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [executor.submit(render_chunk, args.session, views, start, stop,
+                                       {view: segment_path(view, i_chunk) for view in views}, options)
+                       for i_chunk, (start, stop) in enumerate(chunks)]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    start, stop = future.result()
+                except Exception as e:
+                    # the chunks not started yet are not rendered in vain
+                    executor.shutdown(cancel_futures=True)
+                    raise SystemExit(f"Error rendering {session.name}: {e}")
+                print(f"frames {start}..{stop - 1} rendered ({done}/{len(chunks)} chunks)")
+
+        for view in views:
+            path = os.path.join(args.output, f"{session.name}_{view}.mp4")
+            concat_segments(ffmpeg, [segment_path(view, i_chunk) for i_chunk in range(len(chunks))], path)
+            print(f"{path} written")
+
+    elapsed_s = time.perf_counter() - start_time
+    session_s = len(session) * session.config.frame_repetition_time_s
+    print(f"Exported {len(session)} frames ({session_s:.0f}s of recording) in {elapsed_s:.1f}s: "
+          f"{len(session) / elapsed_s:.1f} frames/s, {session_s / elapsed_s:.1f}x real time")
@@ -26,8 +26,12 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # ===========================================================================
 
+import time
+
 import numpy as np
 
+from helpers import profiling
+
 
 class DigitalBeamForming:
     def __init__(self, num_antennas: int, num_beams: int = 27, max_angle_degrees: float = 45, d_by_lambda: float = 0.5):
@@ -52,33 +56,38 @@ class DigitalBeamForming:
 
         self.weights = weights
 
-    def run(self, range_doppler):
+        # the antennas are weighted in reverse order, contiguous for the
+        # matrix product
+        self.reversed_weights = np.ascontiguousarray(weights[::-1, :])
+
+    def run(self, range_doppler, out=None):
         """Compute virtual beams
 
         Parameters:
             - range_doppler: Range Doppler spectrum for all RX antennas
               (dimension: num_samples_per_chirp x num_chirps_per_frame x
               num_antennas)
+            - out:           complex array the beams are written to, a new
+              array if None
         
         Returns:
             - Range Doppler Beams (dimension: num_samples_per_chirp x
               num_chirps_per_frame x num_beams)
         """
 
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+
         num_samples, num_chirps, num_antennas = range_doppler.shape
 
         num_antennas_internal, num_beams = self.weights.shape
 
         assert num_antennas == num_antennas_internal
 
-        rd_beam_formed = np.zeros((num_samples, num_chirps, num_beams), dtype=complex);
-
-        for iBeam in range(num_beams):
-            acc = np.zeros((num_samples, num_chirps), dtype=complex)
-
-            for iAntenna in range(num_antennas):
-                acc += range_doppler[:, :, iAntenna] * self.weights[num_antennas - iAntenna - 1, iBeam]
-
-            rd_beam_formed[:, :, iBeam] = acc
+        # all beams in one matrix product
+        rd_beam_formed = np.matmul(range_doppler, self.reversed_weights, out=out)
 
+        if profile:
+            profiling.record("beamforming", start)
         return rd_beam_formed
@@ -0,0 +1,131 @@
+import time
+
+import numpy as np
+
+from helpers import profiling
+
+from helpers.RadarGeometry import angle_axis_deg
+
+# RX antenna positions of the BGT60TR13C in units of the wavelength (x is
+# horizontal, y is vertical). The three antennas form an L: RX1 and RX3 are
+# the horizontal (azimuth) pair, RX2 and RX3 the vertical (elevation) pair.
+BGT60TR13C_RX_POSITIONS = {
+    1: (0.0, 0.0),
+    2: (0.5, 0.5),
+    3: (0.5, 0.0),
+}
+
+
+def rx_positions_from_mask(rx_mask: int, positions: dict = None):
+    """Positions of the activated RX antennas, in the order of the frame data
+
+    Parameters:
+        - rx_mask:      RX mask of the chirp (bit 0 is RX1)
+        - positions:    antenna positions by RX number, BGT60TR13C by default
+    """
+    if positions is None:
+        positions = BGT60TR13C_RX_POSITIONS
+    return np.array([positions[rx] for rx in sorted(positions) if rx_mask & (1 << (rx - 1))], dtype=float)
+
+
+class DigitalBeamForming2D:
+    """Joint azimuth / elevation beamforming for planar (e.g. L-shaped) arrays"""
+
+    def __init__(self, antenna_positions: np.ndarray, num_azimuth_beams: int = 27, num_elevation_beams: int = 15,
+                 max_azimuth_degrees: float = 45, max_elevation_degrees: float = 45):
+        """Create a 2D Digital Beam Forming object
+
+        Parameters:
+            - antenna_positions:        (x, y) position of every RX antenna in
+                                        units of the wavelength (num_antennas x 2)
+            - num_azimuth_beams:        number of beams in azimuth
+            - num_elevation_beams:      number of beams in elevation, reduced to
+                                        a single 0 degree beam if the array has
+                                        no vertical extent
+            - max_azimuth_degrees:      azimuth ranges from -max .. +max degrees
+            - max_elevation_degrees:    elevation ranges from -max .. +max degrees
+        """
+        antenna_positions = np.asarray(antenna_positions, dtype=float)
+        x = antenna_positions[:, 0].reshape(-1, 1, 1)
+        y = antenna_positions[:, 1].reshape(-1, 1, 1)
+
+        if np.ptp(antenna_positions[:, 1]) == 0:
+            num_elevation_beams = 1
+            max_elevation_degrees = 0
+        if np.ptp(antenna_positions[:, 0]) == 0:
+            num_azimuth_beams = 1
+            max_azimuth_degrees = 0
+
+        self.azimuth_axis_rad = np.radians(angle_axis_deg(num_azimuth_beams, max_azimuth_degrees))
+        self.elevation_axis_rad = np.radians(angle_axis_deg(num_elevation_beams, max_elevation_degrees))
+
+        azimuth = self.azimuth_axis_rad.reshape(1, -1, 1)
+        elevation = self.elevation_axis_rad.reshape(1, 1, -1)
+
+        # phase of a plane wave from (azimuth, elevation) at every antenna
+        # (dimension: num_antennas x num_azimuth_beams x num_elevation_beams)
+        phase = 2 * np.pi * (x * np.sin(azimuth) * np.cos(elevation) + y * np.sin(elevation))
+        self.steering = np.exp(1j * phase)
+        self.steering_conj = self.steering.conj()
+
+    def run(self, range_doppler: np.ndarray):
+        """Compute range-azimuth-elevation power
+
+        Parameters:
+            - range_doppler: Range Doppler spectrum for all RX antennas
+              (dimension: num_range_bins x num_doppler_bins x num_antennas)
+
+        Returns:
+            - Power integrated over Doppler (dimension: num_range_bins x
+              num_azimuth_beams x num_elevation_beams)
+        """
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+
+        num_antennas = range_doppler.shape[2]
+        assert num_antennas == self.steering.shape[0]
+
+        # spatial covariance of every range bin, integrated over Doppler;
+        # with only a few antennas this is much smaller than the beam cube
+        covariance = np.einsum('rda,rdb->rab', range_doppler, range_doppler.conj(), optimize=True)
+
+        # w^H R w for all beams at once
+        power = np.einsum('aze,rab,bze->rze', self.steering_conj, covariance, self.steering, optimize=True)
+        if profile:
+            profiling.record("beamforming", start)
+        return power.real
+
+    def point_cloud(self, power: np.ndarray, range_axis_m: np.ndarray, threshold: float = None):
+        """Convert range-azimuth-elevation power into x/y/z points
+
+        Parameters:
+            - power:            output of run()
+            - range_axis_m:     distance of every range bin of 'power'
+            - threshold:        minimum power of a point, mean + 3 * std of
+                                'power' if None
+
+        Returns:
+            - points (dimension: num_points x 3) with x to the right, y along
+              the boresight and z upwards, all in metres
+            - power of every point
+        """
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+
+        if threshold is None:
+            threshold = np.mean(power) + 3 * np.std(power)
+
+        r, a, e = np.nonzero(power > threshold)
+        distance = range_axis_m[r]
+        azimuth = self.azimuth_axis_rad[a]
+        elevation = self.elevation_axis_rad[e]
+
+        horizontal = distance * np.cos(elevation)
+        points = np.column_stack((horizontal * np.sin(azimuth),
+                                  horizontal * np.cos(azimuth),
+                                  distance * np.sin(elevation)))
+        if profile:
+            profiling.record("detection", start)
+        return points, power[r, a, e]
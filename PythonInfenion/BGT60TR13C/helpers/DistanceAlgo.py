@@ -26,32 +26,50 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # ===========================================================================
 
+from typing import TYPE_CHECKING
+
 import numpy as np
-from scipy import signal, constants
+from scipy import constants
 
-from ifxradarsdk.fmcw.types import FmcwSequenceChirp
 from helpers.fft_spectrum import *
+from helpers.RadarGeometry import blackmanharris_window
+
+if TYPE_CHECKING:
+    from ifxradarsdk.fmcw.types import FmcwSequenceChirp
 
 
 class DistanceAlgo:
     """Algorithm for computation of distance FFT from raw data"""
 
-    def __init__(self, chirp: FmcwSequenceChirp, num_chirps_per_frame: int):
+    def __init__(self, chirp: "FmcwSequenceChirp", num_chirps_per_frame: int,
+                 min_range_m: float = None, max_range_m: float = None):
+        # chirp:                chirp configuration
+        # num_chirps_per_frame: number of chirps per frame
+        # min_range_m:          closest distance searched for a peak, by default
+        #                       the first 8 bins (antenna leakage) are skipped
+        # max_range_m:          farthest distance searched for a peak (e.g. room depth)
         self.num_chirps_per_frame = num_chirps_per_frame
 
         # compute Blackman-Harris Window matrix over chirp samples(range)
-        self.range_window = signal.windows.blackmanharris(chirp.num_samples).reshape(1, chirp.num_samples)
+        self.range_window = blackmanharris_window(chirp.num_samples)
 
         bandwidth_hz = abs(chirp.end_frequency_Hz - chirp.start_frequency_Hz)
         fft_size = chirp.num_samples * 2
         self.range_bin_length = constants.c / (2 * bandwidth_hz * fft_size / chirp.num_samples)
 
+        # range region of interest, bins outside of it are never computed
+        skip = 8
+        if min_range_m is None:
+            min_range_m = skip * self.range_bin_length
+        self.range_bins = range_roi_bins(min_range_m, max_range_m, self.range_bin_length, chirp.num_samples)
+
     def compute_distance(self, chirp_data):
         # Computes distance using chirp data
         # chirp_data: single antenna chirp data
+        # returns the peak distance and the integrated spectrum over 'range_bins'
 
-        # Step 1 - calculate range fft spectrum of the frame
-        range_fft = fft_spectrum(chirp_data, self.range_window)
+        # Step 1 - calculate range fft spectrum of the frame (region of interest only)
+        range_fft = fft_spectrum(chirp_data, self.range_window, self.range_bins)
 
         # Step 2 - convert to absolute spectrum
         range_fft_abs = abs(range_fft)
@@ -60,8 +78,7 @@ class DistanceAlgo:
         distance_data = np.divide(range_fft_abs.sum(axis=0), self.num_chirps_per_frame)
 
         # Step 4 - peak search and distance calculation
-        skip = 8
-        distance_peak = np.argmax(distance_data[skip:])
+        distance_peak = np.argmax(distance_data)
 
-        distance_peak_m = self.range_bin_length * (distance_peak + skip)
+        distance_peak_m = self.range_bin_length * (distance_peak + self.range_bins.start)
         return distance_peak_m, distance_data
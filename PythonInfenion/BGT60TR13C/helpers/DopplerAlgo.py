@@ -26,16 +26,22 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # ===========================================================================
 
+import time
+
 import numpy as np
-from scipy import signal
+
+from helpers import profiling
 
 from helpers.fft_spectrum import *
+from helpers.RadarGeometry import blackmanharris_window
+from helpers.workspace import Workspace
 
 
 class DopplerAlgo:
     """Compute Range-Doppler map"""
 
-    def __init__(self, num_samples: int, num_chirps_per_frame: int, num_ant: int, mti_alpha: float = 0.8):
+    def __init__(self, num_samples: int, num_chirps_per_frame: int, num_ant: int, mti_alpha: float = 0.8,
+                 range_bins: slice = None, doppler_padding: int = 2):
         """Create Range-Doppler map object
 
         Parameters:
@@ -43,14 +49,25 @@ class DopplerAlgo:
             - num_chirps_per_frame: Number of chirp repetitions within a measurement frame
             - num_ant:              Number of antennas
             - mti_alpha:            Parameter alpha of Moving Target Indicator
+            - range_bins:           Range region of interest (slice of range
+                                    bins), all bins are computed if None
+            - doppler_padding:      Doppler FFT size in multiples of the
+                                    chirps, 1 computes half the Doppler bins
+                                    without zero padding
         """
         self.num_chirps_per_frame = num_chirps_per_frame
+        self.num_doppler_bins = doppler_padding * num_chirps_per_frame
+        self.range_bins = range_bins if range_bins is not None else slice(0, num_samples)
 
         # compute Blackman-Harris Window matrix over chirp samples(range)
-        self.range_window = signal.windows.blackmanharris(num_samples).reshape(1, num_samples)
+        self.range_window = blackmanharris_window(num_samples)
 
         # compute Blackman-Harris Window matrix over number of chirps(velocity)
-        self.doppler_window = signal.windows.blackmanharris(self.num_chirps_per_frame).reshape(1, self.num_chirps_per_frame)
+        self.doppler_window = blackmanharris_window(self.num_chirps_per_frame)
+        num_range_bins = self.range_bins.stop - self.range_bins.start
+        # ... over the whole range-chirp matrix, complex as the spectrum it
+        # multiplies (a ufunc casting the window allocates a buffer)
+        self.doppler_window_matrix = np.outer(self.doppler_window, np.ones(num_range_bins)).astype(complex)
 
         # parameter for moving target indicator (MTI)
         self.mti_alpha = mti_alpha
@@ -58,35 +75,70 @@ class DopplerAlgo:
         # initialize MTI filter
         self.mti_history = np.zeros((self.num_chirps_per_frame, num_samples, num_ant))
 
-    def compute_doppler_map(self, data: np.ndarray, i_ant: int):
+        # intermediate buffers, reused by every call
+        self.workspace = Workspace()
+
+    def compute_doppler_map(self, data: np.ndarray, i_ant: int, out: np.ndarray = None):
         """Compute Range-Doppler map for i-th antennas
 
         Parameter:
             - data:     Raw-data for one antenna (dimension:
                         num_chirps_per_frame x num_samples)
             - i_ant:    RX antenna index
-        """
-        # Step 1 - Remove average from signal (mean removal)
-        data = data - np.average(data)
- 
-        # Step 2 - MTI processing to remove static objects
-        data_mti = data - self.mti_history[:, :, i_ant]
-        self.mti_history[:, :, i_ant] = data * self.mti_alpha + self.mti_history[:, :, i_ant] * (1 - self.mti_alpha)
+            - out:      complex array the map is written to, e.g. the slice of
+                        an antenna of a preallocated array, a new array if None
 
-        # Step 3 - calculate fft spectrum for the frame
-        fft1d = fft_spectrum(data_mti, self.range_window)
-
-        # prepare for doppler FFT
-
-        # Transpose
-        # Distance is now indicated on y axis
-        fft1d = np.transpose(fft1d)
+        Returns:
+            - Range-Doppler map restricted to the range region of interest
+              (dimension: num_range_bins x num_doppler_bins, by default
+              2*num_chirps_per_frame)
+        """
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
 
-        # Step 4 - Windowing the Data in doppler
-        fft1d = np.multiply(fft1d, self.doppler_window)
+        workspace = self.workspace
+        num_chirps = self.num_chirps_per_frame
+        num_doppler_bins = self.num_doppler_bins
+        num_range_bins = self.range_bins.stop - self.range_bins.start
+        if out is None:
+            out = np.empty((num_range_bins, num_doppler_bins), dtype=complex)
 
-        zp2 = np.pad(fft1d, ((0, 0), (0, self.num_chirps_per_frame)), "constant")
-        fft2d = np.fft.fft(zp2) / self.num_chirps_per_frame
+        # Step 1 - Remove average from signal (mean removal)
+        centred = workspace.get("centred", data.shape)
+        np.subtract(data, np.mean(data), out=centred)
 
-        # re-arrange fft result for zero speed at centre
-        return np.fft.fftshift(fft2d, (1,))
+        # Step 2 - MTI processing to remove static objects
+        history = self.mti_history[:, :, i_ant]
+        data_mti = workspace.get("mti", data.shape)
+        np.subtract(centred, history, out=data_mti)
+        # history = data * alpha + history * (1 - alpha)
+        np.multiply(history, 1 - self.mti_alpha, out=history)
+        np.multiply(centred, self.mti_alpha, out=centred)
+        np.add(history, centred, out=history)
+
+        if profile:
+            profiling.record("mti", start)
+
+        # Step 3 - calculate fft spectrum for the frame (region of interest only)
+        fft1d = fft_spectrum(data_mti, self.range_window, self.range_bins,
+                             out=workspace.get("range_fft", (num_chirps, num_range_bins), complex),
+                             workspace=workspace)
+        if profile:
+            start = time.perf_counter()
+
+        # Step 4 - Windowing the Data in doppler and FFT over the chirps,
+        # zero padded to num_doppler_bins (twice the chirps by default)
+        np.multiply(fft1d, self.doppler_window_matrix, out=fft1d)
+        fft2d = workspace.get("doppler_fft", (num_doppler_bins, num_range_bins), complex)
+        np.fft.fft(fft1d, n=num_doppler_bins, axis=0, out=fft2d)
+        np.multiply(fft2d, 1 / num_chirps, out=fft2d)
+
+        # re-arrange fft result for zero speed at centre (fftshift of an
+        # even length swaps the halves), distance is indicated on y axis
+        shift = num_doppler_bins - num_doppler_bins // 2
+        out[:, :num_doppler_bins - shift] = fft2d[shift:].T
+        out[:, num_doppler_bins - shift:] = fft2d[:shift].T
+        if profile:
+            profiling.record("doppler_fft", start)
+        return out
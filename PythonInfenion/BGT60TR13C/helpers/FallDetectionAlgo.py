@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+from collections import namedtuple
+
+from helpers import profiling
+from helpers.DopplerAlgo import DopplerAlgo
+from helpers.sliding_window import SlidingStats
+
+
+FallFeatures = namedtuple("features", ["velocity", "velocity_std", "energy", "energy_drop", "still_frames"])
+
+
+class FallDetectionAlgo:
+    """Streaming fall detection on the range-Doppler map
+
+    Every frame reduces the range-Doppler map to a few sliding features
+    (peak velocity, velocity variance, energy drop against the level before
+    the event, frames of stillness since). A small state machine raises the
+    alert when a fast movement is followed by the target lying still.
+    """
+
+    MONITORING = "monitoring"
+    IMPACT = "impact"
+    FALLEN = "fallen"
+
+    def __init__(self, num_samples_per_chirp, num_chirps_per_frame, geometry, range_bins=None, window_frames=8,
+                 fall_velocity_m_s=0.6, min_velocity_std_m_s=0.15, energy_drop_ratio=0.5, still_frames=4,
+                 impact_timeout_frames=10):
+        # geometry:                 RadarGeometry of the sequence, velocity of the Doppler bins
+        # range_bins:               range region of interest of the Doppler map
+        # window_frames:            number of frames the sliding features cover
+        # fall_velocity_m_s:        peak velocity starting a fall candidate
+        # min_velocity_std_m_s:     velocity spread needed for a sudden movement
+        # energy_drop_ratio:        relative motion energy drop of a still target
+        # still_frames:             frames of stillness confirming the fall
+        # impact_timeout_frames:    frames after the impact to wait for stillness
+        self.num_samples_per_chirp = num_samples_per_chirp
+        self.num_chirps_per_frame = num_chirps_per_frame
+
+        self.fall_velocity_m_s = fall_velocity_m_s
+        self.min_velocity_std_m_s = min_velocity_std_m_s
+        self.energy_drop_ratio = energy_drop_ratio
+        self.still_frames = still_frames
+        self.impact_timeout_frames = impact_timeout_frames
+
+        self.doppler = DopplerAlgo(num_samples_per_chirp, num_chirps_per_frame, 1, range_bins=range_bins)
+
+        # velocity of each Doppler bin (at the centre frequency of the chirp),
+        # zero speed is at the centre after fftshift
+        self.velocity_axis = geometry.velocity_axis_m_s
+        self.zero_velocity_bin = num_chirps_per_frame
+
+        self.velocity_stats = SlidingStats(window_frames)
+        self.energy_stats = SlidingStats(window_frames)
+        self.features = None
+        self.reset()
+
+    def reset(self):
+        """Clear a raised alert and start monitoring again"""
+        self.state = self.MONITORING
+        self.reference_energy = 0.0
+        self.frames_since_impact = 0
+        self.still_count = 0
+
+    def detect_fall(self, mat, range_doppler=None):
+        # mat:           chirp data of a single antenna
+        # range_doppler: range-Doppler map of 'mat' if already computed by a
+        #                shared processing stage, computed here otherwise
+        if range_doppler is None:
+            range_doppler = self.doppler.compute_doppler_map(mat, 0)
+
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+        velocity, energy = self.frame_features(range_doppler)
+        if profile:
+            start = profiling.record("detection", start)
+        self.update(velocity, energy)
+        if profile:
+            profiling.record("decision", start)
+        return self.state == self.FALLEN
+
+    def frame_features(self, range_doppler):
+        # peak radial velocity and motion energy of a single frame
+        doppler_spectrum = abs(range_doppler).sum(axis=0)
+        doppler_spectrum[self.zero_velocity_bin] = 0
+
+        peak_index = np.argmax(doppler_spectrum)
+        return self.velocity_axis[peak_index], float(doppler_spectrum.sum())
+
+    def update(self, velocity, energy):
+        # advance the sliding features and the alert state machine by a frame
+        self.velocity_stats.push(velocity)
+        velocity_std = np.sqrt(self.velocity_stats.variance())
+
+        if self.state == self.MONITORING:
+            if abs(velocity) > self.fall_velocity_m_s and velocity_std > self.min_velocity_std_m_s:
+                # energy level before the event, the current frame is not part of it
+                self.reference_energy = self.energy_stats.mean() if self.energy_stats.count else energy
+                self.state = self.IMPACT
+                self.frames_since_impact = 0
+                self.still_count = 0
+        elif self.state == self.IMPACT:
+            self.frames_since_impact += 1
+            # the peak velocity of a still target is noise, only its energy counts
+            if energy < (1 - self.energy_drop_ratio) * self.reference_energy:
+                self.still_count += 1
+            else:
+                self.still_count = 0
+
+            if self.still_count >= self.still_frames:
+                self.state = self.FALLEN
+            elif self.frames_since_impact > self.impact_timeout_frames:
+                self.state = self.MONITORING
+
+        # the reference level only follows the room while nothing happens
+        if self.state == self.MONITORING:
+            self.energy_stats.push(energy)
+
+        energy_drop = 1 - energy / self.reference_energy if self.reference_energy > 0 else 0.0
+        self.features = FallFeatures(velocity, velocity_std, energy, energy_drop, self.still_count)
@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+
+from helpers import profiling
+from helpers.DopplerAlgo import DopplerAlgo
+
+
+class GestureDetectionAlgo:
+    def __init__(self, num_samples, num_chirps, num_rx_antennas):
+        self.num_samples = num_samples
+        self.num_chirps = num_chirps
+        self.num_rx_antennas = num_rx_antennas
+        self.doppler = DopplerAlgo(num_samples, num_chirps, num_rx_antennas)
+
+    def detect_gesture(self, frame_data, rd_maps=None):
+        # rd_maps: range-Doppler maps of all antennas if already computed
+        #          (range x doppler x antenna)
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+
+        detection_occurred = False
+        for i_ant in range(self.num_rx_antennas):
+            if i_ant < frame_data.shape[0]:
+                mat = frame_data[i_ant, :, :]
+                try:
+                    if rd_maps is not None:
+                        dfft_dbfs = linear_to_dB(rd_maps[:, :, i_ant])
+                    else:
+                        dfft_dbfs = linear_to_dB(self.doppler.compute_doppler_map(mat, i_ant))
+                    if np.any(dfft_dbfs > -59):
+                        detection_occurred = True
+                        break
+                except IndexError as e:
+                    print(f"IndexError in compute_doppler_map: {e}")
+                    print(f"Shape of mat: {mat.shape}")
+                    print(f"i_ant: {i_ant}")
+                    continue
+
+        if profile:
+            profiling.record("detection", start)
+
+        if detection_occurred:
+            return "Gesture detected"
+        else:
+            return "No gesture detected"
+
+
+def linear_to_dB(x):
+    return 20 * np.log10(abs(x))
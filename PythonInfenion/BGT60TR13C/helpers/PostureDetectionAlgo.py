@@ -0,0 +1,186 @@
+import time
+
+import numpy as np
+from collections import namedtuple
+
+from helpers import profiling
+from helpers.fft_spectrum import default_roi_bins, fft_spectrum, reslice_roi
+from helpers.DigitalBeamForming2D import DigitalBeamForming2D, rx_positions_from_mask
+from helpers.DopplerAlgo import DopplerAlgo
+from helpers.RadarGeometry import blackmanharris_window
+
+
+class PostureDetectionAlgo:
+    def __init__(self, num_samples_per_chirp, num_chirps_per_frame, range_bins=None, geometry=None, sensor_height_m=1.0):
+        # range_bins:      range region of interest as a slice of range bins, see
+        #                  helpers.fft_spectrum.range_roi_bins to derive it from the
+        #                  room geometry. Only these bins are computed and the
+        #                  returned peaks are relative to its first bin.
+        # geometry:        RadarGeometry of the sequence, enables the height
+        #                  estimate if the RX antennas have a vertical baseline
+        # sensor_height_m: mounting height of the sensor above the floor
+        self.num_samples_per_chirp = num_samples_per_chirp
+        self.num_chirps_per_frame = num_chirps_per_frame
+
+        if range_bins is None:
+            range_bins = default_roi_bins(num_samples_per_chirp)
+        self.range_bins = range_bins
+        self.detect_start_sample = range_bins.start
+        self.detect_end_sample = range_bins.stop
+
+        self.threshold_presence = 0.0001
+
+        self.alpha_slow = 0.001
+        self.alpha_med = 0.05
+        self.alpha_fast = 0.6
+
+        self.presence_status = False
+        self.first_run = True
+        self.new_bins = False
+
+        self.window = blackmanharris_window(num_samples_per_chirp)
+
+        self.sensor_height_m = sensor_height_m
+        self.geometry = geometry
+        self.doppler = None
+        self.has_height = False
+        if geometry is not None and geometry.rx_mask is not None:
+            antenna_positions = rx_positions_from_mask(geometry.rx_mask)
+            self.dbf = DigitalBeamForming2D(antenna_positions, num_azimuth_beams=9, num_elevation_beams=31,
+                                            max_azimuth_degrees=60, max_elevation_degrees=60)
+            self.has_height = len(self.dbf.elevation_axis_rad) > 1
+        if self.has_height:
+            self.num_rx_antennas = geometry.num_rx_antennas
+            self._height_buffers(range_bins)
+
+    def _height_buffers(self, range_bins):
+        # Doppler maps of the region of interest for the height estimate; the
+        # MTI history covers all range bins and is kept when the region changes
+        doppler = DopplerAlgo(self.num_samples_per_chirp, self.num_chirps_per_frame, self.num_rx_antennas,
+                              range_bins=range_bins)
+        if self.doppler is not None:
+            doppler.mti_history = self.doppler.mti_history
+        self.doppler = doppler
+        self.range_axis_m = self.geometry.range_axis_m[range_bins]
+        self.rd_spectrum = np.zeros((len(self.range_axis_m), 2 * self.num_chirps_per_frame, self.num_rx_antennas),
+                                    dtype=complex)
+
+    def set_range_bins(self, range_bins=None):
+        # Change the range region of interest (the default if None) between
+        # two frames. The averages of the bins in both regions are kept, so
+        # the detection continues without starting over.
+        if range_bins is None:
+            range_bins = default_roi_bins(self.num_samples_per_chirp)
+        if not self.first_run:
+            self.slow_avg = reslice_roi(self.slow_avg, self.range_bins, range_bins)
+            self.fast_avg = reslice_roi(self.fast_avg, self.range_bins, range_bins)
+            self.new_bins = True
+        self.range_bins = range_bins
+        self.detect_start_sample = range_bins.start
+        self.detect_end_sample = range_bins.stop
+        if self.has_height:
+            self._height_buffers(range_bins)
+
+    def posture(self, mat, range_fft=None):
+        # mat:       chirp data of a single antenna
+        # range_fft: range spectrum of 'mat' over the region of interest if
+        #            already computed
+        alpha_slow = self.alpha_slow
+        alpha_med = self.alpha_med
+        alpha_fast = self.alpha_fast
+
+        if range_fft is None:
+            range_fft = fft_spectrum(mat, self.window, self.range_bins)
+
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+
+        fft_spec_abs = abs(range_fft)
+        fft_norm = np.divide(fft_spec_abs.sum(axis=0), self.num_chirps_per_frame)
+
+        if self.first_run: 
+            self.slow_avg = fft_norm
+            self.fast_avg = fft_norm
+            self.first_run = False
+        elif self.new_bins:
+            # bins new to the region of interest start from their first value
+            new = np.isnan(self.slow_avg)
+            self.slow_avg[new] = fft_norm[new]
+            self.fast_avg[new] = fft_norm[new]
+            self.new_bins = False
+
+        if not self.presence_status:
+            alpha_used = alpha_med
+        else:
+            alpha_used = alpha_slow
+
+        self.slow_avg = self.slow_avg * (1 - alpha_used) + fft_norm * alpha_used
+        self.fast_avg = self.fast_avg * (1 - alpha_fast) + fft_norm * alpha_fast
+        data = self.fast_avg - self.slow_avg
+
+        self.presence_status = np.max(data) > self.threshold_presence
+        
+        # scipy.signal takes most of the start-up time, imported on the first frame
+        from scipy.signal import find_peaks
+        peaks, _ = find_peaks(data, height=self.threshold_presence)
+        num_persons = len(peaks)
+        if profile:
+            profiling.record("detection", start)
+        
+        return namedtuple("state", ["presence", "num_persons", "peaks", "data"])(self.presence_status, num_persons, peaks, data)
+
+    def height(self, frame, rd_maps=None):
+        # height above the floor of the strongest moving reflector, from the
+        # joint azimuth / elevation beamforming over all RX antennas
+        # frame:   num_rx_antennas x num_chirps_per_frame x num_samples_per_chirp
+        # rd_maps: range Doppler maps of all range bins (num_samples_per_chirp
+        #          x doppler x num_rx_antennas), e.g. the shared product of
+        #          the pipeline; computed from the frame if None
+        if rd_maps is not None:
+            rd_spectrum = rd_maps[self.range_bins]
+        else:
+            for i_ant in range(self.num_rx_antennas):
+                self.rd_spectrum[:, :, i_ant] = self.doppler.compute_doppler_map(frame[i_ant, :, :], i_ant)
+            rd_spectrum = self.rd_spectrum
+
+        power = self.dbf.run(rd_spectrum)
+        r, _, e = np.unravel_index(np.argmax(power), power.shape)
+        return self.sensor_height_m + self.range_axis_m[r] * np.sin(self.dbf.elevation_axis_rad[e])
+
+    def classify(self, state, frame, max_range_m, rd_maps=None):
+        # posture label of a frame: from the height if the antennas allow it,
+        # otherwise from the distance of the nearest moving reflector
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+        label = self._classify(state, frame, max_range_m, rd_maps)
+        if profile:
+            profiling.record("decision", start)
+        return label
+
+    def _classify(self, state, frame, max_range_m, rd_maps=None):
+        if not state.presence:
+            return "no_presence"
+        if self.has_height:
+            return self.posture_from_height(self.height(frame, rd_maps))
+        if len(state.peaks) == 0:
+            return "unknown"
+
+        distance = (state.peaks[0] / self.num_samples_per_chirp) * max_range_m
+        if distance <= 0.50:
+            return "standing"
+        elif distance <= 0.70:
+            return "sitting"
+        elif distance <= 0.90:
+            return "sleeping"
+        return "unknown"
+
+    @staticmethod
+    def posture_from_height(height_m):
+        # the strongest reflector is the torso
+        if height_m > 1.0:
+            return "standing"
+        elif height_m > 0.5:
+            return "sitting"
+        return "sleeping"
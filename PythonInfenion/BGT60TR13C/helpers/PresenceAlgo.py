@@ -0,0 +1,147 @@
+import time
+
+import numpy as np
+from collections import namedtuple
+
+from helpers import profiling
+from helpers.fft_spectrum import default_roi_bins, fft_spectrum, reslice_roi
+from helpers.RadarGeometry import blackmanharris_window
+
+
+class PresenceAlgo:
+    def __init__(self, num_samples_per_chirp, num_chirps_per_frame, range_bins=None):
+        # range_bins: range region of interest as a slice of range bins, see
+        #             helpers.fft_spectrum.range_roi_bins to derive it from the
+        #             room geometry. Only these bins are computed and the
+        #             returned peaks are relative to its first bin.
+        self.num_samples_per_chirp = num_samples_per_chirp
+        self.num_chirps_per_frame = num_chirps_per_frame
+
+        if range_bins is None:
+            range_bins = default_roi_bins(num_samples_per_chirp)
+        self.range_bins = range_bins
+        self.detect_start_sample = range_bins.start
+        self.detect_end_sample = range_bins.stop
+
+        self.threshold_presence = 0.0001
+
+        self.alpha_slow = 0.001
+        self.alpha_med = 0.05
+        self.alpha_fast = 0.6
+
+        self.presence_status = False
+        self.first_run = True
+        self.new_bins = False
+
+        self.window = blackmanharris_window(num_samples_per_chirp)
+
+    def set_range_bins(self, range_bins=None):
+        # Change the range region of interest (the default if None) between
+        # two frames. The averages of the bins in both regions are kept, so
+        # the detection continues without starting over.
+        if range_bins is None:
+            range_bins = default_roi_bins(self.num_samples_per_chirp)
+        if not self.first_run:
+            self.slow_avg = reslice_roi(self.slow_avg, self.range_bins, range_bins)
+            self.fast_avg = reslice_roi(self.fast_avg, self.range_bins, range_bins)
+            self.new_bins = True
+        self.range_bins = range_bins
+        self.detect_start_sample = range_bins.start
+        self.detect_end_sample = range_bins.stop
+
+    def presence(self, mat, range_fft=None):
+        # mat:       chirp data of a single antenna
+        # range_fft: range spectrum of 'mat' over the region of interest if
+        #            already computed, e.g. by range_spectrum()
+        alpha_slow = self.alpha_slow
+        alpha_med = self.alpha_med
+        alpha_fast = self.alpha_fast
+
+        if range_fft is None:
+            range_fft = fft_spectrum(mat, self.window, self.range_bins)
+
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+
+        fft_norm = self.range_profile(mat, range_fft)
+
+        if self.first_run:  
+            self.slow_avg = fft_norm
+            self.fast_avg = fft_norm
+            self.first_run = False
+        elif self.new_bins:
+            # bins new to the region of interest start from their first value
+            new = np.isnan(self.slow_avg)
+            self.slow_avg[new] = fft_norm[new]
+            self.fast_avg[new] = fft_norm[new]
+            self.new_bins = False
+
+        if not self.presence_status:
+            alpha_used = alpha_med
+        else:
+            alpha_used = alpha_slow
+
+        self.slow_avg = self.slow_avg * (1 - alpha_used) + fft_norm * alpha_used
+        self.fast_avg = self.fast_avg * (1 - alpha_fast) + fft_norm * alpha_fast
+        data = self.fast_avg - self.slow_avg
+
+        self.presence_status = np.max(data) > self.threshold_presence
+
+        # scipy.signal takes most of the start-up time, imported on the first frame
+        from scipy.signal import find_peaks
+        peaks, _ = find_peaks(data, height=self.threshold_presence)
+        num_persons = len(peaks)
+        if profile:
+            profiling.record("detection", start)
+
+        return namedtuple("state", ["presence", "num_persons", "peaks", "data"])(self.presence_status, num_persons, peaks, data)
+
+    def range_profile(self, mat, range_fft=None):
+        # magnitude of the range spectrum over the region of interest,
+        # averaged over the chirps (num_range_bins)
+        if range_fft is None:
+            range_fft = fft_spectrum(mat, self.window, self.range_bins)
+        return np.divide(abs(range_fft).sum(axis=0), self.num_chirps_per_frame)
+
+    def range_spectrum(self, frame):
+        # range spectra of all antennas over the region of interest in one batch
+        # frame: num_antennas x num_chirps x num_samples
+        return fft_spectrum(frame, self.window, self.range_bins)
+
+    def estimate_aoa(self, range_fft, peaks, antenna_distance, wavelength):
+        # range_fft: range spectra of all antennas from range_spectrum()
+        #            (num_antennas x num_chirps x num_range_bins)
+        # peaks:     range bins of all targets, relative to the region of interest
+        # returns the angle of arrival in degrees of every peak, measured
+        # between antenna 0 and each other antenna (num_peaks x num_antennas-1)
+        bins = range_fft[:, :, peaks]
+
+        # phase differences from the conjugate products, averaged over chirps
+        # before taking the angle so the phase does not wrap per chirp
+        cross = np.mean(bins[1:] * np.conj(bins[:1]), axis=1)
+        phase_diffs = np.angle(cross).T
+
+        sin_theta = phase_diffs * wavelength / (2 * np.pi * antenna_distance)
+        sin_theta = np.clip(sin_theta, -1, 1)
+        return np.degrees(np.arcsin(sin_theta))
+    
+    def cluster_peaks(self, peaks, aoa_estimates):
+        # sklearn is only needed here, imported on first use
+        from sklearn.cluster import DBSCAN
+
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+
+        features = np.column_stack((peaks, aoa_estimates))
+
+        epsilon = 0.2 
+        min_samples = 7
+        db = DBSCAN(eps=epsilon, min_samples=min_samples).fit(features)
+
+        labels = db.labels_
+
+        if profile:
+            profiling.record("clustering", start)
+        return labels
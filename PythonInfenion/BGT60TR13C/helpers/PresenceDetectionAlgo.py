@@ -0,0 +1,59 @@
+import numpy as np
+
+from helpers.DigitalBeamForming import DigitalBeamForming
+from helpers.DopplerAlgo import DopplerAlgo
+from helpers.RadarGeometry import angle_axis_deg
+from helpers.workspace import Workspace
+
+
+def beam_range_energy(rd_beam_formed, workspace: Workspace):
+    # energy of every range bin and beam of the range Doppler beams (range x
+    # doppler x beams), summed over Doppler into a buffer of 'workspace'
+    magnitude = workspace.get("magnitude", rd_beam_formed.shape)
+    np.abs(rd_beam_formed, out=magnitude)
+    np.square(magnitude, out=magnitude)
+    energy = workspace.get("beam_range_energy", (rd_beam_formed.shape[0], rd_beam_formed.shape[2]))
+    np.sum(magnitude, axis=1, out=energy)
+    return energy
+
+
+class PresenceDetectionAlgo:
+    def __init__(self, num_samples, num_chirps, num_rx_antennas, max_angle_degrees=60, num_beams=80, range_bins=None):
+        # direction of the strongest reflector from digital beamforming
+        # range_bins: range region of interest, range bins outside the room
+        #             are never computed
+        self.num_samples = num_samples
+        self.num_chirps = num_chirps
+        self.num_rx_antennas = num_rx_antennas
+        self.num_beams = num_beams
+
+        self.range_bins = range_bins if range_bins is not None else slice(0, num_samples)
+        self.num_range_bins = self.range_bins.stop - self.range_bins.start
+
+        self.doppler = DopplerAlgo(num_samples, num_chirps, num_rx_antennas, range_bins=self.range_bins)
+        self.dbf = DigitalBeamForming(num_rx_antennas, num_beams=num_beams, max_angle_degrees=max_angle_degrees)
+        self.angle_axis = angle_axis_deg(num_beams, max_angle_degrees)
+        self.workspace = Workspace()
+
+    def process_frame(self, frame):
+        rd_spectrum = self.workspace.get("rd_spectrum", (self.num_range_bins, 2 * self.num_chirps,
+                                                         self.num_rx_antennas), complex)
+
+        for i_ant in range(self.num_rx_antennas):
+            mat = frame[i_ant, :, :]
+            self.doppler.compute_doppler_map(mat, i_ant, out=rd_spectrum[:, :, i_ant])
+        return self.angle_from_maps(rd_spectrum)
+
+    def angle_from_maps(self, rd_spectrum):
+        # dominant angle of the range Doppler maps of the region of interest
+        # (range x doppler x antennas), from the beams of this detector
+        rd_beam_formed = self.workspace.get("beams", rd_spectrum.shape[:2] + (self.num_beams,), complex)
+        return self.angle_from_beams(self.dbf.run(rd_spectrum, out=rd_beam_formed))
+
+    def angle_from_beams(self, rd_beam_formed):
+        # dominant angle of the range Doppler beams (range x doppler x beams),
+        # from the energy of every range and beam: the squared norm over
+        # Doppler has its maximum where the norm has
+        energy = beam_range_energy(rd_beam_formed, self.workspace)
+        max_idx = np.unravel_index(energy.argmax(), energy.shape)
+        return self.angle_axis[max_idx[1]]
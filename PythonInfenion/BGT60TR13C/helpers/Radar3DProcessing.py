@@ -0,0 +1,183 @@
+import matplotlib.pyplot as plt
+import queue
+import threading
+import time
+
+from ifxradarsdk.fmcw import DeviceFmcw
+from ifxradarsdk.common.exceptions import ErrorFrameAcquisitionFailed
+
+from helpers.drop_oldest_queue import DropOldestQueue
+from helpers.point_cloud import PointBuffer, PointCloudRenderer, TargetDetector
+from helpers.quality import QualityController, QualityLevel
+from helpers.RadarGeometry import RadarGeometry
+
+# Quality levels of the DSP, from the best to the cheapest: options of the
+# TargetDetector, plus the fraction of the range that is processed and how
+# many results go into one plot update. Each level keeps the savings of the
+# ones before it.
+QUALITY_LEVELS = [
+    QualityLevel("full"),
+    QualityLevel("beams_14x8", num_azimuth_beams=14, num_elevation_beams=8),
+    QualityLevel("no_doppler_padding", num_azimuth_beams=14, num_elevation_beams=8, doppler_padding=1),
+    QualityLevel("half_range", num_azimuth_beams=14, num_elevation_beams=8, doppler_padding=1,
+                 range_fraction=0.5),
+    QualityLevel("render_every_4", num_azimuth_beams=14, num_elevation_beams=8, doppler_padding=1,
+                 range_fraction=0.5, render_every=4),
+]
+
+class Radar3DProcessing:
+    # Three stages, each in a thread of its own:
+    #
+    #   acquisition -> frames  -> DSP -> results -> rendering (GUI thread)
+    #
+    # Both queues are bounded and drop the oldest entry when the next stage
+    # falls behind. Acquisition always keeps up with the sensor, and a slow
+    # plot never holds back the DSP: it takes all results queued since its
+    # last update.
+    #
+    # If the DSP takes longer than the frame repetition time, frames would be
+    # dropped; instead a QualityController steps down through QUALITY_LEVELS
+    # and back up once the DSP has headroom again.
+
+    def __init__(self, config, max_range_m=None, history=100, max_points=2048, frame_queue_size=8,
+                 adaptive=True):
+        # max_range_m:      depth of the room, range bins beyond it are never computed
+        # history:          number of frames over which targets fade out of the plot
+        # max_points:       size of the point buffer, the oldest targets are dropped
+        #                   once it is full
+        # frame_queue_size: frames waiting for the DSP before the oldest is dropped
+        # adaptive:         lower the quality while the DSP overruns the frame time
+        self.config = config
+        self.device = DeviceFmcw()
+        self.setup_device()
+        
+        self.max_range_m = max_range_m
+        self.detector = TargetDetector(config, self.geometry, max_range_m)
+        self.range_axis_m = self.detector.range_axis_m
+        self.render_every = 1
+        self.render_skipped = 0
+        self.quality = None
+        if adaptive:
+            self.quality = QualityController(QUALITY_LEVELS, config.frame_repetition_time_s,
+                                             on_change=self.apply_quality, name="3D processing")
+        
+        self.fig = plt.figure(figsize=(10, 8))
+        self.ax = self.fig.add_subplot(111, projection='3d')
+        self.history = history
+        self.targets = PointBuffer(max_points)
+        self.renderer = PointCloudRenderer(self.ax, self.targets, self.range_axis_m[-1], history)
+        
+        self.consecutive_failures = 0
+        self.cooldown_time = 1.0
+        self.last_failure_time = 0
+
+        self.frames = DropOldestQueue(frame_queue_size)
+        self.results = DropOldestQueue(history)
+        self.running = False
+        self.threads = []
+        self.frames_with_targets = 0
+        
+    def setup_device(self):
+        sequence = self.device.create_simple_sequence(self.config)
+        self.device.set_acquisition_sequence(sequence)
+        metrics = self.device.metrics_from_sequence(sequence.loop.sub_sequence.contents)
+        self.geometry = RadarGeometry.from_config(self.config, max_range_m=metrics.max_range_m)
+        self.num_rx_antennas = self.geometry.num_rx_antennas
+        print(f"Number of RX antennas: {self.num_rx_antennas}")
+        
+    def acquire_frame(self):
+        # returns the next frame, or None if the acquisition failed
+        if time.time() - self.last_failure_time < self.cooldown_time:
+            print("In cooldown period, skipping frame")
+            return None
+
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                frame_contents = self.device.get_next_frame()
+                self.consecutive_failures = 0
+                return frame_contents[0]
+            except ErrorFrameAcquisitionFailed:
+                print(f"Frame acquisition failed. Attempt {attempt + 1}/{max_retries}")
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= 5:
+                    print("Too many consecutive failures. Entering cooldown period.")
+                    self.last_failure_time = time.time()
+                    return None
+                time.sleep(0.05)
+            except Exception as e:
+                print(f"Unexpected error during frame acquisition: {e}")
+                return None
+        print(f"Failed to acquire frame after {max_retries} attempts")
+        return None
+
+    def apply_quality(self, level):
+        # called from the DSP thread between two frames; the MTI history covers
+        # all samples of the chirps, the new detector continues with it
+        options = dict(level.options)
+        self.render_every = options.pop("render_every", 1)
+        max_range_m = self.range_axis_m[-1] * options.pop("range_fraction", 1.0)
+        detector = TargetDetector(self.config, self.geometry, max_range_m, **options)
+        detector.doppler.mti_history = self.detector.doppler.mti_history
+        self.detector = detector
+
+    def detect_targets(self, frame):
+        # frame: num_rx_antennas x num_chirps_per_frame x num_samples_per_chirp
+        # returns the clustered targets as x/y/z points in metres
+        return self.detector.detect(frame)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.threads = [threading.Thread(target=self._acquisition_loop, daemon=True),
+                        threading.Thread(target=self._dsp_loop, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        print(f"Frames: {self.frames.stats()}, results: {self.results.stats()}")
+        if self.quality is not None:
+            print(f"Quality: {self.quality.stats()}")
+
+    def _acquisition_loop(self):
+        frame_number = 0
+        while self.running:
+            frame = self.acquire_frame()
+            if frame is None:
+                time.sleep(self.config.frame_repetition_time_s)
+                continue
+            self.frames.put((frame_number, frame))
+            frame_number += 1
+
+    def _dsp_loop(self):
+        while self.running:
+            try:
+                frame_number, frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                targets = self.detect_targets(frame)
+            except Exception as e:
+                print(f"Error during frame processing: {e}")
+                continue
+            if self.quality is not None:
+                self.quality.update(time.perf_counter() - start)
+            self.results.put((frame_number, targets))
+            if len(targets):
+                self.frames_with_targets += 1
+
+    def visualize_3d(self):
+        # every frame is added, also without targets, so that older ones fade
+        for frame_number, targets in self.results.get_all():
+            self.targets.append(targets, frame_number)
+        # at the lowest quality the plot is updated every few calls only
+        self.render_skipped += 1
+        if self.render_skipped >= self.render_every:
+            self.render_skipped = 0
+            self.renderer.update()
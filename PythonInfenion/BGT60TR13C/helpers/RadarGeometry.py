@@ -0,0 +1,101 @@
+from functools import lru_cache
+
+import numpy as np
+
+from helpers.fft_spectrum import range_roi_bins
+
+# scipy.constants.c, without the import time of scipy.constants
+SPEED_OF_LIGHT_M_S = 299792458.0
+
+
+@lru_cache(maxsize=None)
+def blackmanharris_window(length: int):
+    """Blackman-Harris window as a 1 x length row, shared by all algorithms
+
+    The array is read-only since every caller gets the same instance.
+    """
+    # same as scipy.signal.windows.blackmanharris, computed here because
+    # importing scipy.signal alone takes over a second at startup
+    if length == 1:
+        window = np.ones((1, 1))
+    else:
+        n = 2 * np.pi * np.arange(length) / (length - 1)
+        window = (0.35875 - 0.48829 * np.cos(n) + 0.14128 * np.cos(2 * n) - 0.01168 * np.cos(3 * n)).reshape(1, length)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=None)
+def angle_axis_deg(num_beams: int, max_angle_degrees: float):
+    """Beam angles in degrees, from -max_angle_degrees to +max_angle_degrees"""
+    angles = np.linspace(-max_angle_degrees, max_angle_degrees, num_beams)
+    angles.flags.writeable = False
+    return angles
+
+
+class RadarGeometry:
+    """Axes, windows and FFT sizes of an acquisition sequence
+
+    Everything here only depends on the sequence, so it is computed once when
+    the sequence is set and shared by all algorithms instead of being rebuilt
+    per frame or per algorithm.
+    """
+
+    def __init__(self, num_samples: int, num_chirps: int, num_rx_antennas: int, start_frequency_Hz: float,
+                 end_frequency_Hz: float, chirp_repetition_time_s: float, frame_repetition_time_s: float = None,
+                 max_range_m: float = None, rx_mask: int = None):
+        """Create the geometry of a sequence
+
+        Parameters:
+            - num_samples:              Number of samples in a single chirp
+            - num_chirps:               Number of chirps per frame
+            - num_rx_antennas:          Number of activated RX antennas
+            - start_frequency_Hz:       Chirp start frequency
+            - end_frequency_Hz:         Chirp end frequency
+            - chirp_repetition_time_s:  Chirp repetition time
+            - frame_repetition_time_s:  Frame repetition time
+            - max_range_m:              Maximum range as reported by the device
+                                        metrics, derived from the chirp if None
+            - rx_mask:                  RX mask of the chirp, if known
+        """
+        self.num_samples = num_samples
+        self.num_chirps = num_chirps
+        self.num_rx_antennas = num_rx_antennas
+        self.rx_mask = rx_mask
+        self.chirp_repetition_time_s = chirp_repetition_time_s
+        self.frame_repetition_time_s = frame_repetition_time_s
+
+        # all algorithms zero pad to twice the number of samples / chirps
+        self.range_fft_size = 2 * num_samples
+        self.doppler_fft_size = 2 * num_chirps
+
+        bandwidth_hz = abs(end_frequency_Hz - start_frequency_Hz)
+        self.center_frequency_Hz = (start_frequency_Hz + end_frequency_Hz) / 2
+        self.wavelength = SPEED_OF_LIGHT_M_S / self.center_frequency_Hz
+
+        self.range_bin_length = SPEED_OF_LIGHT_M_S / (2 * bandwidth_hz * self.range_fft_size / num_samples)
+        self.max_range_m = max_range_m if max_range_m is not None else self.range_bin_length * num_samples
+        self.max_speed_m_s = self.wavelength / (4 * chirp_repetition_time_s)
+
+        self.range_axis_m = np.arange(num_samples) * self.range_bin_length
+        doppler_freq = np.fft.fftshift(np.fft.fftfreq(self.doppler_fft_size, chirp_repetition_time_s))
+        self.velocity_axis_m_s = doppler_freq * self.wavelength / 2
+
+        self.range_window = blackmanharris_window(num_samples)
+        self.doppler_window = blackmanharris_window(num_chirps)
+
+    @classmethod
+    def from_config(cls, config, max_range_m: float = None):
+        """Create the geometry of a FmcwSimpleSequenceConfig"""
+        chirp = config.chirp
+        return cls(chirp.num_samples, config.num_chirps, bin(chirp.rx_mask).count('1'),
+                   chirp.start_frequency_Hz, chirp.end_frequency_Hz, config.chirp_repetition_time_s,
+                   config.frame_repetition_time_s, max_range_m, chirp.rx_mask)
+
+    def angle_axis_deg(self, num_beams: int, max_angle_degrees: float):
+        """Beam angles in degrees of a beamformer with num_beams beams"""
+        return angle_axis_deg(num_beams, max_angle_degrees)
+
+    def range_bins(self, min_range_m: float = None, max_range_m: float = None):
+        """Range region of interest between min_range_m and max_range_m as a slice of range bins"""
+        return range_roi_bins(min_range_m, max_range_m, self.range_bin_length, self.num_samples)
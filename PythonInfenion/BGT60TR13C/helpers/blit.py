@@ -0,0 +1,72 @@
+def canvas_is_visible(canvas) -> bool:
+    """False if the canvas is hidden, minimized or fully covered, as far as
+    the backend can tell"""
+    if hasattr(canvas, "visibleRegion"):
+        # Qt: the canvas itself is a widget (FigureCanvasQTAgg)
+        return canvas.isVisible() and not canvas.visibleRegion().isEmpty()
+    if hasattr(canvas, "get_tk_widget"):
+        return bool(canvas.get_tk_widget().winfo_viewable())
+    return True
+
+
+class BlitRenderer:
+    """Redraws only the changing artists of a figure
+
+    The static part of the figure (background image, axes, ticks, labels,
+    colorbar) is rendered once and cached as a bitmap. An update restores
+    the bitmap, draws the animated artists on top and blits the result.
+    The cache is rebuilt automatically whenever the figure is fully redrawn,
+    e.g. after a resize. Updates are skipped while the canvas is not visible.
+    """
+
+    def __init__(self, canvas, artists=(), is_visible=canvas_is_visible):
+        """Create a renderer
+
+        Parameters:
+            - canvas:       FigureCanvas of the figure
+            - artists:      artists that change between updates
+            - is_visible:   called with the canvas, updates are skipped if
+                            it returns False
+        """
+        self.canvas = canvas
+        self.is_visible = is_visible
+        self.artists = []
+        self.background = None
+        self.skipped = 0
+        for artist in artists:
+            self.add_artist(artist)
+        self._draw_event = canvas.mpl_connect("draw_event", self._on_draw)
+
+    def add_artist(self, artist):
+        # animated artists are left out of full redraws and the background
+        artist.set_animated(True)
+        self.artists.append(artist)
+        self.background = None
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        figure = self.canvas.figure
+        for artist in self.artists:
+            figure.draw_artist(artist)
+
+    def update(self) -> bool:
+        """Show the current state of the animated artists, returns False if
+        the update was skipped"""
+        if not self.is_visible(self.canvas):
+            self.skipped += 1
+            return False
+        if self.background is None:
+            # full render, _on_draw caches the background
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self._draw_artists()
+            self.canvas.blit(self.canvas.figure.bbox)
+        self.canvas.flush_events()
+        return True
+
+    def close(self):
+        self.canvas.mpl_disconnect(self._draw_event)
@@ -2,10 +2,8 @@ import argparse
 import numpy as np
 from matplotlib import pyplot as plt
 
-from ifxradarsdk import get_version_full
-from ifxradarsdk.fmcw import DeviceFmcw
-from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwMetrics
 from helpers.DistanceAlgo import *
+from helpers.blit import BlitRenderer
 
 # -------------------------------------------------
 # Presentation
@@ -14,9 +12,10 @@ from helpers.DistanceAlgo import *
 class Draw:
     # Draws plots for data - each antenna is in separated plot
 
-    def __init__(self, max_range_m, num_ant, num_samples):
+    def __init__(self, max_range_m, num_ant, num_samples, range_bins=None):
         # max_range_m:  maximum supported range
         # num_ant:      number of available antennas
+        # range_bins:   range region of interest of the plotted data
 
         self._num_ant = num_ant
         self._pln = []
@@ -31,6 +30,8 @@ class Draw:
             0,
             max_range_m,
             num_samples)
+        if range_bins is not None:
+            self._dist_points = self._dist_points[range_bins]
 
         self._fig.canvas.mpl_connect('close_event', self.close)
         self._is_window_open = True
@@ -62,6 +63,9 @@ class Draw:
             ax.set_title("Antenna #" + str(i_ant))
         self._fig.tight_layout()
 
+        # axes are static, only the lines are redrawn
+        self._renderer = BlitRenderer(self._fig.canvas, self._pln)
+
     def _draw_next_time(self, data_all_antennas):
         # data_all_antennas: array of raw data for each antenna
 
@@ -78,8 +82,7 @@ class Draw:
             else:
                 self._draw_next_time(data_all_antennas)
 
-            self._fig.canvas.draw_idle()
-            self._fig.canvas.flush_events()
+            self._renderer.update()
 
     def close(self, event=None):
         if self.is_open():
@@ -115,6 +118,10 @@ def parse_program_arguments(description, def_nframes, def_frate):
 # Main logic
 # -------------------------------------------------
 if __name__ == '__main__':
+    from ifxradarsdk import get_version_full
+    from ifxradarsdk.fmcw import DeviceFmcw
+    from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwMetrics
+
     args = parse_program_arguments(
         '''Displays distance plot from Radar Data''',
         def_nframes=50,
@@ -156,7 +163,7 @@ if __name__ == '__main__':
         device.set_acquisition_sequence(sequence)
 
         algo = DistanceAlgo(chirp, chirp_loop.loop.num_repetitions)
-        draw = Draw(metrics.max_range_m, num_rx_antennas, chirp.num_samples)
+        draw = Draw(metrics.max_range_m, num_rx_antennas, chirp.num_samples, algo.range_bins)
 
         for frame_number in range(args.nframes):  # for each frame
             if not draw.is_open():
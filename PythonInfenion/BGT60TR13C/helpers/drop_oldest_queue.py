@@ -0,0 +1,44 @@
+import queue
+import threading
+from collections import deque
+
+
+class DropOldestQueue:
+    """Bounded queue between threads, drops the oldest item when full
+
+    The producer never blocks: a consumer that falls behind loses the
+    oldest items instead of slowing down the producer.
+    """
+
+    def __init__(self, maxsize: int):
+        self.items = deque(maxlen=maxsize)
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self.lock:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.put_count += 1
+            self.not_empty.notify()
+
+    def get(self, timeout: float = None):
+        """Remove and return the oldest item, raises queue.Empty on timeout"""
+        with self.lock:
+            if not self.not_empty.wait_for(lambda: self.items, timeout):
+                raise queue.Empty
+            return self.items.popleft()
+
+    def get_all(self) -> list:
+        """Remove and return all items without waiting, oldest first"""
+        with self.lock:
+            items = list(self.items)
+            self.items.clear()
+            return items
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"put": self.put_count, "dropped": self.dropped, "queued": len(self.items)}
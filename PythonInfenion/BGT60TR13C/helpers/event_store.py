@@ -0,0 +1,231 @@
+import json
+import math
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from helpers.usecases import json_default
+
+# Persistent store of detection events in SQLite. Detectors report their
+# state every frame; only transitions are kept, a state equal to the last
+# one stored for its event type is dropped before it reaches the database.
+# Rows are written by a single writer thread in batches, one transaction
+# per batch, so record() never waits for the disk: it queues the event and
+# returns. The database runs in WAL mode, readers (query(), other
+# processes) do not block the writer and the writer does not block them.
+#
+# Table events: time (seconds since the epoch), type (e.g. the use case),
+# value (the state as JSON), frame number and data (further results as
+# JSON). Indexed by time and by type and time, so "falls in the last week"
+# reads only the rows of that type and week.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    type TEXT NOT NULL,
+    value TEXT NOT NULL,
+    frame INTEGER,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_time ON events (time);
+CREATE INDEX IF NOT EXISTS events_type_time ON events (type, time);
+"""
+
+# steps of the states of the use cases that vary from frame to frame: the
+# angle of the presence use case in degrees
+STATE_STEPS = {"presence": 10.0}
+
+_CLOSE = object()
+
+
+def _encode(value) -> str:
+    return json.dumps(value, default=json_default)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=10.0)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class EventStore:
+    """Stores the state transitions of the detectors in an SQLite database"""
+
+    def __init__(self, path: str, steps: dict = None, batch_size: int = 256, flush_interval_s: float = 0.5,
+                 max_queued: int = 10000):
+        """Open or create the database and start the writer thread
+
+        Parameters:
+            - path:             SQLite database file
+            - steps:            event type -> step to which numeric states
+                                are rounded before they are compared and
+                                stored, for states that vary slightly from
+                                frame to frame, default STATE_STEPS
+            - batch_size:       most events written in one transaction
+            - flush_interval_s: longest time an event waits for its batch
+            - max_queued:       events waiting for the writer; when the disk
+                                falls this far behind, further events are
+                                dropped and counted instead of blocking
+        """
+        self.path = path
+        self.steps = STATE_STEPS if steps is None else steps
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+
+        connection = _connect(path)
+        with connection:
+            connection.executescript(SCHEMA)
+        # the last stored state of every type, so a restart does not store
+        # the current states again
+        rows = connection.execute("SELECT type, value FROM events WHERE id IN "
+                                  "(SELECT MAX(id) FROM events GROUP BY type)").fetchall()
+        connection.close()
+        self.last_values = {event_type: json.loads(value) for event_type, value in rows}
+
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.recorded = 0
+        self.unchanged = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.thread = threading.Thread(target=self._write_loop, name="event_store", daemon=True)
+        self.thread.start()
+
+    def record(self, event_type: str, value, frame_number: int = None, data: dict = None,
+               timestamp: float = None) -> bool:
+        """Queue the state of a detector if it differs from the last one of
+        its type, returns whether it was queued. Called from any thread,
+        never blocks on the database."""
+        step = self.steps.get(event_type)
+        if step and value is not None and not isinstance(value, (bool, np.bool_)):
+            value = float(value)
+            if not math.isnan(value):
+                value = round(value / step) * step
+        with self.lock:
+            self.recorded += 1
+            known = event_type in self.last_values
+            last = self.last_values.get(event_type)
+            if known and (last == value or (last != last and value != value)):
+                self.unchanged += 1
+                return False
+            self.last_values[event_type] = value
+        try:
+            self.queue.put_nowait((time.time() if timestamp is None else timestamp, event_type, value,
+                                   frame_number, data))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+                # the transition is recorded again with the next state
+                if self.last_values.get(event_type) is value:
+                    if known:
+                        self.last_values[event_type] = last
+                    else:
+                        del self.last_values[event_type]
+            return False
+        return True
+
+    def _write_loop(self):
+        connection = _connect(self.path)
+        # WAL commits without syncing, a power loss may lose the last batches
+        # but never corrupts the database
+        connection.execute("PRAGMA synchronous=NORMAL")
+        closing = False
+        while not closing:
+            event = self.queue.get()
+            if event is _CLOSE:
+                break
+            batch = [event]
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                try:
+                    event = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if event is _CLOSE:
+                    closing = True
+                    break
+                batch.append(event)
+
+            rows = [(timestamp, event_type, _encode(value), frame_number,
+                     None if data is None else _encode(data))
+                    for timestamp, event_type, value, frame_number, data in batch]
+            with connection:
+                connection.executemany("INSERT INTO events (time, type, value, frame, data) VALUES (?, ?, ?, ?, ?)",
+                                       rows)
+            with self.lock:
+                self.written += len(rows)
+                self.batches += 1
+        connection.close()
+
+    def close(self):
+        """Write the queued events and stop the writer thread"""
+        if self.thread.is_alive():
+            self.queue.put(_CLOSE)
+            self.thread.join()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"recorded": self.recorded, "unchanged": self.unchanged, "dropped": self.dropped,
+                    "written": self.written, "batches": self.batches, "queued": self.queue.qsize()}
+
+    def query(self, event_type: str = None, value=None, since: float = None, until: float = None,
+              limit: int = None, with_data: bool = False) -> list:
+        """Stored events as dictionaries, oldest first; see query_events()"""
+        return query_events(self.path, event_type, value, since, until, limit, with_data)
+
+
+def query_events(path: str, event_type: str = None, value=None, since: float = None, until: float = None,
+                 limit: int = None, with_data: bool = False) -> list:
+    """Events of an event store database, oldest first
+
+    Parameters:
+        - path:       SQLite database file
+        - event_type: only events of this type
+        - value:      only events with this state, e.g. True for the falls
+        - since:      only events at or after this time (seconds since the
+                      epoch)
+        - until:      only events before this time
+        - limit:      only the latest 'limit' events
+        - with_data:  include the further results stored with every event
+    """
+    conditions, parameters = [], []
+    if event_type is not None:
+        conditions.append("type = ?")
+        parameters.append(event_type)
+    if value is not None:
+        conditions.append("value = ?")
+        parameters.append(_encode(value))
+    if since is not None:
+        conditions.append("time >= ?")
+        parameters.append(since)
+    if until is not None:
+        conditions.append("time < ?")
+        parameters.append(until)
+
+    sql = "SELECT time, type, value, frame" + (", data" if with_data else "") + " FROM events"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    # latest first for the limit, returned oldest first
+    sql += " ORDER BY time DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        parameters.append(limit)
+
+    connection = sqlite3.connect(path, timeout=10.0)
+    try:
+        rows = connection.execute(sql, parameters).fetchall()
+    finally:
+        connection.close()
+
+    events = []
+    for row in reversed(rows):
+        event = {"time": row[0], "type": row[1], "value": json.loads(row[2]), "frame": row[3]}
+        if with_data:
+            event["data"] = None if row[4] is None else json.loads(row[4])
+        events.append(event)
+    return events
@@ -26,46 +26,149 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # ===========================================================================
 
+import time
+
 import numpy as np
 
+from helpers import profiling
+from helpers.workspace import Workspace
+
+# cache of partial DFT matrices, keyed by (num_samples, first bin, last bin)
+_partial_dft_cache = {}
+
+
+def range_roi_bins(min_range_m, max_range_m, range_bin_length, num_bins):
+    # Convert a range region of interest into a slice of range bins
+    # min_range_m:      closest distance of interest (e.g. to skip leakage)
+    # max_range_m:      farthest distance of interest (e.g. depth of the room)
+    # range_bin_length: distance covered by a single range bin
+    # num_bins:         number of range bins of the full spectrum
+    start = int(np.floor(min_range_m / range_bin_length)) if min_range_m else 0
+    stop = int(np.ceil(max_range_m / range_bin_length)) + 1 if max_range_m else num_bins
+
+    start = min(max(start, 0), num_bins - 1)
+    stop = min(max(stop, start + 1), num_bins)
+    return slice(start, stop)
+
+
+def default_roi_bins(num_bins):
+    # Default range region of interest of the presence, people count and
+    # posture detection: from 1/8 of the range bins, past the leakage near
+    # DC, to 3/4 of them
+    return slice(num_bins // 8, (3 * num_bins) // 4)
+
+
+def reslice_roi(values, old_bins, new_bins):
+    # Values of the range bins in 'old_bins' (e.g. running averages) moved to
+    # the bins of 'new_bins'; bins new to the region of interest are NaN
+    resliced = np.full((new_bins.stop - new_bins.start,) + values.shape[1:], np.nan)
+    start, stop = max(old_bins.start, new_bins.start), min(old_bins.stop, new_bins.stop)
+    if start < stop:
+        resliced[start - new_bins.start:stop - new_bins.start] = values[start - old_bins.start:stop - old_bins.start]
+    return resliced
+
 
-def fft_spectrum(mat, range_window):
+def _partial_dft_matrix(num_samples, range_bins):
+    # DFT matrix computing only the bins in 'range_bins' of the zero padded
+    # (2 * num_samples) spectrum, i.e. X[k] = sum_n x[n] exp(-j*pi*k*n/num_samples)
+    key = (num_samples, range_bins.start, range_bins.stop)
+    matrix = _partial_dft_cache.get(key)
+    if matrix is None:
+        n = np.arange(num_samples).reshape(num_samples, 1)
+        k = np.arange(range_bins.start, range_bins.stop).reshape(1, -1)
+        matrix = np.exp(-1j * np.pi * n * k / num_samples)
+        _partial_dft_cache[key] = matrix
+    return matrix
+
+
+def _use_partial_dft(num_samples, num_bins):
+    # A matrix product costs about 4 * num_samples real operations per bin,
+    # a radix-2 FFT of the zero padded chirp about 5 * 2N * log2(2N) for
+    # all bins together. The BLAS matrix product runs about 3 times as many
+    # operations per second as NumPy's FFT: with 128 samples and 32 to 96
+    # chirps, it is faster up to about 60 of the 128 bins.
+    fft_cost = 5 * 2 * num_samples * np.log2(2 * num_samples)
+    return 4 * num_samples * num_bins < 3 * fft_cost
+
+
+def fft_spectrum(mat, range_window, range_bins=None, out=None, workspace=None):
     # Calculate fft spectrum
     # mat:          chirp data
     # range_window: window applied on input data before fft
+    # range_bins:   optional slice of range bins to compute (range region of
+    #               interest), all 'num_samples' bins are returned if None
+    # out:          complex array the spectrum is written to (dimension:
+    #               leading dimensions of 'mat' x number of range bins),
+    #               a new array if None
+    # workspace:    Workspace holding the intermediate buffers between calls,
+    #               they are allocated per call if None
 
     # received data 'mat' is in matrix form for a single receive antenna
     # each row contains 'num_samples' for a single chirp
     # total number of rows = 'num_chirps'
+    # 'mat' may have leading dimensions (e.g. all antennas of a frame), the
+    # spectra of all chirps are then computed in a single batch
+
+    profile = profiling.enabled
+    if profile:
+        start = time.perf_counter()
+
+    if workspace is None:
+        workspace = Workspace()
+    shape = np.shape(mat)
+    num_samples = shape[-1]
+    if range_bins is None:
+        range_bins = slice(0, num_samples)
+    if out is None:
+        out = np.empty(shape[:-1] + (range_bins.stop - range_bins.start,), dtype=complex)
+
+    # Element-wise steps work on contiguous arrays of the same shape and
+    # layout changes are plain assignments: NumPy allocates buffers for
+    # broadcasting, casting and strided operands otherwise.
 
     # -------------------------------------------------
     # Step 1 - remove DC bias from samples
     # -------------------------------------------------
-    [num_chirps, num_samples] = np.shape(mat)
-
-    # helpful in zero padding for high resolution FFT.
     # compute row (chirp) averages
-    avgs = np.average(mat, 1).reshape(num_chirps, 1)
+    avgs = workspace.get("fft_avgs", shape[:-1] + (1,))
+    np.mean(mat, axis=-1, keepdims=True, out=avgs)
 
     # de-bias values
-    mat = mat - avgs
+    windowed = workspace.get("fft_windowed", shape)
+    windowed[...] = avgs
+    np.subtract(mat, windowed, out=windowed)
     # -------------------------------------------------
     # Step 2 - Windowing the Data
     # -------------------------------------------------
-    mat = np.multiply(mat, range_window)
+    np.multiply(windowed, workspace.broadcast("fft_window", range_window, shape), out=windowed)
+
+    chirps = workspace.get("fft_chirps", shape, complex)
+    chirps[...] = windowed
 
     # -------------------------------------------------
-    # Step 3 - add zero padding here
+    # Step 3 - bins of the region of interest only, if cheaper
     # -------------------------------------------------
-    zp1 = np.pad(mat, ((0, 0), (0, num_samples)), 'constant')
+    if _use_partial_dft(num_samples, range_bins.stop - range_bins.start):
+        spectrum = workspace.get("fft_bins", out.shape, complex)
+        np.matmul(chirps, _partial_dft_matrix(num_samples, range_bins), out=spectrum)
+        np.multiply(spectrum, 2 / num_samples, out=spectrum)
+        out[...] = spectrum
+        if profile:
+            profiling.record("range_fft", start)
+        return out
 
     # -------------------------------------------------
-    # Step 4 - Compute FFT for distance information
+    # Step 4 - Compute FFT for distance information,
+    # zero padded for high resolution
     # -------------------------------------------------
-    range_fft = np.fft.fft(zp1) / num_samples
+    spectrum = workspace.get("fft_spectrum", shape[:-1] + (2 * num_samples,), complex)
+    np.fft.fft(chirps, n=2 * num_samples, out=spectrum)
 
     # ignore the redundant info in negative spectrum
     # compensate energy by doubling magnitude
-    range_fft = 2 * range_fft[:, range(int(num_samples))]
+    np.multiply(spectrum, 2 / num_samples, out=spectrum)
+    out[...] = spectrum[..., range_bins]
 
-    return range_fft
+    if profile:
+        profiling.record("range_fft", start)
+    return out
@@ -0,0 +1,235 @@
+import json
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+# Compact storage of raw frames. The SDK delivers the samples of the 12-bit
+# ADC normalized to 0 .. 1, so they are stored as 16-bit integers, a
+# quarter of the float64 frames, and optionally compressed. Frames are
+# grouped into chunks of a fixed number of frames; a chunk is the unit of
+# compression and of reading.
+#
+# File layout, all integers little-endian:
+#
+#   "RFRAMES1", uint32 header length, JSON header
+#       frame_shape, dtype ("<i2"), scale and offset (sample = value * scale
+#       + offset), codec, shuffle, chunk_frames
+#   per chunk: uint32 stored bytes, uint32 frames, payload
+#   chunk index: int64 (num_chunks x 3) first frame, file offset of the
+#       payload, stored bytes
+#   uint64 index offset, uint64 number of chunks, uint64 number of frames,
+#       "RFINDEX1"
+#
+# The index is written by close(). A file without it (the recording was not
+# closed) is still readable: the chunks are found by following their
+# headers from the start.
+
+MAGIC = b"RFRAMES1"
+INDEX_MAGIC = b"RFINDEX1"
+FOOTER = struct.Struct("<QQQ8s")
+CHUNK_HEADER = struct.Struct("<II")
+
+# normalized samples of the 12-bit ADC are multiples of 1/4095
+ADC_SCALE = 1 / 4095
+
+
+def _zlib():
+    return lambda data: zlib.compress(data, 1), zlib.decompress
+
+
+def _lz4():
+    import lz4.frame
+    return lz4.frame.compress, lz4.frame.decompress
+
+
+def _zstd():
+    import zstandard
+    return zstandard.ZstdCompressor(level=1).compress, zstandard.ZstdDecompressor().decompress
+
+
+# codec name -> function returning (compress, decompress); lz4 and zstd are
+# optional packages, imported when a file uses them
+CODECS = {
+    "none": lambda: (bytes, bytes),
+    "zlib": _zlib,
+    "lz4": _lz4,
+    "zstd": _zstd,
+}
+
+
+def load_codec(name: str):
+    """(compress, decompress) of a codec, raises ValueError for unknown or
+    not installed codecs"""
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}, known are {', '.join(CODECS)}")
+    try:
+        return CODECS[name]()
+    except ImportError as e:
+        raise ValueError(f"Codec {name} needs a package that is not installed: {e.name}") from e
+
+
+class ChunkedFrameWriter:
+    """Writes frames quantized to 16-bit integers in chunks
+
+    Samples are rounded to multiples of 'scale'; samples of the 12-bit ADC
+    are stored exactly with the default scale. Samples outside the int16
+    range are clipped and counted in 'clipped'.
+    """
+
+    def __init__(self, path: str, frame_shape: tuple, scale: float = ADC_SCALE, offset: float = 0.0,
+                 codec: str = "zlib", chunk_frames: int = 16, shuffle: bool = True):
+        """Create the file
+
+        Parameters:
+            - path:         file to write
+            - frame_shape:  shape of every frame
+            - scale:        sample value of one integer step
+            - offset:       sample value of integer 0
+            - codec:        compression of the chunks, one of CODECS
+            - chunk_frames: frames per chunk
+            - shuffle:      store the low bytes of a chunk before the high
+                            bytes, which compresses better
+        """
+        self.frame_shape = tuple(frame_shape)
+        self.scale = scale
+        self.offset = offset
+        self.codec = codec
+        self.chunk_frames = chunk_frames
+        self.shuffle = shuffle and codec != "none"
+        self.compress, _ = load_codec(codec)
+
+        self.chunk = np.empty((chunk_frames,) + self.frame_shape, dtype="<i2")
+        self.scratch = np.empty(self.frame_shape)
+        self.chunk_count = 0
+        self.num_frames = 0
+        self.index = []
+        self.clipped = 0
+
+        self.file = open(path, "wb")
+        header = json.dumps({"frame_shape": list(self.frame_shape), "dtype": "<i2", "scale": scale, "offset": offset,
+                             "codec": codec, "shuffle": self.shuffle, "chunk_frames": chunk_frames}).encode()
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+
+    def write(self, frame: np.ndarray):
+        np.subtract(frame, self.offset, out=self.scratch)
+        self.scratch /= self.scale
+        np.rint(self.scratch, out=self.scratch)
+        self.clipped += int(np.count_nonzero((self.scratch < -32768) | (self.scratch > 32767)))
+        np.clip(self.scratch, -32768, 32767, out=self.scratch)
+        self.chunk[self.chunk_count] = self.scratch
+        self.chunk_count += 1
+        self.num_frames += 1
+        if self.chunk_count == self.chunk_frames:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        data = self.chunk[:self.chunk_count]
+        if self.shuffle:
+            data = data.view(np.uint8).reshape(-1, 2).T
+        payload = self.compress(np.ascontiguousarray(data).tobytes())
+        self.file.write(CHUNK_HEADER.pack(len(payload), self.chunk_count))
+        self.index.append((self.num_frames - self.chunk_count, self.file.tell(), len(payload)))
+        self.file.write(payload)
+        self.chunk_count = 0
+
+    def close(self):
+        if self.chunk_count:
+            self._write_chunk()
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.index, dtype="<i8").reshape(-1, 3).tobytes())
+        self.file.write(FOOTER.pack(index_offset, len(self.index), self.num_frames, INDEX_MAGIC))
+        self.file.close()
+
+
+class ChunkedFrameReader:
+    """Random access to the frames of a ChunkedFrameWriter file
+
+    reader[i] decodes the chunk of frame i, the last chunk decoded is kept,
+    so reading frames in order decodes every chunk once. Frames are float64
+    like those of the SDK; they are views of the decoded chunk, which is
+    never written again. Threads may share a reader.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a chunked frame file")
+        header_length, = struct.unpack("<I", self.file.read(4))
+        header = json.loads(self.file.read(header_length))
+        self.data_offset = self.file.tell()
+
+        self.frame_shape = tuple(header["frame_shape"])
+        self.scale = header["scale"]
+        self.offset = header["offset"]
+        self.codec = header["codec"]
+        self.shuffle = header["shuffle"]
+        self.chunk_frames = header["chunk_frames"]
+        _, self.decompress = load_codec(self.codec)
+
+        self.index, self.num_frames = self._read_index()
+        self.lock = threading.Lock()
+        # (chunk number, decoded frames) of the last chunk read
+        self.cache = (None, None)
+
+    def _read_index(self):
+        self.file.seek(0, os.SEEK_END)
+        size = self.file.tell()
+        if size - self.data_offset >= FOOTER.size:
+            self.file.seek(size - FOOTER.size)
+            index_offset, num_chunks, num_frames, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+            if magic == INDEX_MAGIC:
+                self.file.seek(index_offset)
+                index = np.frombuffer(self.file.read(num_chunks * 24), dtype="<i8").reshape(-1, 3)
+                return index, num_frames
+
+        # not closed: follow the chunk headers, a truncated last chunk is left out
+        index = []
+        num_frames = 0
+        position = self.data_offset
+        while position + CHUNK_HEADER.size <= size:
+            self.file.seek(position)
+            stored, frames = CHUNK_HEADER.unpack(self.file.read(CHUNK_HEADER.size))
+            position += CHUNK_HEADER.size
+            if position + stored > size:
+                break
+            index.append((num_frames, position, stored))
+            num_frames += frames
+            position += stored
+        return np.array(index, dtype=np.int64).reshape(-1, 3), num_frames
+
+    def __len__(self):
+        return self.num_frames
+
+    def read_chunk(self, i_chunk: int) -> np.ndarray:
+        """Integer samples of a chunk (num_frames x frame_shape)"""
+        first, offset, stored = self.index[i_chunk]
+        end = self.index[i_chunk + 1][0] if i_chunk + 1 < len(self.index) else self.num_frames
+        self.file.seek(offset)
+        data = np.frombuffer(self.decompress(self.file.read(stored)), dtype=np.uint8)
+        if self.shuffle:
+            data = np.ascontiguousarray(data.reshape(2, -1).T)
+        return data.view("<i2").reshape((end - first,) + self.frame_shape)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return np.stack([self[i] for i in range(*index.indices(self.num_frames))])
+        if index < 0:
+            index += self.num_frames
+        if not 0 <= index < self.num_frames:
+            raise IndexError(f"frame {index} out of range")
+
+        # chunks are full except the last, so the chunk follows from the
+        # frame number; the index has the position of every chunk
+        i_chunk = index // self.chunk_frames
+        cached_chunk, frames = self.cache
+        if cached_chunk != i_chunk:
+            with self.lock:
+                frames = self.read_chunk(i_chunk) * self.scale + self.offset
+            self.cache = (i_chunk, frames)
+        return frames[index - self.index[i_chunk][0]]
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,180 @@
+import threading
+import time
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QRectF, QTimer
+from PyQt5.QtWidgets import QLabel, QVBoxLayout, QWidget
+
+
+class MapQuantizer:
+    """Converts power maps to uint8 images in dB, without allocating per frame
+
+    The strongest cell maps to 255 and 'dynamic_range_dB' below it to 0;
+    the images are shown through a lookup table, so no colour conversion
+    happens in Python.
+    """
+
+    def __init__(self, shape, dynamic_range_dB: float = 60):
+        self.dynamic_range_dB = dynamic_range_dB
+        self.scratch = np.empty(shape)
+        self.image = np.empty(shape, dtype=np.uint8)
+
+    def quantize(self, power: np.ndarray) -> np.ndarray:
+        scratch = self.scratch
+        np.maximum(power, 1e-20, out=scratch)
+        np.log10(scratch, out=scratch)
+        # 10 * log10(p) - (max_dB - range) scaled to 0 .. 255
+        scratch -= scratch.max() - self.dynamic_range_dB / 10
+        scratch *= 2550 / self.dynamic_range_dB
+        np.clip(scratch, 0, 255, out=scratch)
+        np.copyto(self.image, scratch, casting="unsafe")
+        return self.image
+
+
+class MapViewer(QWidget):
+    """Live range-Doppler maps of every antenna and the range-angle map
+
+    update_maps() runs in a pipeline thread on the shared products and only
+    writes into preallocated buffers. A timer in the GUI thread shows the
+    latest maps at most display_rate_hz and skips frames it missed; nothing
+    is computed while the viewer is not visible.
+    """
+
+    def __init__(self, geometry, num_beams: int, max_angle_degrees: float, display_rate_hz: float = 30,
+                 colormap: str = "inferno", parent=None):
+        """Create the viewer
+
+        Parameters:
+            - geometry:             RadarGeometry of the acquisition
+            - num_beams:            number of beams of the 'beams' product
+            - max_angle_degrees:    the beams cover -max .. +max degrees
+            - display_rate_hz:      maximum refresh rate of the images
+            - colormap:             pyqtgraph colour map name
+        """
+        super().__init__(parent)
+        num_range_bins = geometry.num_samples
+        num_doppler_bins = geometry.doppler_fft_size
+        self.num_rx_antennas = geometry.num_rx_antennas
+
+        rd_shape = (num_range_bins, num_doppler_bins, self.num_rx_antennas)
+        ra_shape = (num_range_bins, num_beams)
+        self.rd_power = np.empty(rd_shape)
+        self.beam_power = np.empty((num_range_bins, num_doppler_bins, num_beams))
+        self.ra_power = np.empty(ra_shape)
+        self.rd_quantizer = MapQuantizer(rd_shape)
+        self.ra_quantizer = MapQuantizer(ra_shape)
+
+        # written by the pipeline thread, read by the GUI thread
+        self.lock = threading.Lock()
+        self.latest_rd = np.zeros(rd_shape, dtype=np.uint8)
+        self.latest_ra = np.zeros(ra_shape, dtype=np.uint8)
+        self.latest_frame_number = None
+        self.processing_s = 0.0
+        self.frames_processed = 0
+
+        # owned by the GUI thread, the image items keep references to them
+        self.shown_rd = [np.zeros(rd_shape[:2], dtype=np.uint8) for _ in range(self.num_rx_antennas)]
+        self.shown_ra = np.zeros(ra_shape, dtype=np.uint8)
+        self.shown_frame_number = None
+        self.frames_shown = 0
+        self.visible = False
+
+        lut = pg.colormap.get(colormap).getLookupTable(0.0, 1.0, 256)
+        layout = QVBoxLayout(self)
+        self.graphics = pg.GraphicsLayoutWidget()
+        layout.addWidget(self.graphics)
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: white;")
+        layout.addWidget(self.status_label)
+
+        max_speed = geometry.max_speed_m_s
+        max_range = geometry.max_range_m
+        self.rd_items = []
+        for i_ant in range(self.num_rx_antennas):
+            plot = self.graphics.addPlot(title=f"range-Doppler antenna #{i_ant}")
+            plot.setLabel("bottom", "velocity (m/s)")
+            plot.setLabel("left", "distance (m)")
+            item = self._add_image(plot, lut, QRectF(-max_speed, 0, 2 * max_speed, max_range))
+            self.rd_items.append(item)
+        plot = self.graphics.addPlot(title="range-angle")
+        plot.setLabel("bottom", "angle (degrees)")
+        plot.setLabel("left", "distance (m)")
+        self.ra_item = self._add_image(plot, lut, QRectF(-max_angle_degrees, 0, 2 * max_angle_degrees, max_range))
+
+        self.last_status_time = time.perf_counter()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._refresh)
+        self.timer.start(int(1000 / display_rate_hz))
+
+    @staticmethod
+    def _add_image(plot, lut, rect):
+        item = pg.ImageItem(axisOrder="row-major")
+        item.setLookupTable(lut)
+        item.setLevels((0, 255))
+        item.setRect(rect)
+        plot.addItem(item)
+        plot.setMouseEnabled(x=False, y=False)
+        plot.getViewBox().setRange(rect, padding=0)
+        return item
+
+    def update_maps(self, frame_number, rd_maps, beams):
+        """Quantize the maps of a frame (pipeline thread)
+
+        Parameters:
+            - frame_number: sequence number of the frame
+            - rd_maps:      range-Doppler maps (range x doppler x antenna)
+            - beams:        range-Doppler beams (range x doppler x beam)
+        """
+        if not self.visible:
+            return
+        start = time.perf_counter()
+
+        np.abs(rd_maps, out=self.rd_power)
+        np.square(self.rd_power, out=self.rd_power)
+        rd_image = self.rd_quantizer.quantize(self.rd_power)
+
+        np.abs(beams, out=self.beam_power)
+        np.square(self.beam_power, out=self.beam_power)
+        np.sum(self.beam_power, axis=1, out=self.ra_power)
+        ra_image = self.ra_quantizer.quantize(self.ra_power)
+
+        with self.lock:
+            np.copyto(self.latest_rd, rd_image)
+            np.copyto(self.latest_ra, ra_image)
+            self.latest_frame_number = frame_number
+            self.processing_s += time.perf_counter() - start
+            self.frames_processed += 1
+
+    def _refresh(self):
+        # GUI thread: show the latest maps if there are new ones
+        self.visible = self.isVisible() and not self.visibleRegion().isEmpty()
+        if not self.visible:
+            return
+
+        with self.lock:
+            if self.latest_frame_number == self.shown_frame_number:
+                return
+            for i_ant in range(self.num_rx_antennas):
+                np.copyto(self.shown_rd[i_ant], self.latest_rd[:, :, i_ant])
+            np.copyto(self.shown_ra, self.latest_ra)
+            self.shown_frame_number = self.latest_frame_number
+
+        for item, image in zip(self.rd_items, self.shown_rd):
+            item.setImage(image, autoLevels=False)
+        self.ra_item.setImage(self.shown_ra, autoLevels=False)
+        self.frames_shown += 1
+        self._update_status()
+
+    def _update_status(self):
+        now = time.perf_counter()
+        elapsed_s = now - self.last_status_time
+        if elapsed_s < 1.0:
+            return
+        with self.lock:
+            processed, processing_s = self.frames_processed, self.processing_s
+            self.frames_processed, self.processing_s = 0, 0.0
+        self.status_label.setText(f"{self.frames_shown / elapsed_s:.1f} frames/s shown, "
+                                  f"{processing_s / max(processed, 1) * 1e3:.1f} ms per frame")
+        self.frames_shown = 0
+        self.last_status_time = now
@@ -0,0 +1,158 @@
+import os
+import threading
+
+import numpy as np
+
+from helpers.PresenceDetectionAlgo import beam_range_energy
+from helpers.timeseries import Tier
+from helpers.workspace import Workspace
+
+# Long-term occupancy heatmap over the range-angle map. Presence detection
+# keeps only the angle of the strongest cell of every frame; this adds the
+# whole range x beam map of every frame, the motion energy (the range
+# Doppler maps have the static background removed by MTI) or a detection
+# mask of the cells near the peak, into float32 sums.
+#
+# The sums are time-bucketed snapshots in rings of fixed size, like the
+# tiers of helpers.timeseries: an hourly map for the last week and a daily
+# map for the last year. A frame is added to the current bucket of both.
+# Memory is fixed by the tiers and the map size, whatever the uptime, and
+# no bucket sums more than a day of frames, so float32 keeps its precision.
+# A query sums the buckets of a span and can downsample the result into a
+# coarser range x angle grid (pyramid()).
+
+# hourly maps for a week, daily maps for a year
+OCCUPANCY_TIERS = [
+    Tier("1h", 3600, 7 * 24),
+    Tier("1d", 86400, 365),
+]
+
+# accumulation modes: "energy" adds the energy of every cell, "mask" adds 1
+# for the cells with at least mask_fraction of the energy of the peak
+MODES = ["energy", "mask"]
+
+
+def pyramid(heatmap: np.ndarray, level: int) -> np.ndarray:
+    """'heatmap' downsampled 'level' times by 2 x 2 block sums, odd edges
+    are padded with zeros"""
+    for _ in range(level):
+        rows, columns = heatmap.shape
+        padded = np.zeros((rows + rows % 2, columns + columns % 2), dtype=heatmap.dtype)
+        padded[:rows, :columns] = heatmap
+        heatmap = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).sum(axis=(1, 3))
+    return heatmap
+
+
+class OccupancyAccumulator:
+    """Sums the range x beam maps of the frames into time-bucketed snapshots"""
+
+    def __init__(self, range_axis_m: np.ndarray, angle_axis_deg: np.ndarray, mode: str = "energy",
+                 mask_fraction: float = 0.5, tiers: list = None):
+        """Parameters:
+            - range_axis_m:   range of every row of the maps
+            - angle_axis_deg: angle of every column (beam) of the maps
+            - mode:           one of MODES
+            - mask_fraction:  cells of the mask in "mask" mode, relative to
+                              the energy of the peak of the frame
+            - tiers:          Tier list of the snapshots, finest first,
+                              default OCCUPANCY_TIERS
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}, known are {', '.join(MODES)}")
+        self.range_axis_m = np.asarray(range_axis_m, dtype=float)
+        self.angle_axis_deg = np.asarray(angle_axis_deg, dtype=float)
+        self.mode = mode
+        self.mask_fraction = mask_fraction
+        self.tiers = OCCUPANCY_TIERS if tiers is None else tiers
+        self.shape = (len(self.range_axis_m), len(self.angle_axis_deg))
+
+        # per tier: maps, bucket number (-1 if empty) and frames of every slot
+        self.maps = [np.zeros((tier.slots,) + self.shape, dtype=np.float32) for tier in self.tiers]
+        self.buckets = [np.full(tier.slots, -1, dtype=np.int64) for tier in self.tiers]
+        self.frames = [np.zeros(tier.slots, dtype=np.int64) for tier in self.tiers]
+
+        self.lock = threading.Lock()
+        self.workspace = Workspace()
+
+    def add(self, energy: np.ndarray, timestamp: float):
+        """Add the range x beam energy of a frame at 'timestamp' (seconds
+        since the epoch). Called from a pipeline thread."""
+        if self.mode == "mask":
+            mask = self.workspace.get("mask", self.shape, np.float32)
+            np.greater_equal(energy, self.mask_fraction * energy.max(), out=mask, casting="unsafe")
+            energy = mask
+
+        with self.lock:
+            for tier, maps, buckets, frames in zip(self.tiers, self.maps, self.buckets, self.frames):
+                bucket = int(timestamp // tier.seconds)
+                slot = bucket % tier.slots
+                if buckets[slot] != bucket:
+                    if buckets[slot] > bucket:
+                        # older than the retention of the tier
+                        continue
+                    maps[slot] = 0
+                    buckets[slot] = bucket
+                    frames[slot] = 0
+                maps[slot] += energy
+                frames[slot] += 1
+
+    def add_beams(self, rd_beam_formed: np.ndarray, timestamp: float):
+        """Add the energy of the range Doppler beams of a frame (range x
+        doppler x beams)"""
+        self.add(beam_range_energy(rd_beam_formed, self.workspace), timestamp)
+
+    def query(self, start: float, end: float, level: int = 0) -> tuple:
+        """Occupancy between 'start' and 'end' (seconds since the epoch)
+
+        Sums the buckets overlapping the span from the finest tier that
+        still holds 'start', or else the coarsest tier. Returns the map
+        divided by its sum, so the cells give the share of the energy (or
+        of the masked cells) over the span, downsampled by pyramid() to
+        'level', and the number of frames it covers.
+        """
+        with self.lock:
+            for i_tier, tier in enumerate(self.tiers):
+                first, last = int(start // tier.seconds), int(end // tier.seconds)
+                buckets = self.buckets[i_tier]
+                if first > buckets.max() - tier.slots or i_tier == len(self.tiers) - 1:
+                    break
+            selected = (buckets >= first) & (buckets <= last)
+            heatmap = self.maps[i_tier][selected].sum(axis=0, dtype=np.float64)
+            num_frames = int(self.frames[i_tier][selected].sum())
+
+        heatmap = pyramid(heatmap, level)
+        total = heatmap.sum()
+        return (heatmap / total if total > 0 else heatmap), num_frames
+
+    def axes(self, level: int = 0) -> tuple:
+        """Range and angle at the start of every cell of a pyramid() level"""
+        step = 2 ** level
+        return self.range_axis_m[::step], self.angle_axis_deg[::step]
+
+    def save(self, path: str):
+        """Write the snapshots to an .npz file, replaced atomically"""
+        with self.lock:
+            arrays = {"range_axis_m": self.range_axis_m, "angle_axis_deg": self.angle_axis_deg,
+                      "mode": self.mode, "mask_fraction": self.mask_fraction,
+                      "tier_names": [tier.name for tier in self.tiers],
+                      "tier_seconds": [tier.seconds for tier in self.tiers]}
+            for i_tier, tier in enumerate(self.tiers):
+                arrays[f"maps_{i_tier}"] = self.maps[i_tier].copy()
+                arrays[f"buckets_{i_tier}"] = self.buckets[i_tier].copy()
+                arrays[f"frames_{i_tier}"] = self.frames[i_tier].copy()
+        temporary = path + ".tmp.npz"
+        np.savez(temporary, **arrays)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as f:
+            tiers = [Tier(str(name), int(seconds), len(f[f"buckets_{i_tier}"]))
+                     for i_tier, (name, seconds) in enumerate(zip(f["tier_names"], f["tier_seconds"]))]
+            accumulator = cls(f["range_axis_m"], f["angle_axis_deg"], str(f["mode"]), float(f["mask_fraction"]),
+                              tiers)
+            for i_tier in range(len(tiers)):
+                accumulator.maps[i_tier][:] = f[f"maps_{i_tier}"]
+                accumulator.buckets[i_tier][:] = f[f"buckets_{i_tier}"]
+                accumulator.frames[i_tier][:] = f[f"frames_{i_tier}"]
+        return accumulator
@@ -0,0 +1,249 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from helpers import profiling
+
+
+class Stage:
+    """A processing step of the frame pipeline"""
+
+    def __init__(self, name: str, func, inputs: list, outputs: list = ()):
+        """Create a stage
+
+        Parameters:
+            - name:     unique name of the stage
+            - func:     called with the inputs in the declared order, returns
+                        nothing, the single output or a tuple of all outputs
+            - inputs:   names of the products the stage consumes ("frame" is
+                        the raw frame of all antennas, "frame_number" its
+                        sequence number)
+            - outputs:  names of the products the stage provides
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+    def __call__(self, products: dict):
+        result = self.func(*[products[name] for name in self.inputs])
+        if len(self.outputs) == 0:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        return dict(zip(self.outputs, result))
+
+
+class StageTiming:
+    """Execution time statistics of a stage"""
+
+    def __init__(self):
+        self.count = 0
+        self.last_s = 0.0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def add(self, duration_s: float):
+        self.count += 1
+        self.last_s = duration_s
+        self.total_s += duration_s
+        self.max_s = max(self.max_s, duration_s)
+
+    @property
+    def mean_s(self):
+        return self.total_s / self.count if self.count else 0.0
+
+
+class FramePipeline:
+    """Runs the stages of all active use cases once per radar frame
+
+    Shared products (range FFT, range-Doppler maps, beams, ...) are stages
+    added with add_product() and run only if an active use case needs them,
+    and then only once per frame no matter how many use cases consume them.
+    Stages whose inputs are ready run in parallel on a bounded thread pool;
+    NumPy releases the GIL in its heavy kernels, so independent stages
+    overlap. Frames are processed one after the other, which keeps stateful
+    stages (MTI filters, moving averages) consistent.
+    """
+
+    def __init__(self, radar_data, max_workers: int = 4, quality=None):
+        """Create the pipeline
+
+        Parameters:
+            - radar_data:   RadarDataAcquisition delivering the frames
+            - max_workers:  size of the thread pool
+            - quality:      QualityController updated with the processing
+                            time of every frame, its on_change runs in the
+                            pipeline thread between two frames and may
+                            register stages again
+        """
+        self.radar_data = radar_data
+        self.max_workers = max_workers
+        self.quality = quality
+
+        self._products = {}
+        self._use_cases = {}
+        self._active = set()
+        self._plan = None
+        self._lock = threading.Lock()
+
+        # thread, thread pool and stop event of the current run; a stopped
+        # thread finishes its frame before the next run starts
+        self._executor = None
+        self._thread = None
+        self._stop_event = None
+        self._stopping = None
+
+        self.timings = {}
+        self.frames_processed = 0
+
+    def add_product(self, stage: Stage):
+        """Add a shared stage, run only when an active use case depends on it"""
+        with self._lock:
+            self._products[stage.name] = stage
+            self._plan = None
+
+    def register(self, use_case: str, stages: list):
+        """Register the stages of a use case, run while the use case is started"""
+        with self._lock:
+            self._use_cases[use_case] = list(stages)
+            self._plan = None
+
+    def is_active(self, use_case: str) -> bool:
+        return use_case in self._active
+
+    def start(self, use_case: str):
+        """Start a registered use case, does nothing if it is already running"""
+        while True:
+            with self._lock:
+                if use_case not in self._use_cases:
+                    raise KeyError(f"Unknown use case: {use_case}")
+                stopping = self._stopping
+                if stopping is None or stopping is threading.current_thread() or not stopping.is_alive():
+                    self._stopping = None
+                    self._start_locked(use_case)
+                    return
+            # the thread of the last run is still finishing its frame
+            stopping.join()
+
+    def _start_locked(self, use_case: str):
+        if use_case in self._active:
+            return
+        self._active.add(use_case)
+        self._plan = None
+
+        if self._thread is None:
+            self._stop_event = threading.Event()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline")
+            self._thread = threading.Thread(target=self._run, args=(self._stop_event, self._executor), daemon=True)
+            self._thread.start()
+
+    def stop(self, use_case: str = None):
+        """Stop a use case (all use cases if None), does nothing if it is not running"""
+        with self._lock:
+            if use_case is None:
+                self._active.clear()
+            else:
+                self._active.discard(use_case)
+            self._plan = None
+            if self._thread is None or self._active:
+                return
+            self._stop_event.set()
+            thread, executor = self._thread, self._executor
+            self._stopping = thread
+            self._thread = self._executor = self._stop_event = None
+
+        if thread is threading.current_thread():
+            # stopped between two frames (e.g. by the on_change of the
+            # quality controller), the thread ends after this call
+            executor.shutdown(wait=False)
+        else:
+            thread.join()
+            executor.shutdown()
+
+    def stage_timings(self) -> dict:
+        """Execution time statistics of every stage that has run, by stage name"""
+        return dict(self.timings)
+
+    def _make_plan(self):
+        # stages needed by the active use cases plus the shared products they
+        # depend on, each with the stages it has to wait for
+        stages = [stage for use_case in sorted(self._active) for stage in self._use_cases[use_case]]
+        producer = {}
+        for stage in self._products.values():
+            for output in stage.outputs:
+                producer[output] = stage
+
+        needed = {}
+        pending = list(stages)
+        while pending:
+            stage = pending.pop()
+            if stage.name in needed:
+                continue
+            depends = set()
+            for name in stage.inputs:
+                if name in ("frame", "frame_number"):
+                    continue
+                if name not in producer:
+                    raise KeyError(f"Stage {stage.name} needs unknown product {name}")
+                depends.add(producer[name].name)
+                pending.append(producer[name])
+            needed[stage.name] = (stage, depends)
+        return needed
+
+    def run_frame(self, frame, executor=None, frame_number: int = None) -> dict:
+        """Run all needed stages on a frame and return the products"""
+        with self._lock:
+            if self._plan is None:
+                self._plan = self._make_plan()
+            plan = self._plan
+            executor = executor or self._executor
+
+        products = {"frame": frame, "frame_number": frame_number}
+        done = set()
+        running = {}
+
+        while len(done) < len(plan):
+            for name, (stage, depends) in plan.items():
+                if name not in done and name not in running.values() and depends <= done:
+                    running[executor.submit(self._timed, stage, products)] = name
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    # the other stages of the frame may still be using its
+                    # products, they finish before the error is raised
+                    wait(running)
+                products.update(future.result())
+                done.add(name)
+
+        self.frames_processed += 1
+        return products
+
+    def _timed(self, stage: Stage, products: dict):
+        start = time.perf_counter()
+        try:
+            return stage(products)
+        finally:
+            timing = self.timings.get(stage.name)
+            if timing is None:
+                timing = self.timings.setdefault(stage.name, StageTiming())
+            timing.add(time.perf_counter() - start)
+            if profiling.enabled:
+                profiling.record("pipeline_" + stage.name, start)
+
+    def _run(self, stop_event: threading.Event, executor: ThreadPoolExecutor):
+        frame_number = 0
+        while not stop_event.is_set():
+            frame_number, frame = self.radar_data.wait_for_frame(frame_number, timeout=0.5)
+            if frame is None or stop_event.is_set():
+                continue
+            start = time.perf_counter()
+            try:
+                self.run_frame(frame, executor, frame_number=frame_number)
+            except Exception as e:
+                print(f"Error in frame pipeline: {e}")
+                continue
+            if self.quality is not None:
+                self.quality.update(time.perf_counter() - start)
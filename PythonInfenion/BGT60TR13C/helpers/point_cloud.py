@@ -0,0 +1,207 @@
+import threading
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+from helpers import profiling
+from helpers.blit import BlitRenderer
+from helpers.DigitalBeamForming2D import DigitalBeamForming2D, rx_positions_from_mask
+from helpers.DopplerAlgo import DopplerAlgo
+
+
+class TargetDetector:
+    """Clustered 3D targets of a frame, the DSP of Radar3DProcessing"""
+
+    def __init__(self, config, geometry, max_range_m: float = None, num_azimuth_beams: int = 27,
+                 num_elevation_beams: int = 15, doppler_padding: int = 2):
+        """Create the detector
+
+        Parameters:
+            - config:               FmcwSimpleSequenceConfig of the frames
+            - geometry:             RadarGeometry of the frames
+            - max_range_m:          depth of the room, range bins beyond it
+                                    are never computed
+            - num_azimuth_beams:    beams in azimuth
+            - num_elevation_beams:  beams in elevation
+            - doppler_padding:      Doppler FFT size in multiples of the chirps
+        """
+        self.num_rx_antennas = geometry.num_rx_antennas
+        self.range_bins = geometry.range_bins(0, max_range_m)
+        self.doppler = DopplerAlgo(config.chirp.num_samples, config.num_chirps, self.num_rx_antennas,
+                                   range_bins=self.range_bins, doppler_padding=doppler_padding)
+
+        # azimuth and elevation from the L-shaped RX array (rx_mask=7), only
+        # azimuth if the activated antennas are all in one row
+        self.dbf = DigitalBeamForming2D(rx_positions_from_mask(config.chirp.rx_mask),
+                                        num_azimuth_beams=num_azimuth_beams, num_elevation_beams=num_elevation_beams,
+                                        max_azimuth_degrees=45, max_elevation_degrees=45)
+        self.range_axis_m = geometry.range_axis_m[self.range_bins]
+
+        num_range_bins = self.range_bins.stop - self.range_bins.start
+        self.rd_spectrum = np.zeros((num_range_bins, self.doppler.num_doppler_bins, self.num_rx_antennas),
+                                    dtype=complex)
+
+    def detect(self, frame: np.ndarray) -> np.ndarray:
+        """Targets of a frame (num_rx_antennas x num_chirps x num_samples)
+        as x/y/z points in metres (dimension: num_targets x 3)"""
+        for i_ant in range(self.num_rx_antennas):
+            self.rd_spectrum[:, :, i_ant] = self.doppler.compute_doppler_map(frame[i_ant, :, :], i_ant)
+
+        power = self.dbf.run(self.rd_spectrum)
+        points, _ = self.dbf.point_cloud(power, self.range_axis_m)
+        if not len(points):
+            return np.zeros((0, 3))
+
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+        clusters = DBSCAN(eps=0.5, min_samples=3).fit_predict(points)
+        targets = [np.mean(points[clusters == i], axis=0) for i in range(max(clusters) + 1)]
+        if profile:
+            profiling.record("clustering", start)
+        return np.array(targets).reshape(-1, 3)
+
+
+class PointBuffer:
+    """Preallocated ring buffer of x/y/z points, tagged with their frame
+
+    Frames append their points from the processing thread, the renderer
+    takes snapshots from its own thread. Once full, the oldest points are
+    overwritten, so memory stays constant however long the run.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.points = np.zeros((capacity, 3))
+        self.frames = np.zeros(capacity, dtype=np.int64)
+        self.head = 0
+        self.count = 0
+        self.frame_number = -1
+        self.lock = threading.Lock()
+
+    def append(self, points: np.ndarray, frame_number: int = None) -> int:
+        """Add the points of the next frame (may be empty), returns the frame number
+
+        The frames are counted if 'frame_number' is None, otherwise ages are
+        measured in the given (increasing) frame numbers.
+        """
+        points = points[-self.capacity:]
+        num_points = len(points)
+        with self.lock:
+            self.frame_number = self.frame_number + 1 if frame_number is None else frame_number
+            first = min(num_points, self.capacity - self.head)
+            self.points[self.head:self.head + first] = points[:first]
+            self.frames[self.head:self.head + first] = self.frame_number
+            self.points[:num_points - first] = points[first:]
+            self.frames[:num_points - first] = self.frame_number
+            self.head = (self.head + num_points) % self.capacity
+            self.count = min(self.count + num_points, self.capacity)
+            return self.frame_number
+
+    def snapshot(self, points_out: np.ndarray, ages_out: np.ndarray, max_age: int = None) -> int:
+        """Copy the points, oldest first, and their age in frames into the
+        given arrays of 'capacity' rows, returns the number of rows copied
+
+        Points of 'max_age' frames or older are left out.
+        """
+        with self.lock:
+            start = (self.head - self.count) % self.capacity
+            if start + self.count <= self.capacity:
+                segments = [slice(start, start + self.count)]
+            else:
+                segments = [slice(start, self.capacity), slice(0, self.head)]
+            if max_age is not None:
+                # frame numbers increase along each segment
+                oldest = self.frame_number - max_age + 1
+                while segments:
+                    segment = segments[0]
+                    skip = int(np.searchsorted(self.frames[segment], oldest))
+                    if skip < segment.stop - segment.start:
+                        segments[0] = slice(segment.start + skip, segment.stop)
+                        break
+                    segments.pop(0)
+
+            count = 0
+            for segment in segments:
+                end = count + segment.stop - segment.start
+                points_out[count:end] = self.points[segment]
+                np.subtract(self.frame_number, self.frames[segment], out=ages_out[count:end])
+                count = end
+        return count
+
+
+class PointCloudRenderer:
+    """Incremental 3D scatter plot of a PointBuffer
+
+    The scatter is created once and updated in place: its offsets and
+    colours are rewritten from preallocated arrays, and only the scatter is
+    redrawn on top of the cached axes (see BlitRenderer). Points are
+    coloured by x and fade out over 'history' frames. Rendering must happen
+    in the GUI thread, independent of the thread filling the buffer.
+    """
+
+    def __init__(self, ax, buffer: PointBuffer, max_range_m: float, history: int,
+                 cmap: str = "viridis", alpha: float = 0.6, size: float = 10):
+        """Create the renderer
+
+        Parameters:
+            - ax:           3D axes to draw into
+            - buffer:       points to show
+            - max_range_m:  the axes cover -max .. +max in x and z, 0 .. max in y
+            - history:      age in frames at which a point has faded out
+            - cmap:         colour map over x
+            - alpha:        opacity of the newest points
+            - size:         marker size
+        """
+        self.buffer = buffer
+        self.history = history
+        self.alpha = alpha
+        self.x_min = -max_range_m
+        self.x_scale = 255 / (2 * max_range_m)
+        self.lut = plt.get_cmap(cmap)(np.linspace(0, 1, 256))
+
+        capacity = buffer.capacity
+        self.points = np.zeros((capacity, 3))
+        self.ages = np.zeros(capacity, dtype=np.int64)
+        self.scratch = np.zeros(capacity)
+        self.color_index = np.zeros(capacity, dtype=np.intp)
+        self.colors = np.zeros((capacity, 4))
+
+        ax.set_xlim(-max_range_m, max_range_m)
+        ax.set_ylim(0, max_range_m)
+        ax.set_zlim(-max_range_m, max_range_m)
+        ax.set_xlabel('X (m)')
+        ax.set_ylabel('Y (m)')
+        ax.set_zlabel('Z (m)')
+        ax.set_title(f'3D Radar Targets (Last {history} Frames)')
+        self.scatter = ax.scatter([], [], [], s=size, depthshade=False)
+        self.blitter = BlitRenderer(ax.figure.canvas, [self.scatter])
+
+    def update(self) -> bool:
+        """Show the current content of the buffer, returns False if the
+        update was skipped"""
+        count = self.buffer.snapshot(self.points, self.ages, self.history)
+        points = self.points[:count]
+        colors = self.colors[:count]
+
+        # colour from x, opacity from age
+        scratch = self.scratch[:count]
+        np.subtract(points[:, 0], self.x_min, out=scratch)
+        scratch *= self.x_scale
+        np.clip(scratch, 0, 255, out=scratch)
+        np.copyto(self.color_index[:count], scratch, casting="unsafe")
+        np.take(self.lut, self.color_index[:count], axis=0, out=colors)
+        np.divide(self.ages[:count], -self.history, out=scratch)
+        scratch += 1
+        np.clip(scratch, 0, 1, out=scratch)
+        np.multiply(scratch, self.alpha, out=colors[:, 3])
+
+        self.scatter._offsets3d = (points[:, 0], points[:, 1], points[:, 2])
+        self.scatter.set_facecolor(colors)
+        self.scatter.set_edgecolor(colors)
+        if self.blitter.background is not None:
+            # blitting skips Axes3D.draw, which projects the points
+            self.scatter.do_3d_projection()
+        return self.blitter.update()
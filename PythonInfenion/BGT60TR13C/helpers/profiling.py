@@ -0,0 +1,221 @@
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Per-stage timing of the processing chain. Instrumented code checks the
+# module flag once before touching the clock, so the hooks cost an
+# attribute lookup and a branch while profiling is disabled:
+#
+#     profile = profiling.enabled
+#     if profile:
+#         start = time.perf_counter()
+#     ...
+#     if profile:
+#         start = profiling.record("mti", start)
+#
+# Every thread records into histograms of its own, so recording never
+# takes a lock; readers merge the histograms of all threads.
+
+enabled = False
+
+# HDR-style log-linear buckets of microseconds: exact below 2**SUB_BITS,
+# above that 2**(SUB_BITS-1) buckets per power of two (under 1.6% error)
+SUB_BITS = 7
+MAX_US = 1 << 36
+
+# bucket bounds of the Prometheus export, in seconds
+PROMETHEUS_BUCKETS_S = [50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3, 100e-3,
+                        250e-3, 500e-3, 1.0, 2.5]
+
+
+def bucket_index(value_us: int) -> int:
+    if value_us < (1 << SUB_BITS):
+        return value_us
+    exponent = value_us.bit_length() - SUB_BITS
+    return (exponent << (SUB_BITS - 1)) + (value_us >> exponent)
+
+
+def bucket_upper_us(index: int) -> int:
+    # highest value counted in a bucket
+    if index < (1 << SUB_BITS):
+        return index
+    exponent = (index >> (SUB_BITS - 1)) - 1
+    return ((index - (exponent << (SUB_BITS - 1)) + 1) << exponent) - 1
+
+
+NUM_BUCKETS = bucket_index(MAX_US) + 1
+BUCKET_UPPER_US = np.array([bucket_upper_us(i) for i in range(NUM_BUCKETS)])
+
+
+class Histogram:
+    """Durations in log-linear microsecond buckets, written by one thread"""
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record_us(self, value_us: int):
+        value_us = min(max(value_us, 0), MAX_US)
+        self.counts[bucket_index(value_us)] += 1
+        self.count += 1
+        self.total_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+
+class Snapshot:
+    """Merged histogram of a stage over all threads"""
+
+    def __init__(self, counts: np.ndarray, total_us: int, max_us: int):
+        self.counts = counts
+        self.count = int(counts.sum())
+        self.total_us = total_us
+        self.max_us = max_us
+
+    def __sub__(self, earlier):
+        # the durations recorded since 'earlier', the maximum to bucket precision
+        counts = self.counts - earlier.counts
+        nonzero = np.flatnonzero(counts)
+        max_us = int(min(BUCKET_UPPER_US[nonzero[-1]], self.max_us)) if len(nonzero) else 0
+        return Snapshot(counts, self.total_us - earlier.total_us, max_us)
+
+    def quantile_us(self, q: float) -> int:
+        if not self.count:
+            return 0
+        index = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        return int(min(BUCKET_UPPER_US[index], self.max_us))
+
+    def count_below_us(self, limit_us: float) -> int:
+        return int(self.counts[BUCKET_UPPER_US <= limit_us].sum())
+
+
+_local = threading.local()
+_lock = threading.Lock()
+_thread_histograms = []
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def record(stage: str, start_s: float) -> float:
+    """Record the time since start_s (time.perf_counter()) for a stage,
+    returns the current time as start of the next stage"""
+    now = time.perf_counter()
+    histograms = getattr(_local, "histograms", None)
+    if histograms is None:
+        histograms = _local.histograms = {}
+        with _lock:
+            _thread_histograms.append(histograms)
+    histogram = histograms.get(stage)
+    if histogram is None:
+        # new stages are rare, readers copy the dictionaries under the lock
+        with _lock:
+            histogram = histograms[stage] = Histogram()
+    histogram.record_us(int((now - start_s) * 1e6))
+    return now
+
+
+def snapshot() -> dict:
+    """Merged histograms of all threads, by stage name"""
+    with _lock:
+        per_thread = [list(histograms.items()) for histograms in _thread_histograms]
+
+    merged = {}
+    for items in per_thread:
+        for stage, histogram in items:
+            counts, total_us, max_us = merged.get(stage, (np.zeros(NUM_BUCKETS, dtype=np.int64), 0, 0))
+            counts += histogram.counts
+            merged[stage] = (counts, total_us + histogram.total_us, max(max_us, histogram.max_us))
+    return {stage: Snapshot(*values) for stage, values in sorted(merged.items())}
+
+
+def prometheus_text(snapshots: dict = None) -> str:
+    """All stages as a Prometheus histogram plus p50/p99/max gauges"""
+    snapshots = snapshot() if snapshots is None else snapshots
+    lines = ["# HELP radar_stage_seconds Processing time of a stage per frame",
+             "# TYPE radar_stage_seconds histogram"]
+    for stage, s in snapshots.items():
+        for limit_s in PROMETHEUS_BUCKETS_S:
+            lines.append(f'radar_stage_seconds_bucket{{stage="{stage}",le="{limit_s:g}"}} '
+                         f'{s.count_below_us(limit_s * 1e6)}')
+        lines.append(f'radar_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {s.count}')
+        lines.append(f'radar_stage_seconds_sum{{stage="{stage}"}} {s.total_us * 1e-6:.6f}')
+        lines.append(f'radar_stage_seconds_count{{stage="{stage}"}} {s.count}')
+
+    lines += ["# HELP radar_stage_quantile_seconds Quantiles and maximum of the processing time of a stage",
+              "# TYPE radar_stage_quantile_seconds gauge"]
+    for stage, s in snapshots.items():
+        for name, value_us in (("0.5", s.quantile_us(0.5)), ("0.99", s.quantile_us(0.99)), ("max", s.max_us)):
+            lines.append(f'radar_stage_quantile_seconds{{stage="{stage}",quantile="{name}"}} {value_us * 1e-6:.6f}')
+    return "\n".join(lines) + "\n"
+
+
+def summary(snapshots: dict) -> str:
+    lines = [f"{'stage':<24} {'count':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    for stage, s in snapshots.items():
+        if s.count:
+            lines.append(f"{stage:<24} {s.count:8d} {s.quantile_us(0.5) / 1e3:9.3f} "
+                         f"{s.quantile_us(0.99) / 1e3:9.3f} {s.max_us / 1e3:9.3f}")
+    return "\n".join(lines)
+
+
+class SummaryLogger:
+    """Prints p50, p99 and max of every stage over the last interval"""
+
+    def __init__(self, interval_s: float = 10.0, output=sys.stdout):
+        self.interval_s = interval_s
+        self.output = output
+        self.previous = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval_s):
+            current = snapshot()
+            interval = {stage: s - self.previous[stage] if stage in self.previous else s
+                        for stage, s in current.items()}
+            self.previous = current
+            print(f"Stage timing of the last {self.interval_s:g}s:\n{summary(interval)}", file=self.output,
+                  flush=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve GET /metrics in a background thread, returns the server (shutdown() stops it)"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
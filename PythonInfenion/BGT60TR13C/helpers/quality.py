@@ -0,0 +1,115 @@
+import sys
+import time
+from collections import deque
+
+
+class QualityLevel:
+    """A declared processing quality: a name plus the options the
+    processing is built with at that level"""
+
+    def __init__(self, name: str, **options):
+        self.name = name
+        self.options = options
+
+    def __repr__(self):
+        return f"QualityLevel({self.name!r})"
+
+
+class QualityController:
+    """Steps down through quality levels while the processing overruns the
+    frame period, and back up once there is headroom again
+
+    update() is called with the processing time of every frame. Over the
+    last 'window' frames, if at least half took longer than 'high_water'
+    times the frame period, the next cheaper level is taken. A level is left
+    for the next better one after 'hold' frames in a row below 'low_water'
+    times the period; stepping up costs more time per frame, so low_water
+    leaves room for that. If a step up is followed by a step down within
+    four hold times, the better level did not fit after all and the hold
+    time doubles, so the controller does not keep flapping between two
+    levels. Every change is logged and passed to on_change(level) in the
+    thread calling update(), between two frames.
+    """
+
+    def __init__(self, levels: list, frame_time_s: float, on_change=None, name: str = "processing",
+                 high_water: float = 0.9, low_water: float = 0.6, window: int = 8, max_hold: int = 512,
+                 output=sys.stdout):
+        """Create the controller at the best level
+
+        Parameters:
+            - levels:       QualityLevels from the best to the cheapest
+            - frame_time_s: time budget of a frame, the frame repetition time
+            - on_change:    called with the new level on every change
+            - name:         name of the processing in the log
+            - high_water:   fraction of the frame time counted as overrun
+            - low_water:    fraction of the frame time counted as headroom
+            - window:       frames over which overruns are counted, also the
+                            initial hold time
+            - max_hold:     limit of the doubled hold time, in frames
+            - output:       stream the changes are logged to, None for no log
+        """
+        self.levels = list(levels)
+        self.frame_time_s = frame_time_s
+        self.on_change = on_change
+        self.name = name
+        self.high_water_s = high_water * frame_time_s
+        self.low_water_s = low_water * frame_time_s
+        self.window = window
+        self.max_hold = max_hold
+        self.output = output
+
+        self.index = 0
+        self.hold = window
+        self.durations = deque(maxlen=window)
+        self.headroom_frames = 0
+        self.frames_since_up = None
+        self.frames = 0
+        self.overruns = 0
+        self.changes = []
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.levels[self.index]
+
+    def update(self, duration_s: float) -> QualityLevel:
+        """Account the processing time of a frame, returns the new level if
+        it changed, otherwise None"""
+        self.frames += 1
+        if duration_s > self.frame_time_s:
+            self.overruns += 1
+        if self.frames_since_up is not None:
+            self.frames_since_up += 1
+
+        self.durations.append(duration_s)
+        self.headroom_frames = self.headroom_frames + 1 if duration_s < self.low_water_s else 0
+
+        overruns = sum(1 for d in self.durations if d > self.high_water_s)
+        if overruns * 2 >= self.window and self.index < len(self.levels) - 1:
+            if self.frames_since_up is not None and self.frames_since_up <= 4 * self.hold:
+                self.hold = min(2 * self.hold, self.max_hold)
+            self.frames_since_up = None
+            return self._change(self.index + 1, f"{overruns} of {len(self.durations)} frames over "
+                                                f"{self.high_water_s * 1e3:.1f} ms")
+        if self.headroom_frames >= self.hold and self.index > 0:
+            self.frames_since_up = 0
+            return self._change(self.index - 1, f"{self.headroom_frames} frames under "
+                                                f"{self.low_water_s * 1e3:.1f} ms")
+        return None
+
+    def _change(self, index: int, reason: str) -> QualityLevel:
+        previous = self.level
+        self.index = index
+        # the frames measured so far belong to the previous level
+        self.durations.clear()
+        self.headroom_frames = 0
+        self.changes.append((time.time(), previous.name, self.level.name))
+        if self.output is not None:
+            print(f"{self.name}: quality {previous.name} -> {self.level.name} ({reason}, frame time "
+                  f"{self.frame_time_s * 1e3:.1f} ms)", file=self.output, flush=True)
+        if self.on_change is not None:
+            self.on_change(self.level)
+        return self.level
+
+    def stats(self) -> dict:
+        return {"level": self.level.name, "frames": self.frames, "overruns": self.overruns,
+                "changes": len(self.changes), "hold": self.hold}
@@ -30,11 +30,10 @@ import pprint
 import matplotlib.pyplot as plt
 import numpy as np
 
-from ifxradarsdk import get_version_full
-from ifxradarsdk.fmcw import DeviceFmcw
-from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwSequenceChirp
 from helpers.DigitalBeamForming import *
 from helpers.DopplerAlgo import *
+from helpers.RadarGeometry import angle_axis_deg
+from helpers.blit import BlitRenderer
 
 
 def num_rx_antennas_from_rx_mask(rx_mask):
@@ -88,6 +87,9 @@ class LivePlot:
         cbar = self._fig.colorbar(self.h, cax=cbar_ax)
         cbar.ax.set_ylabel("magnitude (a.u.)")
 
+        # axes and colorbar are static, the map and its title are redrawn
+        self._renderer = BlitRenderer(self._fig.canvas, [self.h, self._ax.title])
+
     def _draw_next_time(self, data: np.ndarray):
         # Update data for each antenna
 
@@ -101,8 +103,7 @@ class LivePlot:
                 self._draw_first_time(data)
             self._ax.set_title(title)
 
-            self._fig.canvas.draw_idle()
-            self._fig.canvas.flush_events()
+            self._renderer.update()
 
     def close(self, event=None):
         if not self.is_closed():
@@ -119,6 +120,10 @@ class LivePlot:
 # Main logic
 # -------------------------------------------------
 if __name__ == '__main__':
+    from ifxradarsdk import get_version_full
+    from ifxradarsdk.fmcw import DeviceFmcw
+    from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwSequenceChirp
+
     num_beams = 27  # number of beams
     max_angle_degrees = 40  # maximum angle, angle ranges from -40 to +40 degrees
 
@@ -164,14 +169,14 @@ if __name__ == '__main__':
         doppler = DopplerAlgo(config.chirp.num_samples, config.num_chirps, num_rx_antennas)
         dbf = DigitalBeamForming(num_rx_antennas, num_beams=num_beams, max_angle_degrees=max_angle_degrees)
         plot = LivePlot(max_angle_degrees, max_range_m)
+        angle_axis = angle_axis_deg(num_beams, max_angle_degrees)
+        rd_spectrum = np.zeros((config.chirp.num_samples, 2 * config.num_chirps, num_rx_antennas), dtype=complex)
 
         while not plot.is_closed():
             # frame has dimension num_rx_antennas x num_chirps_per_frame x num_samples_per_chirp
             frame_contents = device.get_next_frame()
             frame = frame_contents[0]
 
-            rd_spectrum = np.zeros((config.chirp.num_samples, 2 * config.num_chirps, num_rx_antennas), dtype=complex)
-
             beam_range_energy = np.zeros((config.chirp.num_samples, num_beams))
 
             for i_ant in range(num_rx_antennas):  # For each antenna
@@ -179,8 +184,7 @@ if __name__ == '__main__':
                 mat = frame[i_ant, :, :]
 
                 # Compute Doppler spectrum
-                dfft_dbfs = doppler.compute_doppler_map(mat, i_ant)
-                rd_spectrum[:, :, i_ant] = dfft_dbfs
+                doppler.compute_doppler_map(mat, i_ant, out=rd_spectrum[:, :, i_ant])
 
             # Compute Range-Angle map
             rd_beam_formed = dbf.run(rd_spectrum)
@@ -200,7 +204,7 @@ if __name__ == '__main__':
 
             # Find dominant angle of target
             _, idx = np.unravel_index(beam_range_energy.argmax(), beam_range_energy.shape)
-            angle_degrees = np.linspace(-max_angle_degrees, max_angle_degrees, num_beams)[idx]
+            angle_degrees = angle_axis[idx]
 
             # And plot...
             plot.draw(beam_range_energy, f"Range-Angle map using DBF, angle={angle_degrees:+02.0f} degrees")
@@ -30,10 +30,8 @@ import argparse
 import matplotlib.pyplot as plt
 import numpy as np
 
-from ifxradarsdk import get_version_full
-from ifxradarsdk.fmcw import DeviceFmcw
-from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwMetrics
 from helpers.DopplerAlgo import *
+from helpers.blit import BlitRenderer
 
 
 # -------------------------------------------------
@@ -45,11 +43,14 @@ class Draw:
     # Draw is done for each antenna, and each antenna is represented for
     # other subplot
 
-    def __init__(self, max_speed_m_s, max_range_m, num_ant):
+    def __init__(self, max_speed_m_s, max_range_m, num_ant, levels=None):
         # max_range_m:   maximum supported range
         # max_speed_m_s: maximum supported speed
         # num_ant:      number of available antennas
+        # levels:       (min, max) of the colour scale, from the first frame
+        #               if None
         self._h = []
+        self._levels = levels
         self._max_speed_m_s = max_speed_m_s
         self._max_range_m = max_range_m
         self._num_ant = num_ant
@@ -74,8 +75,11 @@ class Draw:
         # in same scale
         # data_all_antennas: array of raw data for each antenna
 
-        minmin = min([np.min(data) for data in data_all_antennas])
-        maxmax = max([np.max(data) for data in data_all_antennas])
+        if self._levels is not None:
+            minmin, maxmax = self._levels
+        else:
+            minmin = min([np.min(data) for data in data_all_antennas])
+            maxmax = max([np.max(data) for data in data_all_antennas])
 
         for i_ant in range(self._num_ant):
             data = data_all_antennas[i_ant]
@@ -99,6 +103,9 @@ class Draw:
         cbar = self._fig.colorbar(self._h[0], cax=cbar_ax)
         cbar.ax.set_ylabel("magnitude (dB)")
 
+        # axes and colorbar are static, only the images are redrawn
+        self._renderer = BlitRenderer(self._fig.canvas, self._h)
+
     def _draw_next_time(self, data_all_antennas):
         # data_all_antennas: array of raw data for each antenna
 
@@ -115,8 +122,7 @@ class Draw:
             else:
                 self._draw_next_time(data_all_antennas)
 
-            self._fig.canvas.draw_idle()
-            self._fig.canvas.flush_events()
+            self._renderer.update()
 
     def close(self, event=None):
         if self.is_open():
@@ -156,6 +162,10 @@ def linear_to_dB(x):
 # Main logic
 # -------------------------------------------------
 if __name__ == '__main__':
+    from ifxradarsdk import get_version_full
+    from ifxradarsdk.fmcw import DeviceFmcw
+    from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwMetrics
+
     args = parse_program_arguments(
         '''Displays range doppler map from Radar Data''',
         def_nframes=50,
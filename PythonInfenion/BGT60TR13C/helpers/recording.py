@@ -0,0 +1,346 @@
+import json
+import os
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from helpers.frame_store import ChunkedFrameReader, ChunkedFrameWriter, load_codec
+from helpers.RadarGeometry import RadarGeometry
+from helpers.session_index import SessionIndex, SessionIndexBuilder, build_index
+
+# fields of FmcwSimpleSequenceConfig / FmcwSequenceChirp needed to process a
+# recording offline, without the radar SDK
+CONFIG_FIELDS = ["frame_repetition_time_s", "chirp_repetition_time_s", "num_chirps", "tdm_mimo"]
+CHIRP_FIELDS = ["start_frequency_Hz", "end_frequency_Hz", "sample_rate_Hz", "num_samples", "rx_mask", "tx_mask",
+                "tx_power_level", "lp_cutoff_Hz", "hp_cutoff_Hz", "if_gain_dB"]
+
+SESSION_FILE = "session.json"
+# float frames as delivered, or 16-bit integers in chunks (helpers.frame_store)
+FRAMES_FILE = "frames.bin"
+CHUNKED_FRAMES_FILE = "frames.rfc"
+TIMESTAMPS_FILE = "timestamps.npy"
+# per-second frame offsets and motion (helpers.session_index), built while
+# recording, or on first use for sessions recorded without it
+INDEX_FILE = "index.npz"
+
+# Optional ground truth of a session, written by hand or a labelling tool:
+# per use case a list of frame intervals (start inclusive, stop exclusive)
+# with the value the use case should report, e.g.
+#   {"fall": [{"start": 120, "stop": 180, "value": true}],
+#    "people_count": [{"start": 0, "stop": 600, "value": 2}]}
+# Frames outside the intervals of a use case are not evaluated for it.
+LABELS_FILE = "labels.json"
+
+_CLOSE = object()
+
+
+def config_to_dict(config):
+    """Plain dictionary of a FmcwSimpleSequenceConfig, for JSON"""
+    d = {name: getattr(config, name) for name in CONFIG_FIELDS if hasattr(config, name)}
+    d["chirp"] = {name: getattr(config.chirp, name) for name in CHIRP_FIELDS if hasattr(config.chirp, name)}
+    return d
+
+
+def config_from_dict(d):
+    """Config with the attributes of a FmcwSimpleSequenceConfig (config.chirp.num_samples, ...)"""
+    fields = dict(d)
+    fields["chirp"] = SimpleNamespace(**fields["chirp"])
+    return SimpleNamespace(**fields)
+
+
+class SessionWriter:
+    """Records raw frames of a session into a directory
+
+    By default frames are stored as 16-bit integers of the ADC in chunks of
+    'chunk_frames' frames (frames.rfc, see helpers.frame_store), a quarter of
+    the float frames or less with compression. With codec None they are
+    appended unchanged to frames.bin as they arrive. The session index is
+    built along. session.json is written by close() and marks the session as
+    complete.
+
+    write() only queues a copy of the frame; a writer thread stores it, so
+    the acquisition never waits for the disk. When the writer falls
+    'max_queued' frames behind, further frames are dropped and counted.
+    """
+
+    def __init__(self, path: str, config, max_range_m: float = None, codec: str = "zlib", chunk_frames: int = 16,
+                 index: bool = True, max_queued: int = 256):
+        """Create a recording
+
+        Parameters:
+            - path:         session directory, created if needed
+            - config:       FmcwSimpleSequenceConfig of the acquisition
+            - max_range_m:  maximum range from the device metrics
+            - codec:        compression of the int16 chunks out of
+                            helpers.frame_store.CODECS, None for float frames
+            - chunk_frames: frames per chunk
+            - index:        build the session index while recording
+            - max_queued:   frames waiting for the writer thread
+        """
+        self.path = path
+        self.config = config
+        self.max_range_m = max_range_m
+        self.codec = codec
+        self.chunk_frames = chunk_frames
+        if codec is not None:
+            # unknown or missing codecs fail here, not in the writer thread
+            load_codec(codec)
+        os.makedirs(path, exist_ok=True)
+
+        self.frames_file = None
+        self.timestamps = []
+        self.frame_shape = None
+        self.dtype = None
+        self.index = index
+        self.index_builder = None
+
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.dropped = 0
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._write_loop, name="session_writer", daemon=True)
+        self.thread.start()
+
+    def write(self, frame: np.ndarray, timestamp: float):
+        """Queue a frame (num_rx_antennas x num_chirps_per_frame x
+        num_samples_per_chirp) for the writer thread, never blocks"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait((np.array(frame), timestamp))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        # the int16 quantization and compression of the chunks run here, not
+        # in the acquisition thread
+        while True:
+            item = self.queue.get()
+            if item is _CLOSE:
+                return
+            if self.error is not None:
+                self.dropped += 1
+                continue
+            try:
+                self._write_frame(*item)
+            except Exception as e:
+                # raised again by close(), the frames that follow are dropped
+                self.error = e
+
+    def _write_frame(self, frame: np.ndarray, timestamp: float):
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+            self.dtype = frame.dtype
+            if self.index:
+                # created here so that PresenceAlgo is imported by the writer
+                # thread, its range FFT of every frame runs here as well
+                self.index_builder = SessionIndexBuilder(self.config)
+            if self.codec is None:
+                self.frames_file = open(os.path.join(self.path, FRAMES_FILE), "wb")
+            else:
+                self.frames_file = ChunkedFrameWriter(os.path.join(self.path, CHUNKED_FRAMES_FILE), frame.shape,
+                                                      codec=self.codec, chunk_frames=self.chunk_frames)
+        if self.codec is None:
+            self.frames_file.write(np.ascontiguousarray(frame, dtype=self.dtype).tobytes())
+        else:
+            self.frames_file.write(frame)
+        self.timestamps.append(timestamp)
+        if self.index_builder is not None:
+            self.index_builder.add(frame, timestamp)
+
+    def close(self):
+        """Write the queued frames and complete the session"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(_CLOSE)
+        self.thread.join()
+        if self.error is not None:
+            if self.frames_file is not None:
+                self.frames_file.close()
+            raise RuntimeError(f"Recording {self.path} failed: {self.error}") from self.error
+
+        if self.frames_file is not None:
+            self.frames_file.close()
+        np.save(os.path.join(self.path, TIMESTAMPS_FILE), np.array(self.timestamps))
+        if self.index_builder is not None:
+            self.index_builder.build().save(os.path.join(self.path, INDEX_FILE))
+
+        session = {
+            "config": config_to_dict(self.config),
+            "max_range_m": self.max_range_m,
+            "num_frames": len(self.timestamps),
+            "frame_shape": list(self.frame_shape or ()),
+            "dtype": np.dtype(self.dtype or np.float64).str,
+            "storage": "float" if self.codec is None else "int16_chunks",
+        }
+        if self.codec is not None and self.frames_file is not None and self.frames_file.clipped:
+            print(f"{self.path}: {self.frames_file.clipped} samples outside the 16-bit range were clipped")
+        if self.dropped:
+            print(f"{self.path}: {self.dropped} frames dropped, the writer fell {self.queue.maxsize} frames behind")
+        with open(os.path.join(self.path, SESSION_FILE), "w") as f:
+            json.dump(session, f, indent=2)
+
+
+class Session:
+    """A recorded session, frames are read on access: memory mapped float
+    frames, or decoded a chunk at a time from int16 chunks"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, SESSION_FILE)) as f:
+            session = json.load(f)
+
+        self.name = os.path.basename(os.path.normpath(path))
+        self.config = config_from_dict(session["config"])
+        self.max_range_m = session.get("max_range_m")
+        self.num_frames = session["num_frames"]
+        self.timestamps = np.load(os.path.join(path, TIMESTAMPS_FILE))
+
+        self.labels = {}
+        labels_path = os.path.join(path, LABELS_FILE)
+        if os.path.isfile(labels_path):
+            with open(labels_path) as f:
+                self.labels = json.load(f)
+
+        shape = (self.num_frames,) + tuple(session["frame_shape"])
+        if self.num_frames and session.get("storage") == "int16_chunks":
+            self.frames = ChunkedFrameReader(os.path.join(path, CHUNKED_FRAMES_FILE))
+        elif self.num_frames:
+            self.frames = np.memmap(os.path.join(path, FRAMES_FILE), dtype=np.dtype(session["dtype"]),
+                                    mode="r", shape=shape)
+        else:
+            self.frames = np.zeros(shape)
+        self._index = None
+
+    def __len__(self):
+        return self.num_frames
+
+    @property
+    def index(self) -> SessionIndex:
+        """The session index, built from the frames and saved if the
+        session has none yet (the session directory may be read-only)"""
+        if self._index is None:
+            index_path = os.path.join(self.path, INDEX_FILE)
+            if os.path.isfile(index_path):
+                self._index = SessionIndex.load(index_path)
+            else:
+                self._index = build_index(self)
+                try:
+                    self._index.save(index_path)
+                except OSError:
+                    pass
+        return self._index
+
+    def frame_at(self, time_s: float) -> int:
+        """First frame at or after 'time_s' seconds into the recording"""
+        return self.index.frame_at(self.timestamps, time_s)
+
+    def active_frames(self, threshold: float = None, margin_s: int = 1) -> np.ndarray:
+        """Frame numbers outside idle stretches, see SessionIndex.active_frames()"""
+        return self.index.active_frames(threshold, margin_s)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+
+def is_session(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, SESSION_FILE))
+
+
+def find_sessions(directory: str) -> list:
+    """All complete sessions below a directory"""
+    sessions = []
+    for root, dirs, files in os.walk(directory):
+        if SESSION_FILE in files:
+            sessions.append(root)
+            dirs.clear()
+    return sorted(sessions)
+
+
+class SessionPlayer:
+    """Replays a recorded session in place of RadarDataAcquisition
+
+    Frames are delivered through the same interface (config, geometry,
+    get_latest_frame(), wait_for_frame()) and with the recorded timing, so
+    anything built on the live acquisition runs without a device.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True, start_s: float = 0.0,
+                 skip_idle: bool = False):
+        """Create a player
+
+        Parameters:
+            - path:         session directory
+            - speed:        playback speed, 2 plays twice as fast as recorded
+            - loop:         start over (at start_s) at the end of the session
+            - start_s:      start this many seconds into the recording
+            - skip_idle:    leave out the idle stretches of the session index
+                            without waiting for them
+
+        Raises ValueError if no frame is left to play, e.g. start_s is past
+        the end of the recording or all of it is idle.
+        """
+        self.session = Session(path)
+        self.config = self.session.config
+        self.geometry = RadarGeometry.from_config(self.config, max_range_m=self.session.max_range_m)
+        self.speed = speed
+        self.loop = loop
+
+        first = self.session.frame_at(start_s) if start_s else 0
+        frames = self.session.active_frames() if skip_idle else np.arange(len(self.session))
+        self.frames = frames[frames >= first]
+        if not len(self.frames):
+            raise ValueError(f"No frames to play in {path}" + (f" after {start_s} s" if start_s else "") +
+                             (" outside idle stretches" if skip_idle else ""))
+
+        self.latest_frame = None
+        self.frame_number = 0
+        self.running = False
+        self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
+        self.playback_thread = None
+
+    def start(self):
+        self.running = True
+        self.playback_thread = threading.Thread(target=self._play, daemon=True)
+        self.playback_thread.start()
+
+    def _play(self):
+        timestamps = self.session.timestamps
+        if len(timestamps) > 1:
+            intervals = np.diff(timestamps, append=timestamps[-1] + np.median(np.diff(timestamps)))
+        else:
+            intervals = np.full(len(timestamps), self.config.frame_repetition_time_s)
+
+        while self.running:
+            next_time = time.perf_counter()
+            for i_frame in self.frames:
+                if not self.running:
+                    return
+                with self.lock:
+                    self.latest_frame = np.asarray(self.session[i_frame])
+                    self.frame_number += 1
+                    self.new_frame.notify_all()
+                next_time += intervals[i_frame] / self.speed
+                time.sleep(max(0.0, next_time - time.perf_counter()))
+            if not self.loop:
+                self.running = False
+
+    def get_latest_frame(self):
+        with self.lock:
+            return self.latest_frame
+
+    def wait_for_frame(self, last_frame_number, timeout=None):
+        with self.lock:
+            if not self.new_frame.wait_for(lambda: self.frame_number != last_frame_number, timeout):
+                return last_frame_number, None
+            return self.frame_number, self.latest_frame
+
+    def stop(self):
+        self.running = False
+        if self.playback_thread:
+            self.playback_thread.join()
@@ -0,0 +1,128 @@
+import numpy as np
+
+# Index of a recorded session by second: the first frame of every second
+# since the start of the recording, for seeking to a time without scanning
+# the timestamps, and the motion in that second. Motion is the largest
+# change of the range profile of the first antenna (PresenceAlgo's, over
+# its region of interest) from one frame to the next. A second whose motion
+# stays below the threshold is idle: nothing moved in the room. Unlike the
+# presence state, which follows a slow average of the background, this
+# drops to the noise as soon as the motion ends.
+
+# motion threshold in multiples of PresenceAlgo's presence threshold, the
+# noise of the profile changes stays below the presence threshold
+MOTION_THRESHOLD_FACTOR = 2.0
+
+
+class SessionIndex:
+    """Per-second frame offsets and motion of a session"""
+
+    def __init__(self, start_time: float, first_frames: np.ndarray, motion_max: np.ndarray,
+                 motion_mean: np.ndarray, threshold: float, num_frames: int):
+        """Parameters:
+            - start_time:   timestamp of the first frame
+            - first_frames: first frame of every second (num_seconds), a
+                            second without frames has the first frame of the
+                            next one
+            - motion_max:   largest motion of a frame in every second
+            - motion_mean:  mean motion of the frames of every second
+            - threshold:    motion below which a second is idle
+            - num_frames:   frames of the session
+        """
+        self.start_time = start_time
+        self.first_frames = first_frames
+        self.motion_max = motion_max
+        self.motion_mean = motion_mean
+        self.threshold = threshold
+        self.num_frames = num_frames
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as f:
+            return cls(float(f["start_time"]), f["first_frames"], f["motion_max"], f["motion_mean"],
+                       float(f["threshold"]), int(f["num_frames"]))
+
+    def save(self, path: str):
+        np.savez(path, start_time=self.start_time, first_frames=self.first_frames, motion_max=self.motion_max,
+                 motion_mean=self.motion_mean, threshold=self.threshold, num_frames=self.num_frames)
+
+    @property
+    def num_seconds(self) -> int:
+        return len(self.first_frames)
+
+    def frame_at(self, timestamps: np.ndarray, time_s: float) -> int:
+        """First frame at or after 'time_s' seconds into the recording,
+        found within its second of the timestamps"""
+        second = int(np.clip(np.floor(time_s), 0, self.num_seconds))
+        if second >= self.num_seconds:
+            return self.num_frames
+        first = self.first_frames[second]
+        last = self.first_frames[second + 1] if second + 1 < self.num_seconds else self.num_frames
+        return int(first + np.searchsorted(timestamps[first:last], self.start_time + time_s))
+
+    def active_seconds(self, threshold: float = None, margin_s: int = 1) -> np.ndarray:
+        """Mask of the seconds with motion above the threshold (the one of
+        the index if None), widened by 'margin_s' seconds on either side so
+        that filters and averages settle before and after the motion"""
+        threshold = self.threshold if threshold is None else threshold
+        active = self.motion_max > threshold
+        if margin_s:
+            # any active second within +-margin_s
+            counts = np.convolve(active.astype(np.int64), np.ones(2 * margin_s + 1, dtype=np.int64), mode="same")
+            active = counts > 0
+        return active
+
+    def active_frames(self, threshold: float = None, margin_s: int = 1) -> np.ndarray:
+        """Frame numbers of the active seconds, in order"""
+        lasts = np.append(self.first_frames[1:], self.num_frames)
+        seconds = np.flatnonzero(self.active_seconds(threshold, margin_s))
+        if not len(seconds):
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(self.first_frames[s], lasts[s]) for s in seconds])
+
+
+class SessionIndexBuilder:
+    """Builds the SessionIndex frame by frame, while recording or offline"""
+
+    def __init__(self, config):
+        # PresenceAlgo is imported when an index is built
+        from helpers.PresenceAlgo import PresenceAlgo
+        self.presence = PresenceAlgo(config.chirp.num_samples, config.num_chirps)
+        self.threshold = MOTION_THRESHOLD_FACTOR * self.presence.threshold_presence
+        self.previous_profile = None
+        self.timestamps = []
+        self.motion = []
+
+    def add(self, frame: np.ndarray, timestamp: float):
+        # frame: num_rx_antennas x num_chirps_per_frame x num_samples_per_chirp
+        profile = self.presence.range_profile(frame[0])
+        previous, self.previous_profile = self.previous_profile, profile
+        self.motion.append(0.0 if previous is None else float(np.max(np.abs(profile - previous))))
+        self.timestamps.append(timestamp)
+
+    def build(self) -> SessionIndex:
+        num_frames = len(self.timestamps)
+        if not num_frames:
+            return SessionIndex(0.0, np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), self.threshold, 0)
+
+        # wall clock timestamps may step back, seconds follow the latest so far
+        timestamps = np.maximum.accumulate(np.array(self.timestamps))
+        start_time = timestamps[0]
+        seconds = (timestamps - start_time).astype(np.int64)
+        num_seconds = seconds[-1] + 1
+        first_frames = np.searchsorted(seconds, np.arange(num_seconds))
+
+        motion = np.array(self.motion)
+        frames_per_second = np.bincount(seconds, minlength=num_seconds)
+        motion_max = np.zeros(num_seconds)
+        np.maximum.at(motion_max, seconds, motion)
+        motion_mean = np.bincount(seconds, weights=motion, minlength=num_seconds) / np.maximum(frames_per_second, 1)
+        return SessionIndex(float(start_time), first_frames, motion_max, motion_mean, self.threshold, num_frames)
+
+
+def build_index(session) -> SessionIndex:
+    """Index of a recorded Session from its frames"""
+    builder = SessionIndexBuilder(session.config)
+    for i_frame in range(len(session)):
+        builder.add(np.asarray(session[i_frame]), session.timestamps[i_frame])
+    return builder.build()
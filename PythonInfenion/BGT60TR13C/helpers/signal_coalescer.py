@@ -0,0 +1,128 @@
+import threading
+import time
+
+from helpers import profiling
+
+_UNSET = object()
+
+
+class SignalCoalescer:
+    """Coalesces the results of a detector before they are emitted to the GUI
+
+    Detectors submit a value per frame from their worker thread. A value is
+    passed on to 'emit' only if it differs from the last emitted one, and
+    no more often than max_rate_hz. Changes arriving faster are held back
+    and the latest of them is emitted when the interval has passed, so the
+    GUI always ends up showing the current value. Repeated submissions of
+    the same frame are ignored.
+    """
+
+    def __init__(self, emit, max_rate_hz: float = 10.0):
+        """Create a coalescer
+
+        Parameters:
+            - emit:         called with the value, e.g. a pyqtSignal's emit;
+                            runs in the submitting thread or in a timer thread
+            - max_rate_hz:  maximum number of emissions per second, no limit
+                            if 0
+        """
+        self.emit = emit
+        self.min_interval_s = 1.0 / max_rate_hz if max_rate_hz else 0.0
+
+        self.lock = threading.Lock()
+        self.last_frame_number = None
+        self.last_value = _UNSET
+        self.last_emit_time = float("-inf")
+        self.pending = _UNSET
+        self.timer = None
+
+        self.submitted = 0
+        self.emitted = 0
+        self.dropped = 0
+
+    def submit(self, value, frame_number: int = None):
+        """Offer the value of a frame, emitted now, later or not at all"""
+        with self.lock:
+            self.submitted += 1
+            if frame_number is not None and frame_number == self.last_frame_number:
+                self.dropped += 1
+                return
+            self.last_frame_number = frame_number
+
+            if self.last_value is not _UNSET and value == self.last_value:
+                # back at the value on screen, a held back change is obsolete
+                self.dropped += 1
+                if self.pending is not _UNSET:
+                    self._cancel_pending()
+                    self.dropped += 1
+                return
+
+            if self.pending is not _UNSET:
+                # replace the held back value, the timer emits the latest
+                self.dropped += 1
+                self.pending = value
+                return
+
+            wait_s = self.last_emit_time + self.min_interval_s - time.monotonic()
+            if wait_s > 0:
+                self.pending = value
+                self.timer = threading.Timer(wait_s, self._emit_pending)
+                self.timer.daemon = True
+                self.timer.start()
+                return
+
+            self._mark_emitted(value)
+        self._emit(value)
+
+    def flush(self):
+        """Emit a held back value immediately"""
+        with self.lock:
+            if self.pending is _UNSET:
+                return
+            value = self.pending
+            self._cancel_pending()
+            self._mark_emitted(value)
+        self._emit(value)
+
+    def reset(self):
+        """Forget the last value, the next submission is emitted"""
+        with self.lock:
+            if self.pending is not _UNSET:
+                self._cancel_pending()
+                self.dropped += 1
+            self.last_frame_number = None
+            self.last_value = _UNSET
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"submitted": self.submitted, "emitted": self.emitted, "dropped": self.dropped}
+
+    def _emit_pending(self):
+        with self.lock:
+            if self.pending is _UNSET:
+                return
+            value = self.pending
+            self.pending = _UNSET
+            self.timer = None
+            self._mark_emitted(value)
+        self._emit(value)
+
+    def _emit(self, value):
+        # outside the lock, a slow slot must not block submitting threads
+        profile = profiling.enabled
+        if profile:
+            start = time.perf_counter()
+        self.emit(value)
+        if profile:
+            profiling.record("gui_emit", start)
+
+    def _cancel_pending(self):
+        self.pending = _UNSET
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _mark_emitted(self, value):
+        self.last_value = value
+        self.last_emit_time = time.monotonic()
+        self.emitted += 1
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class SlidingStats:
+    """Running mean and variance over the last 'length' values, O(1) per value"""
+
+    def __init__(self, length: int):
+        """Create sliding window statistics
+
+        Parameters:
+            - length:   Number of most recent values the statistics cover
+        """
+        self.length = length
+        self.values = np.zeros(length)
+        self.reset()
+
+    def reset(self):
+        """Forget all values"""
+        self.values[:] = 0
+        self.index = 0
+        self.count = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    def push(self, value: float):
+        """Add a value, dropping the oldest one once the window is full"""
+        value = float(value)
+        if self.count == self.length:
+            old = self.values[self.index]
+            self.sum -= old
+            self.sum_sq -= old * old
+        else:
+            self.count += 1
+
+        self.values[self.index] = value
+        self.sum += value
+        self.sum_sq += value * value
+        self.index = (self.index + 1) % self.length
+
+        # re-sum once per window to stop rounding errors from accumulating
+        if self.index == 0:
+            self.sum = float(self.values.sum())
+            self.sum_sq = float(np.dot(self.values, self.values))
+
+    def mean(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return self.sum / self.count
+
+    def variance(self) -> float:
+        if self.count == 0:
+            return 0.0
+        mean = self.sum / self.count
+        return max(self.sum_sq / self.count - mean * mean, 0.0)
+
+    def is_full(self) -> bool:
+        return self.count == self.length
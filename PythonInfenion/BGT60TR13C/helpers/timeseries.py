@@ -0,0 +1,156 @@
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# Round-robin store of continuous metrics (e.g. the presence score or the
+# people count of every frame). Every metric has fixed-size tiers of
+# buckets, 1 s, 1 min, 1 h and 1 day long, each holding min, max, sum and
+# count of the values that fell into it. A tier is a ring of slots: the
+# bucket number (time // bucket length) modulo the number of slots selects
+# the slot, a newer bucket overwrites the oldest. The storage never grows.
+#
+# Tiers are NumPy arrays in .npy files opened as memory maps,
+# <directory>/<metric>_<tier>.npy, so the operating system writes them back
+# and other processes can read them while they are written. A query reads
+# the finest tier that covers the requested span in at most 'max_points'
+# buckets, the number of buckets read does not grow with the span.
+
+Tier = namedtuple("Tier", ["name", "seconds", "slots"])
+
+# bucket length and retention: 1 s for a day, 1 min for 30 days, 1 h for
+# two years and 1 day for ten years, about 10 MB per metric
+TIERS = [
+    Tier("1s", 1, 86400),
+    Tier("1min", 60, 30 * 1440),
+    Tier("1h", 3600, 2 * 365 * 24),
+    Tier("1d", 86400, 10 * 365),
+]
+
+# bucket -1 marks a slot that was never written
+SLOT_DTYPE = np.dtype([("bucket", "<i8"), ("min", "<f8"), ("max", "<f8"), ("sum", "<f8"), ("count", "<i8")])
+
+
+def open_tier(path: str, slots: int, mode: str = "r+") -> np.ndarray:
+    """Memory map of a tier file, created with empty slots if missing"""
+    if not os.path.isfile(path):
+        if mode == "r":
+            raise FileNotFoundError(path)
+        slots_array = np.lib.format.open_memmap(path, mode="w+", dtype=SLOT_DTYPE, shape=(slots,))
+        slots_array["bucket"] = -1
+        slots_array.flush()
+        return slots_array
+    slots_array = np.load(path, mmap_mode=mode)
+    if slots_array.dtype != SLOT_DTYPE or slots_array.shape != (slots,):
+        raise ValueError(f"{path} has {slots_array.shape[0]} slots of {slots_array.dtype}, expected {slots}")
+    return slots_array
+
+
+class _TierWriter:
+    """Aggregates of one metric in one tier; the bucket being filled is
+    kept in Python and written to its slot with every value"""
+
+    def __init__(self, path: str, tier: Tier):
+        self.tier = tier
+        self.slots = open_tier(path, tier.slots)
+        self.bucket = None
+
+    def add(self, value: float, timestamp: float):
+        bucket = int(timestamp // self.tier.seconds)
+        if bucket != self.bucket:
+            slot = self.slots[bucket % self.tier.slots]
+            if slot["bucket"] > bucket:
+                # older than the retention of the tier, e.g. after the clock
+                # stepped back a long way
+                return
+            if slot["bucket"] == bucket:
+                # continue the bucket, e.g. after a restart
+                self.aggregates = [float(slot["min"]), float(slot["max"]), float(slot["sum"]), int(slot["count"])]
+            else:
+                self.aggregates = [value, value, 0.0, 0]
+            self.bucket = bucket
+
+        aggregates = self.aggregates
+        if value < aggregates[0]:
+            aggregates[0] = value
+        if value > aggregates[1]:
+            aggregates[1] = value
+        aggregates[2] += value
+        aggregates[3] += 1
+        self.slots[bucket % self.tier.slots] = (bucket, *aggregates)
+
+
+class TimeSeriesStore:
+    """Writes metrics into the round-robin tiers of a directory"""
+
+    def __init__(self, directory: str, tiers: list = None):
+        """Parameters:
+            - directory: directory of the tier files, created if missing
+            - tiers:     Tier list, finest first, default TIERS; must match
+                         the files of an existing directory
+        """
+        self.directory = directory
+        self.tiers = TIERS if tiers is None else tiers
+        os.makedirs(directory, exist_ok=True)
+        self.writers = {}
+        self.lock = threading.Lock()
+
+    def add(self, metric: str, value: float, timestamp: float):
+        """Add a value at 'timestamp' (seconds since the epoch) to every
+        tier of the metric, NaN values are skipped. Called from any thread."""
+        value = float(value)
+        if value != value:
+            return
+        with self.lock:
+            writers = self.writers.get(metric)
+            if writers is None:
+                writers = self.writers[metric] = [
+                    _TierWriter(os.path.join(self.directory, f"{metric}_{tier.name}.npy"), tier)
+                    for tier in self.tiers]
+            for writer in writers:
+                writer.add(value, timestamp)
+
+    def flush(self):
+        with self.lock:
+            for writers in self.writers.values():
+                for writer in writers:
+                    writer.slots.flush()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.writers = {}
+
+
+def metrics(directory: str) -> list:
+    """Names of the metrics stored in a directory"""
+    suffix = f"_{TIERS[0].name}.npy"
+    return sorted(name[:-len(suffix)] for name in os.listdir(directory) if name.endswith(suffix))
+
+
+def query(directory: str, metric: str, start: float, end: float, max_points: int = 2000, tiers: list = None) -> dict:
+    """Aggregates of a metric between 'start' and 'end' (seconds since the
+    epoch) from the finest tier that still holds 'start' and covers the
+    span in at most 'max_points' buckets, or else from the coarsest tier
+
+    Returns a dictionary of the tier name and the arrays time (start of
+    every bucket), min, max, mean and count of the buckets with values.
+    """
+    tiers = TIERS if tiers is None else tiers
+    for tier in tiers:
+        first, last = int(start // tier.seconds), int(end // tier.seconds)
+        if last - first + 1 > min(max_points, tier.slots) and tier is not tiers[-1]:
+            continue
+        slots_array = open_tier(os.path.join(directory, f"{metric}_{tier.name}.npy"), tier.slots, "r")
+        # at most one pass around the ring (of the coarsest tier)
+        buckets = np.arange(max(first, last - tier.slots + 1), last + 1)
+        rows = slots_array[buckets % tier.slots]
+        # a slot of a later bucket: the tier no longer holds the start
+        if tier is tiers[-1] or not (rows["bucket"] > buckets).any():
+            break
+
+    rows = rows[rows["bucket"] == buckets]
+    count = rows["count"]
+    return {"tier": tier.name, "time": rows["bucket"] * float(tier.seconds), "min": rows["min"],
+            "max": rows["max"], "mean": rows["sum"] / count, "count": count}
@@ -0,0 +1,278 @@
+import numpy as np
+
+from helpers.DigitalBeamForming import DigitalBeamForming
+from helpers.DopplerAlgo import DopplerAlgo
+from helpers.fft_spectrum import default_roi_bins, fft_spectrum
+from helpers.pipeline import Stage
+from helpers.workspace import Workspace
+
+# Registry of the use cases, free of any GUI dependency. Every use case
+# processes the frames one by one; process() returns the per-frame results
+# as a dictionary. The algorithm modules are imported when a use case is
+# created, and only for the use cases that are selected, so a headless tool
+# never pays for detectors (or their scipy / sklearn imports) it does not run.
+#
+# Class attributes of a use case:
+#   - detection:    boolean result that marks a detection, or None
+#   - state:        result reported as the current state of the use case
+#   - inputs:       pipeline products process() accepts besides the frame,
+#                   as keyword arguments, computed by process() itself if
+#                   not given
+#
+# Keyword options of a use case are passed on to its algorithm (e.g.
+# range_bins, num_beams), to run variants of the default processing. The
+# presence, people count and posture detection also take the range region
+# of interest in metres (min_range_m, max_range_m), see range_options().
+
+
+def range_options(geometry, options: dict, default_bins: slice) -> dict:
+    """Options with min_range_m / max_range_m (e.g. the extent of the room)
+    replaced by the range_bins of the algorithms, through
+    RadarGeometry.range_bins(); a bound that is not given stays at the one
+    of default_bins"""
+    options = dict(options)
+    min_range_m = options.pop("min_range_m", None)
+    max_range_m = options.pop("max_range_m", None)
+    if min_range_m is not None or max_range_m is not None:
+        bins = geometry.range_bins(min_range_m, max_range_m)
+        start = bins.start if min_range_m is not None else default_bins.start
+        stop = bins.stop if max_range_m is not None else default_bins.stop
+        options["range_bins"] = slice(start, max(stop, start + 1))
+    return options
+
+
+class FallUseCase:
+    detection = "fall"
+    state = "fall"
+    inputs = ["rd_maps"]
+
+    def __init__(self, config, geometry, **options):
+        from helpers.FallDetectionAlgo import FallDetectionAlgo
+        self.algo = FallDetectionAlgo(config.chirp.num_samples, config.num_chirps, geometry, **options)
+        if "range_bins" in options:
+            # the shared maps cover all range bins
+            self.inputs = []
+
+    def process(self, frame, rd_maps=None):
+        fall = self.algo.detect_fall(frame[0, :, :], None if rd_maps is None else rd_maps[:, :, 0])
+        features = self.algo.features
+        return {"fall": fall, "velocity_m_s": features.velocity, "velocity_std_m_s": features.velocity_std,
+                "energy": features.energy, "energy_drop": features.energy_drop, "still_frames": features.still_frames}
+
+
+class PresenceUseCase:
+    detection = None
+    state = "angle_degrees"
+    inputs = ["beams"]
+
+    def __init__(self, config, geometry, **options):
+        from helpers.PresenceDetectionAlgo import PresenceDetectionAlgo
+        options = range_options(geometry, options, slice(0, geometry.num_samples))
+        self.algo = PresenceDetectionAlgo(config.chirp.num_samples, config.num_chirps, geometry.num_rx_antennas,
+                                          **dict({"max_angle_degrees": 60}, **options))
+        if options:
+            # the shared beams are the 80 beams over +-60 degrees of all range
+            # bins, the beams of the options are formed from the shared maps
+            self.inputs = ["rd_maps"]
+
+    def process(self, frame, beams=None, rd_maps=None):
+        if beams is not None:
+            return {"angle_degrees": self.algo.angle_from_beams(beams)}
+        if rd_maps is not None:
+            return {"angle_degrees": self.algo.angle_from_maps(rd_maps[self.algo.range_bins])}
+        return {"angle_degrees": self.algo.process_frame(frame)}
+
+
+class PeopleCountUseCase:
+    detection = "presence"
+    state = "num_persons"
+    inputs = ["range_fft"]
+
+    def __init__(self, config, geometry, **options):
+        from helpers.PresenceAlgo import PresenceAlgo
+        self.geometry = geometry
+        self.algo = PresenceAlgo(config.chirp.num_samples, config.num_chirps,
+                                 **range_options(geometry, options, default_roi_bins(geometry.num_samples)))
+
+    def apply_options(self, **options):
+        # new options between two frames, the detection continues
+        options = range_options(self.geometry, options, default_roi_bins(self.geometry.num_samples))
+        self.algo.set_range_bins(options.get("range_bins"))
+
+    def process(self, frame, range_fft=None):
+        state = self.algo.presence(frame[0, :, :], None if range_fft is None else range_fft[0][:, self.algo.range_bins])
+        return {"presence": bool(state.presence), "num_persons": state.num_persons,
+                "presence_score": float(np.max(state.data))}
+
+
+class PostureUseCase:
+    detection = "posture_changed"
+    state = "posture"
+    inputs = ["range_fft", "rd_maps"]
+
+    def __init__(self, config, geometry, **options):
+        from helpers.PostureDetectionAlgo import PostureDetectionAlgo
+        self.geometry = geometry
+        self.algo = PostureDetectionAlgo(config.chirp.num_samples, config.num_chirps, geometry=geometry,
+                                         **range_options(geometry, options, default_roi_bins(geometry.num_samples)))
+        self.last_posture = None
+
+    def apply_options(self, **options):
+        # new options between two frames, the detection continues
+        options = range_options(self.geometry, options, default_roi_bins(self.geometry.num_samples))
+        self.algo.set_range_bins(options.get("range_bins"))
+
+    def process(self, frame, range_fft=None, rd_maps=None):
+        state = self.algo.posture(frame[0, :, :], None if range_fft is None else range_fft[0][:, self.algo.range_bins])
+        height_m = np.nan
+        if state.presence and self.algo.has_height:
+            height_m = self.algo.height(frame, rd_maps)
+            posture = self.algo.posture_from_height(height_m)
+        else:
+            posture = self.algo.classify(state, frame, self.geometry.max_range_m, rd_maps)
+
+        changed = posture != self.last_posture
+        self.last_posture = posture
+        return {"posture": posture, "height_m": height_m, "posture_changed": changed}
+
+
+class GestureUseCase:
+    detection = "gesture"
+    state = "gesture"
+    inputs = ["rd_maps"]
+
+    def __init__(self, config, geometry, **options):
+        from helpers.GestureDetectionAlgo import GestureDetectionAlgo
+        self.algo = GestureDetectionAlgo(config.chirp.num_samples, config.num_chirps, geometry.num_rx_antennas,
+                                         **options)
+
+    def process(self, frame, rd_maps=None):
+        return {"gesture": self.algo.detect_gesture(frame, rd_maps) == "Gesture detected"}
+
+
+class PointCloudUseCase:
+    detection = None
+    state = "num_points"
+    inputs = ["rd_maps"]
+
+    def __init__(self, config, geometry, **options):
+        from helpers.DigitalBeamForming2D import DigitalBeamForming2D, rx_positions_from_mask
+        self.num_rx_antennas = geometry.num_rx_antennas
+        self.doppler = DopplerAlgo(config.chirp.num_samples, config.num_chirps, self.num_rx_antennas)
+        self.dbf = DigitalBeamForming2D(rx_positions_from_mask(config.chirp.rx_mask), **options)
+        self.range_axis_m = geometry.range_axis_m
+        self.rd_spectrum = np.zeros((config.chirp.num_samples, 2 * config.num_chirps, self.num_rx_antennas),
+                                    dtype=complex)
+
+    def process(self, frame, rd_maps=None):
+        if rd_maps is None:
+            for i_ant in range(self.num_rx_antennas):
+                self.rd_spectrum[:, :, i_ant] = self.doppler.compute_doppler_map(frame[i_ant, :, :], i_ant)
+            rd_maps = self.rd_spectrum
+        points, _ = self.dbf.point_cloud(self.dbf.run(rd_maps), self.range_axis_m)
+
+        centroid = points.mean(axis=0) if len(points) else np.full(3, np.nan)
+        return {"num_points": len(points), "x_m": centroid[0], "y_m": centroid[1], "z_m": centroid[2]}
+
+
+USE_CASES = {
+    "fall": FallUseCase,
+    "presence": PresenceUseCase,
+    "people_count": PeopleCountUseCase,
+    "posture": PostureUseCase,
+    "gesture": GestureUseCase,
+    "pointcloud": PointCloudUseCase,
+}
+
+
+def create_use_cases(names, config, geometry, options: dict = None) -> dict:
+    """Use case objects by name, raises KeyError for unknown names
+
+    options: keyword options of the use cases by name, for variants of the
+             default processing
+    """
+    unknown = [name for name in names if name not in USE_CASES]
+    if unknown:
+        raise KeyError(f"Unknown use cases: {', '.join(unknown)}")
+    options = options or {}
+    return {name: USE_CASES[name](config, geometry, **options.get(name, {})) for name in names}
+
+
+def quality_levels(geometry) -> list:
+    """QualityLevels of the use cases from the best to the cheapest, the
+    options of a level are those of create_use_cases()
+
+    The presence angle is computed from fewer beams of its own, then the
+    use cases with a range region of interest stop at half the range, from
+    their default start bin. People count and posture take the new region
+    in place and keep their averages; the other use cases are created
+    again with new options, so fall detection keeps its options at every
+    level (a new FallDetectionAlgo would drop a raised alert).
+    """
+    from helpers.fft_spectrum import default_roi_bins
+    from helpers.quality import QualityLevel
+    half_stop = geometry.range_bins(None, geometry.range_axis_m[-1] / 2).stop
+    roi = default_roi_bins(geometry.num_samples)
+    half_range = {"range_bins": slice(roi.start, min(roi.stop, half_stop))}
+    return [
+        QualityLevel("full"),
+        QualityLevel("beams_40", presence={"num_beams": 40}),
+        QualityLevel("beams_27", presence={"num_beams": 27}),
+        QualityLevel("half_range", presence={"range_bins": slice(0, half_stop), "num_beams": 27},
+                     people_count=half_range, posture=half_range),
+    ]
+
+
+def shared_products(config, geometry) -> list:
+    """Pipeline stages of the products the use cases share: range FFT of all
+    antennas, range-Doppler maps and the 80 beams over +-60 degrees
+
+    The products are written into the same buffers every frame, a stage
+    that keeps one beyond its frame has to copy it.
+    """
+    num_rx_antennas = geometry.num_rx_antennas
+    num_samples, num_chirps = config.chirp.num_samples, config.num_chirps
+    doppler = DopplerAlgo(num_samples, num_chirps, num_rx_antennas)
+    beamformer = DigitalBeamForming(num_rx_antennas, num_beams=80, max_angle_degrees=60)
+    workspace = Workspace()
+
+    def compute_range_fft(frame):
+        range_fft = workspace.get("range_fft", (num_rx_antennas, num_chirps, num_samples), complex)
+        return fft_spectrum(frame, geometry.range_window, out=range_fft, workspace=workspace)
+
+    def compute_rd_maps(frame):
+        rd_maps = workspace.get("rd_maps", (num_samples, 2 * num_chirps, num_rx_antennas), complex)
+        for i_ant in range(num_rx_antennas):
+            doppler.compute_doppler_map(frame[i_ant, :, :], i_ant, out=rd_maps[:, :, i_ant])
+        return rd_maps
+
+    def compute_beams(rd_maps):
+        beams = workspace.get("beams", rd_maps.shape[:2] + (80,), complex)
+        return beamformer.run(rd_maps, out=beams)
+
+    return [Stage("range_fft", compute_range_fft, ["frame"], ["range_fft"]),
+            Stage("rd_maps", compute_rd_maps, ["frame"], ["rd_maps"]),
+            Stage("beams", compute_beams, ["rd_maps"], ["beams"])]
+
+
+def use_case_stage(name, use_case, callback) -> Stage:
+    """Pipeline stage running a use case on the shared products
+
+    callback(name, frame_number, results) is called with the results of
+    every frame, from a pipeline thread.
+    """
+    names = list(use_case.inputs)
+    inputs = ["frame_number", "frame"] + names
+
+    def run(frame_number, frame, *products):
+        callback(name, frame_number, use_case.process(frame, **dict(zip(names, products))))
+    return Stage(name, run, inputs)
+
+
+def json_default(value):
+    # json.dumps default= for the NumPy values in the results
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+# Minimal WebSocket (RFC 6455) support on top of asyncio streams, enough for
+# the local detection service: handshake, text / binary messages, ping and
+# close. Fragmented messages and extensions are not supported.
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# close code of a message over the size limit of the receiver
+CLOSE_TOO_BIG = 1009
+
+# largest frame the server accepts from a client, clients only send
+# control frames and small requests
+MAX_CLIENT_FRAME_SIZE = 4096
+
+
+class ConnectionClosed(Exception):
+    pass
+
+
+class FrameTooBig(Exception):
+    pass
+
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+
+
+def apply_mask(payload: bytes, key: bytes) -> bytes:
+    # XOR with the 4 byte key repeated over the payload, masking and
+    # unmasking are the same
+    data = np.frombuffer(payload, dtype=np.uint8)
+    return np.bitwise_xor(data, np.resize(np.frombuffer(key, dtype=np.uint8), len(data))).tobytes()
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool = False) -> bytes:
+    # a single, final frame; clients have to mask, servers must not
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < (1 << 16):
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader, max_size: int = None):
+    # returns (opcode, payload) of the next frame, raises FrameTooBig for a
+    # payload over max_size before reading it
+    try:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length, = struct.unpack("!H", await reader.readexactly(2))
+        elif length == 127:
+            length, = struct.unpack("!Q", await reader.readexactly(8))
+        if max_size is not None and length > max_size:
+            raise FrameTooBig(f"frame of {length} bytes, the limit is {max_size}")
+        key = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        raise ConnectionClosed()
+
+    if key:
+        payload = apply_mask(payload, key)
+    return first & 0x0F, payload
+
+
+class WebSocket:
+    """An open WebSocket connection"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client: bool = False,
+                 max_size: int = None):
+        # max_size: largest frame accepted from the peer, the connection is
+        #           closed with code 1009 on a larger one; no limit if None
+        self.reader = reader
+        self.writer = writer
+        self.client = client
+        self.max_size = max_size
+        self.closed = False
+
+    async def send(self, message):
+        # str is sent as text, bytes as binary message
+        if self.closed:
+            raise ConnectionClosed()
+        if isinstance(message, str):
+            frame = encode_frame(OP_TEXT, message.encode(), self.client)
+        else:
+            frame = encode_frame(OP_BINARY, message, self.client)
+        try:
+            self.writer.write(frame)
+            await self.writer.drain()
+        except ConnectionError:
+            self.closed = True
+            raise ConnectionClosed()
+
+    async def recv(self):
+        # next text / binary message, answers pings, raises ConnectionClosed
+        while True:
+            try:
+                opcode, payload = await read_frame(self.reader, self.max_size)
+            except FrameTooBig:
+                await self.close(CLOSE_TOO_BIG)
+                raise ConnectionClosed()
+            if opcode == OP_TEXT:
+                return payload.decode()
+            if opcode == OP_BINARY:
+                return payload
+            if opcode == OP_PING:
+                self.writer.write(encode_frame(OP_PONG, payload, self.client))
+            elif opcode == OP_CLOSE:
+                await self.close()
+                raise ConnectionClosed()
+
+    async def close(self, code: int = None):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            payload = b"" if code is None else struct.pack("!H", code)
+            self.writer.write(encode_frame(OP_CLOSE, payload, self.client))
+            await self.writer.drain()
+            self.writer.close()
+        except ConnectionError:
+            pass
+
+
+async def server_handshake(reader, writer, headers: dict) -> WebSocket:
+    """Accept a WebSocket upgrade request whose headers were already read,
+    answers 400 and returns None if the request has no key"""
+    key = headers.get("sec-websocket-key")
+    if not key:
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+        return None
+    writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                  "Upgrade: websocket\r\n"
+                  "Connection: Upgrade\r\n"
+                  f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode())
+    await writer.drain()
+    return WebSocket(reader, writer, max_size=MAX_CLIENT_FRAME_SIZE)
+
+
+async def connect(host: str, port: int, path: str) -> WebSocket:
+    """Open a client connection to ws://host:port/path"""
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f"GET {path} HTTP/1.1\r\n"
+                  f"Host: {host}:{port}\r\n"
+                  "Upgrade: websocket\r\n"
+                  "Connection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\n"
+                  "Sec-WebSocket-Version: 13\r\n\r\n").encode())
+    await writer.drain()
+
+    status = await reader.readline()
+    if b" 101 " not in status:
+        raise ConnectionError(f"WebSocket upgrade refused: {status.decode().strip()}")
+    while (await reader.readline()).strip():
+        pass
+    return WebSocket(reader, writer, client=True)
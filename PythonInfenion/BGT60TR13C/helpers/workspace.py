@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class Workspace:
+    """Preallocated buffers for the intermediate results of a processing chain
+
+    A buffer is allocated the first time it is asked for and returned again
+    on every later call with the same name, shape and dtype, so once the
+    first frame has been processed the chain allocates no more arrays.
+    A workspace belongs to a single configuration; threads may share it as
+    long as every buffer is used by one thread at a time.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, name: str, shape: tuple, dtype=float) -> np.ndarray:
+        """Buffer 'name', its content is whatever was written last"""
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self.buffers[name] = np.empty(shape, dtype)
+        return buffer
+
+    def zeros(self, name: str, shape: tuple, dtype=float) -> np.ndarray:
+        """Buffer 'name', zeroed when allocated only: for zero padding,
+        where the padded part is never written"""
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self.buffers[name] = np.zeros(shape, dtype)
+        return buffer
+
+    def broadcast(self, name: str, array: np.ndarray, shape: tuple) -> np.ndarray:
+        """Contiguous copy of 'array' broadcast to 'shape', made again only
+        when the shape or the array changes: element-wise operations on
+        arrays of the same shape run without the buffers NumPy allocates
+        for broadcasting"""
+        entry = self.buffers.get(name)
+        if entry is None or entry[0] is not array or entry[1].shape != shape:
+            entry = self.buffers[name] = (array, np.ascontiguousarray(np.broadcast_to(array, shape)))
+        return entry[1]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry[1].nbytes if isinstance(entry, tuple) else entry.nbytes for entry in self.buffers.values())
@@ -0,0 +1,43 @@
+import argparse
+import os
+import time
+
+from helpers.recording import INDEX_FILE, Session, find_sessions
+from helpers.session_index import build_index
+
+# Builds the index (helpers.session_index) of recorded sessions that have
+# none, e.g. recorded before it existed, or of all sessions with --force,
+# and reports how much of every session is idle.
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Builds the timestamp and motion index of recorded sessions''')
+    parser.add_argument('input', help="recorded session, or directory with recorded sessions")
+    parser.add_argument('--force', action='store_true', help="build the index again for sessions that have one")
+    parser.add_argument('-m', '--margin', type=int, default=1,
+                        help="seconds kept around motion when counting idle time, default 1")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+
+    sessions = find_sessions(args.input)
+    if not sessions:
+        raise SystemExit(f"No sessions found in {args.input}")
+
+    for path in sessions:
+        session = Session(path)
+        index_path = os.path.join(path, INDEX_FILE)
+        start = time.perf_counter()
+        if args.force or not os.path.isfile(index_path):
+            build_index(session).save(index_path)
+            action = f"built in {time.perf_counter() - start:.1f}s"
+        else:
+            action = "exists"
+
+        index = session.index
+        active = index.active_seconds(margin_s=args.margin)
+        num_active_frames = len(index.active_frames(margin_s=args.margin))
+        print(f"{session.name}: index {action}, {index.num_seconds}s, {active.sum()}s with motion, "
+              f"{len(session) - num_active_frames} of {len(session)} frames idle")
@@ -1,3 +1,5 @@
+import argparse
+import os
 import sys
 import time
 import numpy as np
@@ -5,12 +7,27 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout
 from PyQt5.QtCore import Qt, QObject, pyqtSignal
 from PyQt5.QtGui import QFont
 from helpers.DopplerAlgo import *
+from helpers.GestureDetectionAlgo import GestureDetectionAlgo
+from helpers.DigitalBeamForming import DigitalBeamForming
+from helpers import profiling
+from helpers.fft_spectrum import default_roi_bins, fft_spectrum
+from helpers.pipeline import FramePipeline, Stage
+from helpers.quality import QualityController, QualityLevel
+from helpers.signal_coalescer import SignalCoalescer
+from helpers.usecases import range_options
+from helpers.workspace import Workspace
 from radar_data_acquisition import initialize_radar, get_radar_data
-import threading
-from Fall_Detection_Usecase import FallDetectionAlgo
-from People_Count_Usecase import PresenceAlgo
-from Posture_Detection_Usecase import PostureDetectionAlgo
-from Presence_Detection_Usecase import run_presence_detection
+from helpers.FallDetectionAlgo import FallDetectionAlgo
+from helpers.PresenceAlgo import PresenceAlgo
+from helpers.PostureDetectionAlgo import PostureDetectionAlgo
+
+# Quality levels of the GUI pipeline: while frames overrun the frame
+# repetition time, the radar maps are updated every few frames only
+QUALITY_LEVELS = [
+    QualityLevel("full"),
+    QualityLevel("maps_every_2", maps_every=2),
+    QualityLevel("maps_every_4", maps_every=4),
+]
 
 class RadarSignals(QObject):
     update_fall = pyqtSignal(bool)
@@ -18,37 +35,6 @@ class RadarSignals(QObject):
     update_gesture = pyqtSignal(str)
     update_posture = pyqtSignal(str)
     
-class GestureDetectionAlgo:
-    def __init__(self, num_samples, num_chirps, num_rx_antennas):
-        self.num_samples = num_samples
-        self.num_chirps = num_chirps
-        self.num_rx_antennas = num_rx_antennas
-        self.doppler = DopplerAlgo(num_samples, num_chirps, num_rx_antennas)
-
-    def detect_gesture(self, frame_data):
-        detection_occurred = False
-        for i_ant in range(self.num_rx_antennas):
-            if i_ant < frame_data.shape[0]:
-                mat = frame_data[i_ant, :, :]
-                try:
-                    dfft_dbfs = linear_to_dB(self.doppler.compute_doppler_map(mat, i_ant))
-                    if np.any(dfft_dbfs > -59):
-                        detection_occurred = True
-                        break
-                except IndexError as e:
-                    print(f"IndexError in compute_doppler_map: {e}")
-                    print(f"Shape of mat: {mat.shape}")
-                    print(f"i_ant: {i_ant}")
-                    continue
-
-        if detection_occurred:
-            return "Gesture detected"
-        else:
-            return "No gesture detected"
-
-def linear_to_dB(x):
-    return 20 * np.log10(abs(x))
-
 class ButtonDock(QDockWidget):
     def __init__(self, title, parent=None):
         super().__init__(title, parent)
@@ -56,8 +42,21 @@ class ButtonDock(QDockWidget):
         self.setMinimumSize(600, 400)  
 
 class RadarGUI(QMainWindow):
-    def __init__(self):
+    def __init__(self, event_store=None, timeseries=None, occupancy_path=None, min_range_m=None, max_range_m=None):
+        # event_store: EventStore that keeps the state transitions of the
+        #              detectors, or None
+        # timeseries:  TimeSeriesStore that gets the presence score, people
+        #              count and activity energy of every frame, or None
+        # occupancy_path: occupancy heatmap (.npz) that gets the range x
+        #              angle energy of every frame while the GUI runs, or None
+        # min_range_m, max_range_m: range region of interest of the posture
+        #              and presence detection (e.g. the extent of the room),
+        #              their default region if None
         super().__init__()
+        self.event_store = event_store
+        self.timeseries = timeseries
+        self.occupancy_path = occupancy_path
+        self.occupancy = None
         self.setWindowTitle("Radar Data Analysis")
         self.setGeometry(600, 500, 800, 600)
     
@@ -109,6 +108,11 @@ class RadarGUI(QMainWindow):
         self.people_count_button.clicked.connect(self.run_people_count)
         button_layout.addWidget(self.people_count_button)
 
+        self.radar_maps_button = QPushButton("Show Radar Maps")
+        self.radar_maps_button.setStyleSheet(button_style + "background-color: #16A085;")
+        self.radar_maps_button.clicked.connect(self.run_radar_maps)
+        button_layout.addWidget(self.radar_maps_button)
+
         self.reset_fall_button = QPushButton("Reset Fall Detection")
         self.reset_fall_button.setStyleSheet(button_style + "background-color: #9B59B6;")
         self.reset_fall_button.clicked.connect(self.reset_fall_flag)
@@ -220,17 +224,35 @@ class RadarGUI(QMainWindow):
 
         self.people_count_dock.setWidget(people_count_widget)
         self.addDockWidget(Qt.BottomDockWidgetArea, self.people_count_dock)
+
+        # Radar maps dock, the viewer is created when it is first shown
+        self.radar_maps_dock = QDockWidget("Radar Maps", self)
+        self.radar_maps_dock.setFeatures(QDockWidget.DockWidgetMovable | QDockWidget.DockWidgetFloatable)
+        self.radar_maps_dock.setMinimumSize(400, 200)
+        self.radar_maps_dock.setStyleSheet("QDockWidget { font-size: 28px; color: white; }")
+        self.addDockWidget(Qt.RightDockWidgetArea, self.radar_maps_dock)
+        self.radar_maps_dock.hide()
         
         initialize_radar()
         self.radar_data = get_radar_data()
 
         self.presence_detection = None
+        self.map_viewer = None
         self.radar_signals = RadarSignals()
         self.radar_signals.update_fall.connect(self.update_fall_detection_status)
         self.radar_signals.update_gesture.connect(self.update_gesture_detection_status)
         self.radar_signals.update_people_count.connect(self.update_people_count_status)
         self.radar_signals.update_posture.connect(self.update_posture_detection_status)
 
+        # the detectors run once per frame, the widgets only need to know
+        # about changes, and not more often than the screen can show them
+        self.coalescers = {
+            "fall": SignalCoalescer(self.radar_signals.update_fall.emit, max_rate_hz=10),
+            "gesture": SignalCoalescer(self.radar_signals.update_gesture.emit, max_rate_hz=10),
+            "people_count": SignalCoalescer(self.radar_signals.update_people_count.emit, max_rate_hz=10),
+            "posture": SignalCoalescer(self.radar_signals.update_posture.emit, max_rate_hz=10),
+        }
+
         self.icons = {
             "standing": "🧍",
             "sitting": "🪑",
@@ -244,19 +266,24 @@ class RadarGUI(QMainWindow):
         self.update_icon_size(100)
 
         # Initializing algorithms
+        geometry = self.radar_data.geometry
+        room = range_options(geometry, {"min_range_m": min_range_m, "max_range_m": max_range_m},
+                             default_roi_bins(geometry.num_samples))
         self.posture_algo = PostureDetectionAlgo(
             self.radar_data.config.chirp.num_samples,
-            self.radar_data.config.num_chirps
+            self.radar_data.config.num_chirps,
+            geometry=geometry,
+            **room
         )
         self.fall_detection_algo = FallDetectionAlgo(
             self.radar_data.config.chirp.num_samples,
             self.radar_data.config.num_chirps,
-            self.radar_data.config.chirp_repetition_time_s,
-            self.radar_data.config.chirp.start_frequency_Hz
+            self.radar_data.geometry
         )
         self.presence_algo = PresenceAlgo(
             self.radar_data.config.chirp.num_samples,
-            self.radar_data.config.num_chirps
+            self.radar_data.config.num_chirps,
+            **room
         )
         num_rx_antennas = bin(self.radar_data.config.chirp.rx_mask).count('1')
         self.gesture_algo = GestureDetectionAlgo(
@@ -273,49 +300,83 @@ class RadarGUI(QMainWindow):
                                    self.radar_data.config.num_chirps, 
                                    num_rx_antennas)
 
+        self._build_pipeline(num_rx_antennas)
+
+    def _build_pipeline(self, num_rx_antennas):
+        # All use cases run as stages of one frame pipeline. The range FFT,
+        # the range-Doppler maps and the beams are shared products, computed
+        # once per frame for all use cases that need them, into buffers that
+        # are reused every frame.
+        self.beamformer = DigitalBeamForming(num_rx_antennas, num_beams=80, max_angle_degrees=60)
+        self.workspace = Workspace()
+
+        self.maps_every = 1
+        self.quality = QualityController(QUALITY_LEVELS, self.radar_data.config.frame_repetition_time_s,
+                                         on_change=self._apply_quality, name="GUI pipeline")
+        self.pipeline = FramePipeline(self.radar_data, quality=self.quality)
+        self.pipeline.add_product(Stage("range_fft", self._compute_range_fft, ["frame"], ["range_fft"]))
+        self.pipeline.add_product(Stage("rd_maps", self._compute_rd_maps, ["frame"], ["rd_maps"]))
+        self.pipeline.add_product(Stage("beams", self._compute_beams, ["rd_maps"], ["beams"]))
+
+        self.pipeline.register("posture", [Stage("posture", self._posture_detection_stage,
+                                                 ["frame_number", "frame", "range_fft", "rd_maps"])])
+        self.pipeline.register("fall", [Stage("fall", self._fall_detection_stage, ["frame_number", "rd_maps"])])
+        self.pipeline.register("people_count", [Stage("people_count", self._people_count_stage,
+                                                      ["frame_number", "range_fft"])])
+        self.pipeline.register("gesture", [Stage("gesture", self._gesture_detection_stage,
+                                                 ["frame_number", "frame", "rd_maps"])])
+        self.pipeline.register("presence", [Stage("presence", self._presence_detection_stage, ["frame_number", "beams"])])
+        self.pipeline.register("maps", [Stage("maps", self._radar_maps_stage, ["frame_number", "rd_maps", "beams"])])
+        if self.occupancy_path:
+            from helpers.occupancy import OccupancyAccumulator
+            if os.path.isfile(self.occupancy_path):
+                self.occupancy = OccupancyAccumulator.load(self.occupancy_path)
+            else:
+                self.occupancy = OccupancyAccumulator(self.radar_data.geometry.range_axis_m,
+                                                      self.radar_data.geometry.angle_axis_deg(80, 60))
+            self.pipeline.register("occupancy", [Stage("occupancy", self._occupancy_stage, ["beams"])])
+            self.pipeline.start("occupancy")
+
+        self.last_gesture_time = 0
+        self.gesture_detected = False
+
+    def _apply_quality(self, level):
+        self.maps_every = level.options.get("maps_every", 1)
+
+    def _compute_range_fft(self, frame):
+        range_fft = self.workspace.get("range_fft", frame.shape, complex)
+        return fft_spectrum(frame, self.radar_data.geometry.range_window, out=range_fft, workspace=self.workspace)
+
+    def _compute_rd_maps(self, frame):
+        num_rx_antennas = frame.shape[0]
+        rd_maps = self.workspace.get("rd_maps", (self.radar_data.config.chirp.num_samples,
+                                                 2 * self.radar_data.config.num_chirps, num_rx_antennas), complex)
+        for i_ant in range(num_rx_antennas):
+            self.doppler.compute_doppler_map(frame[i_ant, :, :], i_ant, out=rd_maps[:, :, i_ant])
+        return rd_maps
+
+    def _compute_beams(self, rd_maps):
+        beams = self.workspace.get("beams", rd_maps.shape[:2] + (80,), complex)
+        return self.beamformer.run(rd_maps, out=beams)
+
     def run_posture_detection(self):
-        thread = threading.Thread(target=self._posture_detection_loop)
-        thread.start()
-
-    def _posture_detection_loop(self):
-        while True:
-            frame = self.radar_data.get_latest_frame()
-            if frame is not None:
-                mat = frame[0, :, :]
-                state = self.posture_algo.posture(mat)
-                
-                if state.presence:
-                    if len(state.peaks) > 0:
-                        peak_idx = state.peaks[0]
-                        max_range_m = self.radar_data.device.metrics_from_sequence(
-                            self.radar_data.device.get_acquisition_sequence().loop.sub_sequence.contents
-                        ).max_range_m
-                        distance = (peak_idx / self.radar_data.config.chirp.num_samples) * max_range_m
-
-                        if distance <= 0.50:
-                            posture = "standing"
-                        elif 0.50 < distance <= 0.70:
-                            posture = "sitting"
-                        elif 0.70 < distance <= 0.90:
-                            posture = "sleeping"
-                    else:
-                        posture = "unknown"
-                else:
-                    posture = "no_presence"
-
-                self.radar_signals.update_posture.emit(posture)
+        self.pipeline.start("posture")
+
+    def _posture_detection_stage(self, frame_number, frame, range_fft, rd_maps):
+        mat = frame[0, :, :]
+        state = self.posture_algo.posture(mat, range_fft[0][:, self.posture_algo.range_bins])
+        posture = self.posture_algo.classify(state, frame, self.radar_data.geometry.max_range_m, rd_maps)
+        self._record_event("posture", posture, frame_number)
+        self.coalescers["posture"].submit(posture, frame_number)
 
     def run_fall_detection(self):
-        thread = threading.Thread(target=self._fall_detection)
-        thread.start()
+        self.pipeline.start("fall")
 
-    def _fall_detection(self):
-        while True:
-            frame = self.radar_data.get_latest_frame()
-            if frame is not None:
-                mat = frame[0, :, :]  
-                fall_detected = self.fall_detection_algo.detect_fall(mat)
-                self.radar_signals.update_fall.emit(fall_detected)
+    def _fall_detection_stage(self, frame_number, rd_maps):
+        fall_detected = self.fall_detection_algo.detect_fall(None, rd_maps[:, :, 0])
+        self._record_event("fall", fall_detected, frame_number)
+        self._add_metric("activity_energy", self.fall_detection_algo.features.energy)
+        self.coalescers["fall"].submit(fall_detected, frame_number)
 
     def update_fall_detection_status(self, fall_detected):
         if fall_detected:
@@ -334,37 +395,65 @@ class RadarGUI(QMainWindow):
 
     def reset_fall_flag(self):
         self.fall_detected_flag = False
+        self.fall_detection_algo.reset()
+        self.coalescers["fall"].reset()
         self.fall_detection_label.setText("Fall Detection: Not Running")
         self.fall_detection_label.setStyleSheet("border: 1px solid black;")
         self.fall_detection_led.setStyleSheet("background-color: grey; border-radius: 10px;")
         self.fall_detection_led_on = False
 
     def run_people_count(self):
-        thread = threading.Thread(target=self._people_count)
-        thread.start()
+        self.pipeline.start("people_count")
 
-    def _people_count(self):
-        while True:
-            frame = self.radar_data.get_latest_frame()
-            if frame is not None:
-                mat = frame[0, :, :] 
-                state = self.presence_algo.presence(mat)
-                self.radar_signals.update_people_count.emit(state.num_persons)
+    def _people_count_stage(self, frame_number, range_fft):
+        state = self.presence_algo.presence(None, range_fft[0][:, self.presence_algo.range_bins])
+        self._record_event("people_count", state.num_persons, frame_number)
+        self._add_metric("presence_score", np.max(state.data))
+        self._add_metric("people_count", state.num_persons)
+        self.coalescers["people_count"].submit(state.num_persons, frame_number)
 
     def run_presence_detection(self):
         if self.presence_detection is None:
+            # the matplotlib Qt canvas is only loaded once the plot is shown
+            from Presence_detection_Usecase import run_presence_detection
             self.presence_detection = run_presence_detection()
             plot = self.presence_detection.initialize_plot()
             self.presence_detection_widget = plot
             self.presence_detection_dock.setWidget(plot)
-            self.presence_detection.signals.update_plot.connect(plot.update_angle)
 
-        thread = threading.Thread(target=self._presence_detection)
-        thread.start()
+        self.pipeline.start("presence")
 
-    def _presence_detection(self):
+    def _presence_detection_stage(self, frame_number, beams):
         if self.presence_detection:
-            self.presence_detection.run_presence_detection()
+            angle_degrees = self.presence_detection.angle_from_beams(beams)
+            self._record_event("presence", angle_degrees, frame_number)
+            self.presence_detection.signals.update_plot.emit(angle_degrees)
+
+    def run_radar_maps(self):
+        if self.map_viewer is None:
+            # pyqtgraph is only loaded once the maps are shown
+            from helpers.map_viewer import MapViewer
+            self.map_viewer = MapViewer(self.radar_data.geometry, num_beams=80, max_angle_degrees=60)
+            self.radar_maps_dock.setWidget(self.map_viewer)
+        self.radar_maps_dock.show()
+
+        self.pipeline.start("maps")
+
+    def _occupancy_stage(self, beams):
+        self.occupancy.add_beams(beams, time.time())
+
+    def _radar_maps_stage(self, frame_number, rd_maps, beams):
+        if self.map_viewer and frame_number % self.maps_every == 0:
+            self.map_viewer.update_maps(frame_number, rd_maps, beams)
+
+    def _record_event(self, name, value, frame_number=None):
+        # from the pipeline threads, the store queues the transitions only
+        if self.event_store is not None:
+            self.event_store.record(name, value, frame_number)
+
+    def _add_metric(self, name, value):
+        if self.timeseries is not None:
+            self.timeseries.add(name, value, time.time())
 
     def update_posture_detection_status(self, status):
         self.posture_icon_label.setText(self.icons.get(status.lower(), self.icons["unknown"]))
@@ -379,35 +468,29 @@ class RadarGUI(QMainWindow):
         self.posture_icon_label.setFont(font)
         
     def run_gesture_detection(self):
-        thread = threading.Thread(target=self._gesture_detection_loop)
-        thread.start()
+        self.pipeline.start("gesture")
 
-    def _gesture_detection_loop(self):
-        last_detection_time = 0
+    def _gesture_detection_stage(self, frame_number, frame_data, rd_maps):
         detection_suppress_time = 1
         display_duration = 5
-        gesture_detected = False
-
-        while True:
-            frame_data = self.radar_data.get_latest_frame()
-            if frame_data is not None:
-                gesture = self.gesture_algo.detect_gesture(frame_data)
-                
-                current_time = time.time()
 
-                if gesture == "Gesture detected":
-                    if current_time - last_detection_time > detection_suppress_time:
-                        print("Gesture detected")
-                        self.radar_signals.update_gesture.emit("Gesture detected")
-                        last_detection_time = current_time
-                        gesture_detected = True
-
-                if gesture_detected and current_time - last_detection_time > display_duration:
-                    print("No gesture detected")
-                    self.radar_signals.update_gesture.emit("No gesture detected")
-                    gesture_detected = False
-
-            time.sleep(0.01)
+        gesture = self.gesture_algo.detect_gesture(frame_data, rd_maps)
+        
+        current_time = time.time()
+
+        if gesture == "Gesture detected":
+            if current_time - self.last_gesture_time > detection_suppress_time:
+                print("Gesture detected")
+                self._record_event("gesture", True, frame_number)
+                self.coalescers["gesture"].submit("Gesture detected", frame_number)
+                self.last_gesture_time = current_time
+                self.gesture_detected = True
+
+        if self.gesture_detected and current_time - self.last_gesture_time > display_duration:
+            print("No gesture detected")
+            self._record_event("gesture", False, frame_number)
+            self.coalescers["gesture"].submit("No gesture detected", frame_number)
+            self.gesture_detected = False
 
     def update_gesture_detection_status(self, gesture):
         self.gesture_detection_label.setText(f"Gesture: {gesture}")
@@ -417,12 +500,63 @@ class RadarGUI(QMainWindow):
             self.gesture_icon_label.setStyleSheet("background-color: yellow; border-radius: 25px;")
 
     def closeEvent(self, event):
+        self.pipeline.stop()
+        for name, coalescer in self.coalescers.items():
+            stats = coalescer.stats()
+            print(f"{name}: {stats['emitted']} of {stats['submitted']} updates emitted, {stats['dropped']} dropped")
         if self.radar_data:
             self.radar_data.stop()
+        if self.event_store is not None:
+            self.event_store.close()
+        if self.timeseries is not None:
+            self.timeseries.close()
+        if self.occupancy is not None:
+            self.occupancy.save(self.occupancy_path)
         event.accept()
 
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Radar data analysis GUI''')
+    parser.add_argument('--metrics-port', type=int,
+                        help="record the processing time of every stage and serve it on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--profile-log', type=float, metavar='SECONDS',
+                        help="print p50, p99 and max of every stage at this interval")
+    parser.add_argument('--db', help="store the state transitions of the detectors in this SQLite event store")
+    parser.add_argument('--timeseries', metavar='DIRECTORY',
+                        help="store presence score, people count and activity energy of every frame in the "
+                             "round-robin tiers of this directory")
+    parser.add_argument('--occupancy', metavar='FILE',
+                        help="sum the range x angle energy of every frame into this occupancy heatmap (.npz), "
+                             "continued if it exists, saved on exit")
+    parser.add_argument('--min-range', type=float, metavar='METRES',
+                        help="closest distance of the posture and presence detection, default past the leakage "
+                             "near the radar")
+    parser.add_argument('--max-range', type=float, metavar='METRES',
+                        help="farthest distance of the posture and presence detection, e.g. the depth of the "
+                             "room, default 3/4 of the maximum range")
+    # the remaining arguments are Qt's
+    args, qt_args = parser.parse_known_args()
+    return args, sys.argv[:1] + qt_args
+
+
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    gui = RadarGUI()
+    args, qt_args = parse_program_arguments()
+    if args.metrics_port or args.profile_log:
+        profiling.enable()
+    if args.metrics_port:
+        profiling.serve_metrics(args.metrics_port)
+    if args.profile_log:
+        profiling.SummaryLogger(args.profile_log).start()
+
+    event_store = None
+    if args.db:
+        from helpers.event_store import EventStore
+        event_store = EventStore(args.db)
+    timeseries = None
+    if args.timeseries:
+        from helpers.timeseries import TimeSeriesStore
+        timeseries = TimeSeriesStore(args.timeseries)
+
+    app = QApplication(qt_args)
+    gui = RadarGUI(event_store, timeseries, args.occupancy, args.min_range, args.max_range)
     gui.show()
     sys.exit(app.exec_())
@@ -0,0 +1,153 @@
+import argparse
+import os
+import time
+
+import matplotlib
+import numpy as np
+
+# Frame-time benchmark of the live plots: a full redraw per frame (what
+# draw() / draw_idle() + flush_events() did before) against the blitting
+# renderer, which only redraws the changing artists. Renders offscreen;
+# the final copy to the screen is not part of the measurement.
+
+
+def measure(update, num_frames):
+    update(0)  # first frame renders the background
+    start = time.perf_counter()
+    for i_frame in range(1, num_frames + 1):
+        update(i_frame)
+    return (time.perf_counter() - start) / num_frames * 1e3
+
+
+def report(name, full_ms, blit_ms):
+    print(f"{name:<22} full redraw {full_ms:7.2f} ms   blit {blit_ms:7.2f} ms   speedup {full_ms / blit_ms:5.1f}x")
+
+
+def benchmark_range_doppler(num_frames, rng):
+    from helpers.range_doppler_map import Draw
+    frames = rng.uniform(-60, 0, (8, 2, 128, 128))
+
+    plot = Draw(max_speed_m_s=2.5, max_range_m=4.8, num_ant=2)
+    plot.draw(frames[0])
+
+    def full(i):
+        plot._draw_next_time(frames[i % len(frames)])
+        plot._fig.canvas.draw()
+    return measure(full, num_frames), measure(lambda i: plot.draw(frames[i % len(frames)]), num_frames)
+
+
+def benchmark_distance_fft(num_frames, rng):
+    from helpers.distance_fft import Draw
+    frames = rng.uniform(0, 1, (8, 3, 96))
+
+    plot = Draw(max_range_m=4.8, num_ant=3, num_samples=128, range_bins=slice(16, 112))
+    plot.draw(frames[0])
+
+    def full(i):
+        plot._draw_next_time(frames[i % len(frames)])
+        plot._fig.canvas.draw()
+    return measure(full, num_frames), measure(lambda i: plot.draw(frames[i % len(frames)]), num_frames)
+
+
+def benchmark_range_angle(num_frames, rng):
+    from helpers.range_angle_map import LivePlot
+    frames = rng.uniform(-60, 0, (8, 128, 27))
+
+    plot = LivePlot(max_angle_degrees=40, max_range_m=4.8)
+    plot.draw(frames[0], "angle=+0 degrees")
+
+    def full(i):
+        plot._draw_next_time(frames[i % len(frames)])
+        plot._ax.set_title(f"angle={i % 80 - 40:+02.0f} degrees")
+        plot._fig.canvas.draw()
+
+    def blit(i):
+        plot.draw(frames[i % len(frames)], f"angle={i % 80 - 40:+02.0f} degrees")
+    return measure(full, num_frames), measure(blit, num_frames)
+
+
+def benchmark_segment_plot(num_frames, rng):
+    # SegmentPlot is a Qt widget, rendered with the offscreen platform
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    from Presence_detection_Usecase import SegmentPlot
+
+    image_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "topviewbkgcomp.jpg")
+    plot = SegmentPlot(60, image_path, start_height=0.13, end_height=0.8785, num_bars=8, margin_ratio=0.13)
+    plot.blitter.is_visible = lambda canvas: True
+    plot.resize(800, 800)
+    angles = rng.uniform(-50, 50, 64)
+
+    def full(i):
+        plot.update_angle(angles[i % len(angles)])
+        plot.shown_segment_idx = None
+        plot.draw()
+
+    def blit(i):
+        # every frame moves the bar, unchanged frames would not render at all
+        plot.shown_segment_idx = None
+        plot.update_angle(angles[i % len(angles)])
+        app.processEvents()
+    return measure(full, num_frames), measure(blit, num_frames)
+
+
+def benchmark_point_cloud(num_frames, rng):
+    # the full redraw is what visualize_3d did before: clear the axes and
+    # scatter all targets collected so far (Radar3DProcessing without history)
+    import matplotlib.pyplot as plt
+    from helpers.point_cloud import PointBuffer, PointCloudRenderer
+    frames = [rng.uniform(-3, 3, (rng.integers(0, 8), 3)) for _ in range(64)]
+
+    fig = plt.figure(figsize=(10, 8))
+    ax = fig.add_subplot(111, projection='3d')
+    all_targets = []
+
+    def full(i):
+        all_targets.append(frames[i % len(frames)])
+        ax.clear()
+        targets = np.vstack(all_targets)
+        ax.scatter(targets[:, 0], targets[:, 1], targets[:, 2], c=targets[:, 0], cmap='viridis', s=10, alpha=0.6)
+        fig.canvas.draw()
+        fig.canvas.flush_events()
+    full_ms = measure(full, num_frames)
+
+    fig = plt.figure(figsize=(10, 8))
+    buffer = PointBuffer(2048)
+    plot = PointCloudRenderer(fig.add_subplot(111, projection='3d'), buffer, max_range_m=4.0, history=100)
+    plot.blitter.is_visible = lambda canvas: True
+
+    def incremental(i):
+        buffer.append(frames[i % len(frames)])
+        plot.update()
+    return full_ms, measure(incremental, num_frames)
+
+
+BENCHMARKS = {
+    "range-Doppler map": benchmark_range_doppler,
+    "range FFT": benchmark_distance_fft,
+    "range-angle map": benchmark_range_angle,
+    "presence segment plot": benchmark_segment_plot,
+    "3D point cloud": benchmark_point_cloud,
+}
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Frame time of the live plots with full redraws against
+                                                    blitting''')
+    parser.add_argument('-n', '--frames', type=int, default=100, help="frames per measurement, default 100")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+    matplotlib.use("Agg")
+    rng = np.random.default_rng(0)
+
+    for name, benchmark in BENCHMARKS.items():
+        try:
+            full_ms, blit_ms = benchmark(args.frames, rng)
+        except ImportError as e:
+            print(f"{name:<22} skipped: {e}")
+            continue
+        report(name, full_ms, blit_ms)
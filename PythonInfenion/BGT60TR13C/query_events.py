@@ -0,0 +1,64 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+from helpers.event_store import query_events
+
+# Lists the events of an event store written by detection_daemon.py --db,
+# e.g. the falls of the last week:
+#
+#   python query_events.py events.db -t fall --value true --since 7d
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_time(text):
+    """Seconds since the epoch of an ISO date and time, or of a duration
+    before now such as 30m, 12h or 7d"""
+    if text[-1:] in DURATION_UNITS:
+        try:
+            return time.time() - float(text[:-1]) * DURATION_UNITS[text[-1]]
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise SystemExit(f"Invalid time: {text}, expected an ISO date or a duration like 7d")
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Lists the events of a detection event store''')
+    parser.add_argument('db', help="SQLite event store")
+    parser.add_argument('-t', '--type', help="only events of this type, e.g. fall")
+    parser.add_argument('--value', help="only events with this state as JSON, e.g. true or 2")
+    parser.add_argument('--since', help="only events since this time, an ISO date or a duration like 7d")
+    parser.add_argument('--until', help="only events before this time, an ISO date or a duration like 1h")
+    parser.add_argument('-n', '--limit', type=int, help="only the latest events")
+    parser.add_argument('--data', action='store_true', help="write the events with their results as JSON lines")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+    value = None
+    if args.value is not None:
+        try:
+            value = json.loads(args.value)
+        except ValueError:
+            # a bare string such as a posture
+            value = args.value
+
+    start = time.perf_counter()
+    events = query_events(args.db, args.type, value, args.since and parse_time(args.since),
+                          args.until and parse_time(args.until), args.limit, args.data)
+    query_ms = (time.perf_counter() - start) * 1e3
+
+    for event in events:
+        if args.data:
+            print(json.dumps(event))
+        else:
+            print(f"{datetime.fromtimestamp(event['time']).isoformat(sep=' ', timespec='seconds')}  "
+                  f"{event['type']:<14} {json.dumps(event['value']):<10} frame {event['frame']}")
+    print(f"{len(events)} events in {query_ms:.1f} ms", file=sys.stderr)
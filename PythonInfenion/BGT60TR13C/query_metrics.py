@@ -0,0 +1,55 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from helpers.timeseries import metrics, query
+from query_events import parse_time
+
+# Reads a metric from the round-robin tiers written by detection_daemon.py
+# --timeseries, e.g. the hourly people count of the last week:
+#
+#   python query_metrics.py metrics people_count --since 7d --points 200
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Reads a metric from round-robin time-series tiers''')
+    parser.add_argument('directory', help="directory of the tiers")
+    parser.add_argument('metric', nargs='?', help="metric to read, lists the stored metrics if omitted")
+    parser.add_argument('--since', default="1h", help="start, an ISO date or a duration like 7d, default 1h")
+    parser.add_argument('--until', help="end, an ISO date or a duration like 1h, default now")
+    parser.add_argument('-p', '--points', type=int, default=2000,
+                        help="most buckets read, selects the tier, default 2000")
+    parser.add_argument('--json', action='store_true', help="write the buckets as JSON lines")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+    names = metrics(args.directory)
+    if args.metric is None:
+        print("\n".join(names))
+        raise SystemExit
+    if args.metric not in names:
+        raise SystemExit(f"Unknown metric: {args.metric}, stored are {', '.join(names)}")
+
+    start = time.perf_counter()
+    result = query(args.directory, args.metric, parse_time(args.since),
+                   parse_time(args.until) if args.until else time.time(), args.points)
+    query_ms = (time.perf_counter() - start) * 1e3
+
+    columns = ["min", "max", "mean", "count"]
+    for i in range(len(result["time"])):
+        if args.json:
+            bucket = {"time": float(result["time"][i])}
+            bucket.update({column: result[column][i].item() for column in columns})
+            print(json.dumps(bucket))
+        else:
+            print(f"{datetime.fromtimestamp(result['time'][i]).isoformat(sep=' ', timespec='seconds')}  "
+                  f"min {result['min'][i]:<10.4g} max {result['max'][i]:<10.4g} mean {result['mean'][i]:<10.4g} "
+                  f"count {result['count'][i]}")
+    print(f"{len(result['time'])} buckets of the {result['tier']} tier in {query_ms:.1f} ms, "
+          f"{np.sum(result['count'])} values", file=sys.stderr)
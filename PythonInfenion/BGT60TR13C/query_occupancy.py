@@ -0,0 +1,65 @@
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from helpers.occupancy import OccupancyAccumulator
+from query_events import parse_time
+
+# Shows where people spent time from the occupancy heatmap written by
+# detection_daemon.py --occupancy: the cells of the range x angle grid with
+# the largest share over a span, today by default, and optionally the map.
+#
+#   python query_occupancy.py occupancy.npz --since 7d --level 1 --plot week.png
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Shows where people spent time from an occupancy heatmap''')
+    parser.add_argument('heatmap', help="occupancy heatmap (.npz)")
+    parser.add_argument('--since', help="start, an ISO date or a duration like 7d, default midnight")
+    parser.add_argument('--until', help="end, an ISO date or a duration like 1h, default now")
+    parser.add_argument('-l', '--level', type=int, default=0,
+                        help="downsample the grid by 2 x 2 cells this many times, default 0")
+    parser.add_argument('-n', '--top', type=int, default=5, help="number of cells listed, default 5")
+    parser.add_argument('--plot', metavar='FILE', help="save the map as an image to this file")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+    since = parse_time(args.since) if args.since else datetime.now().replace(hour=0, minute=0, second=0,
+                                                                             microsecond=0).timestamp()
+    until = parse_time(args.until) if args.until else time.time()
+
+    accumulator = OccupancyAccumulator.load(args.heatmap)
+    start = time.perf_counter()
+    heatmap, num_frames = accumulator.query(since, until, args.level)
+    query_ms = (time.perf_counter() - start) * 1e3
+    ranges_m, angles_deg = accumulator.axes(args.level)
+
+    print(f"{num_frames} frames between {datetime.fromtimestamp(since).isoformat(sep=' ', timespec='seconds')} and "
+          f"{datetime.fromtimestamp(until).isoformat(sep=' ', timespec='seconds')}, {query_ms:.1f} ms")
+    if num_frames:
+        for i_cell in np.argsort(heatmap, axis=None)[::-1][:args.top]:
+            i_range, i_angle = np.unravel_index(i_cell, heatmap.shape)
+            print(f"  range {ranges_m[i_range]:5.2f} m  angle {angles_deg[i_angle]:+6.1f} deg  "
+                  f"{100 * heatmap[i_range, i_angle]:6.3f} %")
+
+    if args.plot:
+        # matplotlib is only needed for the image
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        range_step = ranges_m[1] - ranges_m[0] if len(ranges_m) > 1 else 1.0
+        angle_step = angles_deg[1] - angles_deg[0] if len(angles_deg) > 1 else 1.0
+        figure, axes = plt.subplots()
+        image = axes.imshow(100 * heatmap, origin="lower", aspect="auto", cmap="viridis",
+                            extent=(angles_deg[0], angles_deg[-1] + angle_step, ranges_m[0],
+                                    ranges_m[-1] + range_step))
+        axes.set_xlabel("angle (degrees)")
+        axes.set_ylabel("range (m)")
+        axes.set_title(f"Occupancy, {accumulator.mode}, {num_frames} frames")
+        figure.colorbar(image, label="share (%)")
+        figure.savefig(args.plot)
@@ -1,43 +1,96 @@
 import threading
 import time
-from ifxradarsdk import get_version_full
-from ifxradarsdk.fmcw import DeviceFmcw
-from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwSequenceChirp
+from helpers.RadarGeometry import RadarGeometry
+from helpers.recording import SessionWriter
 
 class RadarDataAcquisition:
     def __init__(self, config):
         self.config = config
         self.device = None
         self.latest_frame = None
+        self.frame_number = 0
         self.running = False
         self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
+        self._geometry = None
+        self.recorder = None
 
     def start(self):
+        # the SDK is imported when a device is opened, so that replaying,
+        # batch processing and the headless tools run without it
+        from ifxradarsdk import get_version_full
+        from ifxradarsdk.fmcw import DeviceFmcw
+
         self.device = DeviceFmcw()
         print(f"Radar SDK Version: {get_version_full()}")
         print("Sensor: " + str(self.device.get_sensor_type()))
 
-        sequence = self.device.create_simple_sequence(self.config)
-        self.device.set_acquisition_sequence(sequence)
+        self.set_config(self.config)
 
         self.running = True
         self.acquisition_thread = threading.Thread(target=self._acquire_data)
         self.acquisition_thread.start()
 
+    def set_config(self, config):
+        # (re)configure the acquisition sequence, invalidates the geometry
+        self.config = config
+        sequence = self.device.create_simple_sequence(config)
+        self.device.set_acquisition_sequence(sequence)
+        self._geometry = None
+
+    @property
+    def geometry(self):
+        # axes, windows and FFT sizes of the active sequence, computed once
+        # per sequence (the device metrics need a round trip to the SDK)
+        if self._geometry is None:
+            chirp_loop = self.device.get_acquisition_sequence().loop.sub_sequence.contents
+            metrics = self.device.metrics_from_sequence(chirp_loop)
+            self._geometry = RadarGeometry.from_config(self.config, max_range_m=metrics.max_range_m)
+        return self._geometry
+
     def _acquire_data(self):
         while self.running:
             frame_contents = self.device.get_next_frame()
+            timestamp = time.time()
             with self.lock:
                 self.latest_frame = frame_contents[0]
+                self.frame_number += 1
+                self.new_frame.notify_all()
+                recorder = self.recorder
+            # outside the lock, the consumers never wait for the recording;
+            # the recorder queues a copy for its writer thread
+            if recorder:
+                recorder.write(frame_contents[0], timestamp)
+
+    def start_recording(self, path):
+        # records all following frames into the session directory 'path'
+        recorder = SessionWriter(path, self.config, self.geometry.max_range_m)
+        with self.lock:
+            self.recorder = recorder
+
+    def stop_recording(self):
+        with self.lock:
+            recorder, self.recorder = self.recorder, None
+        if recorder:
+            recorder.close()
 
     def get_latest_frame(self):
         with self.lock:
             return self.latest_frame
 
+    def wait_for_frame(self, last_frame_number, timeout=None):
+        # waits for a frame newer than last_frame_number, returns the number
+        # and the frame, or last_frame_number and None on timeout
+        with self.lock:
+            if not self.new_frame.wait_for(lambda: self.frame_number != last_frame_number, timeout):
+                return last_frame_number, None
+            return self.frame_number, self.latest_frame
+
     def stop(self):
         self.running = False
         if self.acquisition_thread:
             self.acquisition_thread.join()
+        self.stop_recording()
         if self.device:
             self.device.close()
 
@@ -45,6 +98,8 @@ radar_data = None
 
 def initialize_radar():
     global radar_data
+    from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwSequenceChirp
+
     #Presence_Detection_Usecase and People_Detection_Usecase 
     config = FmcwSimpleSequenceConfig(
         frame_repetition_time_s=0.5,
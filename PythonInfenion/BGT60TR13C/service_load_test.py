@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import json
+import time
+import urllib.request
+
+import numpy as np
+
+from helpers.websocket import ConnectionClosed, connect
+
+# Load test of the detection service: opens many WebSocket subscribers at
+# once, part of them reading slowly or not at all, and reports the delivery
+# latency of the normal clients together with the service statistics. The
+# frame rate of the service must not drop while slow clients are connected.
+
+
+async def subscriber(host, port, path, mode, results, stop):
+    # mode: "fast" reads everything, "slow" sleeps between messages, "stalled"
+    # never reads after connecting
+    try:
+        websocket = await connect(host, port, path)
+    except OSError:
+        results["failed"] += 1
+        return
+    results["connected"] += 1
+
+    try:
+        if mode == "stalled":
+            await stop.wait()
+            return
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            if mode == "fast":
+                results["latencies"].append(time.time() - json.loads(message)["time"])
+            else:
+                await asyncio.sleep(2.0)
+            results["received"] += 1
+    except ConnectionClosed:
+        results["closed"] += 1
+    finally:
+        websocket.writer.close()
+
+
+def get_stats(host, port):
+    with urllib.request.urlopen(f"http://{host}:{port}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+async def run_load_test(args):
+    results = {"connected": 0, "failed": 0, "closed": 0, "received": 0, "latencies": []}
+    stop = asyncio.Event()
+    service_task = None
+    loop = asyncio.get_running_loop()
+
+    if args.session:
+        # service in this process, replaying a session
+        from detection_service import DetectionService
+        from helpers.recording import SessionPlayer
+        try:
+            radar_data = SessionPlayer(args.session, speed=args.speed)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        service = DetectionService(radar_data, args.usecases.split(","), host=args.host, port=args.port,
+                                   map_interval_s=0)
+        started = asyncio.Event()
+        service_task = asyncio.ensure_future(service.serve(started))
+        await started.wait()
+        radar_data.start()
+
+    num_slow = int(args.clients * args.slow)
+    num_stalled = int(args.clients * args.stalled)
+    modes = ["slow"] * num_slow + ["stalled"] * num_stalled + ["fast"] * (args.clients - num_slow - num_stalled)
+    paths = args.paths.split(",")
+
+    start = time.perf_counter()
+    clients = [asyncio.ensure_future(subscriber(args.host, args.port, paths[i % len(paths)], mode, results, stop))
+               for i, mode in enumerate(modes)]
+    await asyncio.sleep(1.0)
+    frames_before = (await loop.run_in_executor(None, get_stats, args.host, args.port))["frames_processed"]
+    measure_start = time.perf_counter()
+
+    await asyncio.sleep(args.duration)
+
+    stats = await loop.run_in_executor(None, get_stats, args.host, args.port)
+    measure_s = time.perf_counter() - measure_start
+    stop.set()
+    await asyncio.gather(*clients)
+    elapsed_s = time.perf_counter() - start
+
+    if service_task:
+        service_task.cancel()
+        await service_task
+        radar_data.stop()
+
+    latencies_ms = np.array(results["latencies"]) * 1e3
+    print(f"Clients: {args.clients} ({args.clients - num_slow - num_stalled} fast, {num_slow} slow, "
+          f"{num_stalled} stalled), {results['connected']} connected, {results['failed']} failed")
+    print(f"Messages received: {results['received']} in {elapsed_s:.1f}s")
+    if len(latencies_ms):
+        print(f"Latency of fast clients: p50 {np.percentile(latencies_ms, 50):.1f} ms, "
+              f"p99 {np.percentile(latencies_ms, 99):.1f} ms, max {latencies_ms.max():.1f} ms")
+    print(f"Service: {(stats['frames_processed'] - frames_before) / measure_s:.1f} frames/s, "
+          f"{stats['messages_sent']} messages sent, {stats['messages_dropped']} dropped, "
+          f"subscribers {stats['subscribers']}")
+    for name, timing in stats["stage_timings_ms"].items():
+        print(f"  {name:<14} mean {timing['mean']:.2f} ms  max {timing['max']:.2f} ms")
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Load test of the detection service with many WebSocket
+                                                    subscribers''')
+    parser.add_argument('--host', default="127.0.0.1", help="service address, default 127.0.0.1")
+    parser.add_argument('-p', '--port', type=int, default=8765, help="service port, default 8765")
+    parser.add_argument('-n', '--clients', type=int, default=500, help="number of subscribers, default 500")
+    parser.add_argument('--slow', type=float, default=0.1, help="fraction of slow readers, default 0.1")
+    parser.add_argument('--stalled', type=float, default=0.1, help="fraction of clients that never read, default 0.1")
+    parser.add_argument('--paths', default="/events,/maps", help="streams to subscribe, default /events,/maps")
+    parser.add_argument('-d', '--duration', type=float, default=20, help="test duration in seconds, default 20")
+    parser.add_argument('--session', help="start the service in this process, replaying the session")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed of --session, default 1.0")
+    parser.add_argument('-u', '--usecases', default="gesture,map", help="use cases of the in-process service")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(run_load_test(parse_program_arguments()))
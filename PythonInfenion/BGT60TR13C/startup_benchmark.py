@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Startup-time benchmark: cold start of the headless detection daemon
+# against main_gui.py. Every run is a fresh interpreter; the time until the
+# detectors are ready is measured inside the process, the total process time
+# outside. Also lists which heavy libraries each entry point loaded. Qt runs
+# with the offscreen platform, no display is needed.
+
+HEAVY_MODULES = ["PyQt5", "matplotlib", "sklearn", "scipy.signal", "scipy", "tkinter", "ifxradarsdk"]
+
+# configuration of radar_data_acquisition.initialize_radar()
+CONFIG = {
+    "frame_repetition_time_s": 0.5, "chirp_repetition_time_s": 0.001, "num_chirps": 64, "tdm_mimo": False,
+    "chirp": {"start_frequency_Hz": 60e9, "end_frequency_Hz": 61.5e9, "sample_rate_Hz": 2e6, "num_samples": 128,
+              "rx_mask": 5, "tx_mask": 1, "tx_power_level": 31, "lp_cutoff_Hz": 500000, "hp_cutoff_Hz": 80000,
+              "if_gain_dB": 33},
+}
+
+DAEMON = '''
+import detection_daemon
+from helpers.RadarGeometry import RadarGeometry
+from helpers.recording import config_from_dict
+from helpers.usecases import create_use_cases
+config = config_from_dict(CONFIG)
+create_use_cases(USE_CASES, config, RadarGeometry.from_config(config, max_range_m=4.8))
+'''
+
+# the window needs the radar, so main_gui is measured up to the point where
+# its modules are loaded and the QApplication exists
+MAIN_GUI = '''
+import main_gui
+app = main_gui.QApplication(["main_gui"])
+'''
+
+RUNNER = '''
+import json, sys, time
+start = time.perf_counter()
+CONFIG = {config}
+USE_CASES = {use_cases}
+try:
+{code}
+    error = None
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+ready_s = time.perf_counter() - start
+heavy = [name for name in {heavy} if name in sys.modules]
+print(json.dumps({{"ready_s": ready_s, "error": error, "modules": heavy}}))
+'''
+
+
+def run_once(code, use_cases):
+    indented = "\n".join("    " + line for line in code.strip().splitlines())
+    script = RUNNER.format(config=repr(CONFIG), use_cases=repr(use_cases), code=indented, heavy=repr(HEAVY_MODULES))
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    process_s = time.perf_counter() - start
+    if result.returncode != 0:
+        return dict(ready_s=np.nan, process_s=process_s, error=result.stderr.strip().splitlines()[-1], modules=[])
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    measurement["process_s"] = process_s
+    return measurement
+
+
+def benchmark(name, code, use_cases, runs):
+    measurements = [run_once(code, use_cases) for _ in range(runs)]
+    ready_ms = np.array([m["ready_s"] for m in measurements]) * 1e3
+    process_ms = np.array([m["process_s"] for m in measurements]) * 1e3
+    last = measurements[-1]
+
+    print(f"{name}:")
+    if last["error"]:
+        print(f"  failed: {last['error']}")
+        return
+    print(f"  ready   median {np.median(ready_ms):7.1f} ms  min {ready_ms.min():7.1f} ms")
+    print(f"  process median {np.median(process_ms):7.1f} ms  min {process_ms.min():7.1f} ms")
+    print(f"  loaded  {', '.join(last['modules']) or 'none of ' + ', '.join(HEAVY_MODULES)}")
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Compares the cold start of detection_daemon.py against
+                                                    main_gui.py''')
+    parser.add_argument('-n', '--runs', type=int, default=10, help="runs per entry point, default 10")
+    parser.add_argument('-u', '--usecases', default="fall,people_count",
+                        help="use cases the daemon creates, default fall,people_count")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+    use_cases = [name.strip() for name in args.usecases.split(",") if name.strip()]
+
+    benchmark("python (empty interpreter)", "pass", use_cases, args.runs)
+    benchmark(f"detection_daemon ({', '.join(use_cases)})", DAEMON, use_cases, args.runs)
+    benchmark("main_gui", MAIN_GUI, use_cases, args.runs)
@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from dsp_benchmark import PROFILES, synthetic_frames
+from helpers.frame_store import ChunkedFrameReader, ChunkedFrameWriter, load_codec
+from helpers.RadarGeometry import RadarGeometry
+from helpers.recording import config_from_dict
+
+# Write and read throughput of the raw frame storage formats: a plain .npy
+# of all frames, the float64 frames.bin of a session and the chunked int16
+# format of helpers.frame_store with every codec and chunk size. Frames are
+# the synthetic frames of dsp_benchmark rounded to the 12-bit ADC like those
+# of the SDK, so the int16 formats store them exactly.
+#
+# Reads come from the page cache unless --cold drops the file from it
+# first (Linux only), which is what a replay of an older recording sees.
+
+
+def adc_frames(profile, num_frames):
+    config = config_from_dict(PROFILES[profile])
+    geometry = RadarGeometry.from_config(config)
+    frames = synthetic_frames(config, geometry, num_frames)
+    return np.clip(np.rint(frames * 4095), 0, 4095) / 4095
+
+
+def drop_cache(path):
+    with open(path, "rb") as f:
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+# -------------------------------------------------
+# Formats
+# -------------------------------------------------
+# Every format has a write(path, frames) that stores the frames one by one
+# as a recording would (or all at once for .npy), and an open(path,
+# num_frames, frame_shape) returning an object indexed by frame number
+
+def write_npy(path, frames):
+    np.save(path, frames)
+
+
+def open_npy(path, num_frames, frame_shape):
+    return np.load(path, mmap_mode="r")
+
+
+def write_raw(path, frames):
+    with open(path, "wb") as f:
+        for frame in frames:
+            f.write(np.ascontiguousarray(frame).tobytes())
+
+
+def open_raw(path, num_frames, frame_shape):
+    return np.memmap(path, dtype=np.float64, mode="r", shape=(num_frames,) + frame_shape)
+
+
+def chunked_format(codec, chunk_frames):
+    def write(path, frames):
+        writer = ChunkedFrameWriter(path, frames.shape[1:], codec=codec, chunk_frames=chunk_frames)
+        for frame in frames:
+            writer.write(frame)
+        writer.close()
+
+    def open_(path, num_frames, frame_shape):
+        return ChunkedFrameReader(path)
+    return write, open_
+
+
+def formats(codecs, chunk_sizes):
+    result = {"npy": (write_npy, open_npy), "raw_float64": (write_raw, open_raw)}
+    for codec in codecs:
+        for chunk_frames in chunk_sizes:
+            result[f"int16_{codec}_{chunk_frames}"] = chunked_format(codec, chunk_frames)
+    return result
+
+
+# -------------------------------------------------
+# Measurement
+# -------------------------------------------------
+def measure(name, write, open_, frames, directory, cold, seed=0):
+    path = os.path.join(directory, name + (".npy" if name == "npy" else ".bin"))
+    num_frames, frame_shape = len(frames), frames.shape[1:]
+    frame_bytes = frames[0].nbytes
+
+    start = time.perf_counter()
+    write(path, frames)
+    write_s = time.perf_counter() - start
+    size = os.path.getsize(path)
+
+    results = {"bytes": size, "bytes_per_frame": size / num_frames,
+               "write_MB_s": num_frames * frame_bytes / write_s / 1e6}
+    order = {"sequential": np.arange(num_frames), "random": np.random.default_rng(seed).permutation(num_frames)}
+    for mode, indices in order.items():
+        if cold:
+            drop_cache(path)
+        start = time.perf_counter()
+        stored = open_(path, num_frames, frame_shape)
+        total = 0.0
+        for i in indices:
+            # touch every sample, a memory map reads on access
+            total += float(np.asarray(stored[i], dtype=np.float64).sum())
+        read_s = time.perf_counter() - start
+        results[f"{mode}_frames_s"] = num_frames / read_s
+        if mode == "sequential":
+            results["exact"] = bool(np.isclose(total, frames.sum()))
+    os.remove(path)
+    return results
+
+
+def parse_program_arguments():
+    parser = argparse.ArgumentParser(description='''Write and read throughput of the raw frame storage formats
+                                                    against plain .npy''')
+    parser.add_argument('-p', '--profile', default="presence",
+                        help="frame shape of this profile out of " + ", ".join(PROFILES) + ", default presence")
+    parser.add_argument('-n', '--frames', type=int, default=512, help="frames written, default 512")
+    parser.add_argument('-c', '--codecs', default="none,zlib,lz4,zstd",
+                        help="comma separated codecs of the chunked format, default none,zlib,lz4,zstd "
+                             "(those not installed are skipped)")
+    parser.add_argument('-k', '--chunk-frames', default="1,16,64",
+                        help="comma separated chunk sizes in frames, default 1,16,64")
+    parser.add_argument('--cold', action='store_true', help="drop the files from the page cache before reading")
+    parser.add_argument('-d', '--directory', help="directory of the files, default a temporary directory")
+    parser.add_argument('-o', '--output', help="write the results to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_program_arguments()
+    if args.profile not in PROFILES:
+        raise SystemExit(f"Unknown profile: {args.profile}")
+    if args.cold and not hasattr(os, "posix_fadvise"):
+        raise SystemExit("--cold needs os.posix_fadvise, which this platform lacks")
+
+    codecs = []
+    for codec in [name.strip() for name in args.codecs.split(",") if name.strip()]:
+        try:
+            load_codec(codec)
+            codecs.append(codec)
+        except ValueError as e:
+            print(f"Skipping codec: {e}")
+    chunk_sizes = [int(size) for size in args.chunk_frames.split(",") if size.strip()]
+
+    frames = adc_frames(args.profile, args.frames)
+    directory = args.directory or tempfile.mkdtemp(prefix="storage_benchmark_")
+    results = {}
+    try:
+        print(f"{args.frames} frames of {frames.shape[1:]}, {frames[0].nbytes / 1e3:.0f} kB as float64\n")
+        print(f"{'format':<20} {'kB/frame':>9} {'ratio':>6} {'write MB/s':>11} {'seq frames/s':>13} "
+              f"{'rand frames/s':>14}")
+        for name, (write, open_) in formats(codecs, chunk_sizes).items():
+            result = results[name] = measure(name, write, open_, frames, directory, args.cold)
+            ratio = results["npy"]["bytes"] / result["bytes"]
+            flag = "" if result["exact"] else "  NOT EXACT"
+            print(f"{name:<20} {result['bytes_per_frame'] / 1e3:9.1f} {ratio:5.1f}x {result['write_MB_s']:11.0f} "
+                  f"{result['sequential_frames_s']:13.0f} {result['random_frames_s']:14.0f}{flag}")
+    finally:
+        if not args.directory:
+            shutil.rmtree(directory)
+
+    if args.output:
+        report = {
+            "meta": {"python": platform.python_version(), "numpy": np.__version__, "profile": args.profile,
+                     "frames": args.frames, "cold": args.cold, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
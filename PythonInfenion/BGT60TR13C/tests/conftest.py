@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules import helpers.* relative to the BGT60TR13C directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
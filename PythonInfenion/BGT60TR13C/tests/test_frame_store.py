@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pytest
+
+from helpers.frame_store import ADC_SCALE, CODECS, ChunkedFrameReader, ChunkedFrameWriter, load_codec
+
+FRAME_SHAPE = (3, 4, 8)
+
+
+def adc_frames(num_frames, seed=0):
+    # normalized samples of the 12-bit ADC, stored exactly
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 4096, size=(num_frames,) + FRAME_SHAPE) * ADC_SCALE
+
+
+def write_frames(path, frames, codec="zlib", chunk_frames=4, close=True):
+    writer = ChunkedFrameWriter(path, FRAME_SHAPE, codec=codec, chunk_frames=chunk_frames)
+    for frame in frames:
+        writer.write(frame)
+    if close:
+        writer.close()
+    else:
+        writer.file.flush()
+    return writer
+
+
+@pytest.mark.parametrize("codec", list(CODECS))
+def test_round_trip(tmp_path, codec):
+    try:
+        load_codec(codec)
+    except ValueError:
+        pytest.skip(f"codec {codec} is not installed")
+    path = os.path.join(tmp_path, "frames.rfc")
+    frames = adc_frames(10)
+    write_frames(path, frames, codec)
+
+    reader = ChunkedFrameReader(path)
+    assert reader.codec == codec
+    assert len(reader) == len(frames)
+    np.testing.assert_allclose(reader[:], frames, rtol=0, atol=1e-12)
+    reader.close()
+
+
+def test_unknown_codec(tmp_path):
+    with pytest.raises(ValueError):
+        ChunkedFrameWriter(os.path.join(tmp_path, "frames.rfc"), FRAME_SHAPE, codec="snappy")
+
+
+def test_clipped_samples_are_counted(tmp_path):
+    path = os.path.join(tmp_path, "frames.rfc")
+    frame = np.zeros(FRAME_SHAPE)
+    frame[0, 0, :2] = [100.0, -100.0]
+    writer = write_frames(path, [frame])
+    assert writer.clipped == 2
+
+    reader = ChunkedFrameReader(path)
+    assert reader[0][0, 0, 0] == pytest.approx(32767 * ADC_SCALE)
+    assert reader[0][0, 0, 1] == pytest.approx(-32768 * ADC_SCALE)
+
+
+def test_unclosed_file_is_read_from_the_chunk_headers(tmp_path):
+    path = os.path.join(tmp_path, "frames.rfc")
+    frames = adc_frames(10)
+    # two full chunks written, two frames still in the writer
+    writer = write_frames(path, frames, chunk_frames=4, close=False)
+
+    reader = ChunkedFrameReader(path)
+    assert len(reader) == 8
+    assert [int(first) for first in reader.index[:, 0]] == [0, 4]
+    np.testing.assert_allclose(reader[:], frames[:8], rtol=0, atol=1e-12)
+    reader.close()
+    writer.file.close()
+
+
+def test_truncated_chunk_is_left_out(tmp_path):
+    path = os.path.join(tmp_path, "frames.rfc")
+    frames = adc_frames(12)
+    writer = write_frames(path, frames, chunk_frames=4, close=False)
+    writer.file.close()
+    # the last chunk was cut off while it was written
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    reader = ChunkedFrameReader(path)
+    assert len(reader) == 8
+    np.testing.assert_allclose(reader[7], frames[7], rtol=0, atol=1e-12)
+
+
+def test_random_access_across_a_partial_last_chunk(tmp_path):
+    path = os.path.join(tmp_path, "frames.rfc")
+    frames = adc_frames(37, seed=1)
+    write_frames(path, frames, chunk_frames=16)
+
+    reader = ChunkedFrameReader(path)
+    assert len(reader) == 37
+    assert len(reader.read_chunk(2)) == 5
+    for index in [36, 0, 33, 15, 16, 32, 1, 35, -1, -37]:
+        np.testing.assert_allclose(reader[index], frames[index], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(reader[14:34], frames[14:34], rtol=0, atol=1e-12)
+    with pytest.raises(IndexError):
+        reader[37]
+    with pytest.raises(IndexError):
+        reader[-38]
@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from helpers.pipeline import FramePipeline, Stage
+
+
+class NoFrames:
+    # radar data without frames, every wait runs into its timeout
+    def wait_for_frame(self, frame_number, timeout=0.5):
+        time.sleep(min(timeout, 0.1))
+        return frame_number, None
+
+
+def pipeline_with(*names):
+    pipeline = FramePipeline(NoFrames())
+    for name in names:
+        pipeline.register(name, [Stage(name, lambda frame: None, ["frame"])])
+    return pipeline
+
+
+def test_shared_products_run_once_per_frame():
+    calls = []
+
+    def double(frame):
+        calls.append(frame)
+        return 2 * frame
+
+    pipeline = FramePipeline(NoFrames())
+    pipeline.add_product(Stage("double", double, ["frame"], ["doubled"]))
+    pipeline.add_product(Stage("unused", lambda frame: 0, ["frame"], ["unused"]))
+    pipeline.register("a", [Stage("a", lambda doubled: doubled + 1, ["doubled"], ["a"])])
+    pipeline.register("b", [Stage("b", lambda doubled: doubled + 2, ["doubled"], ["b"])])
+    pipeline.start("a")
+    pipeline.start("b")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        products = pipeline.run_frame(np.ones(2), executor)
+    pipeline.stop()
+    assert len(calls) == 1
+    assert "unused" not in products
+    np.testing.assert_array_equal(products["a"], [3, 3])
+    np.testing.assert_array_equal(products["b"], [4, 4])
+
+
+def test_start_waits_for_a_pending_stop():
+    pipeline = pipeline_with("a")
+    pipeline.start("a")
+    first = pipeline._thread
+
+    stopper = threading.Thread(target=pipeline.stop)
+    stopper.start()
+    time.sleep(0.02)
+    # stop() joins the thread of the first run, which waits for a frame
+    pipeline.start("a")
+    stopper.join(timeout=2)
+    assert not stopper.is_alive()
+    assert not first.is_alive()
+    assert pipeline._thread is not first and pipeline._thread.is_alive()
+
+    pipeline.stop()
+    assert pipeline._thread is None
+
+
+def test_stop_from_the_pipeline_thread_shuts_down_the_executor():
+    pipeline = pipeline_with("a")
+    stopped = threading.Event()
+    run = {}
+
+    class Quality:
+        def update(self, elapsed):
+            run.update(executor=pipeline._executor, thread=pipeline._thread)
+            pipeline.stop()
+            stopped.set()
+
+    class OneFrame(NoFrames):
+        def wait_for_frame(self, frame_number, timeout=0.5):
+            if frame_number == 0:
+                return 1, np.zeros(2)
+            return super().wait_for_frame(frame_number, timeout)
+
+    pipeline.radar_data = OneFrame()
+    pipeline.quality = Quality()
+    pipeline.start("a")
+    assert stopped.wait(2)
+    run["thread"].join(timeout=2)
+    assert not run["thread"].is_alive()
+    assert run["executor"]._shutdown
+
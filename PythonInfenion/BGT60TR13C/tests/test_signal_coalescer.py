@@ -0,0 +1,70 @@
+import time
+
+from helpers.signal_coalescer import SignalCoalescer
+
+
+def coalescer(max_rate_hz=10.0):
+    emitted = []
+    return SignalCoalescer(emitted.append, max_rate_hz), emitted
+
+
+def test_first_value_is_emitted_immediately():
+    signal, emitted = coalescer()
+    signal.submit("standing", 1)
+    assert emitted == ["standing"]
+
+
+def test_unchanged_values_and_repeated_frames_are_dropped():
+    signal, emitted = coalescer(max_rate_hz=0)
+    signal.submit("standing", 1)
+    signal.submit("standing", 2)
+    signal.submit("sitting", 2)
+    assert emitted == ["standing"]
+    assert signal.stats() == {"submitted": 3, "emitted": 1, "dropped": 2}
+
+
+def test_changes_are_emitted_without_rate_limit():
+    signal, emitted = coalescer(max_rate_hz=0)
+    for frame_number, value in enumerate(["a", "b", "a", "c"]):
+        signal.submit(value, frame_number)
+    assert emitted == ["a", "b", "a", "c"]
+
+
+def test_fast_changes_are_held_back_and_the_latest_is_flushed():
+    signal, emitted = coalescer(max_rate_hz=1)
+    signal.submit(1, 1)
+    signal.submit(2, 2)
+    signal.submit(3, 3)
+    assert emitted == [1]
+    signal.flush()
+    assert emitted == [1, 3]
+    assert signal.stats()["dropped"] == 1
+
+
+def test_held_back_value_is_emitted_by_the_timer():
+    signal, emitted = coalescer(max_rate_hz=20)
+    signal.submit(1, 1)
+    signal.submit(2, 2)
+    assert emitted == [1]
+    deadline = time.monotonic() + 2.0
+    while len(emitted) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert emitted == [1, 2]
+
+
+def test_return_to_the_shown_value_cancels_the_held_back_change():
+    signal, emitted = coalescer(max_rate_hz=20)
+    signal.submit(1, 1)
+    signal.submit(2, 2)
+    signal.submit(1, 3)
+    time.sleep(0.2)
+    signal.flush()
+    assert emitted == [1]
+
+
+def test_reset_emits_the_next_value_again():
+    signal, emitted = coalescer(max_rate_hz=0)
+    signal.submit("no_fall", 1)
+    signal.reset()
+    signal.submit("no_fall", 1)
+    assert emitted == ["no_fall", "no_fall"]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from helpers.sliding_window import SlidingStats
+
+
+def test_empty_window():
+    stats = SlidingStats(4)
+    assert stats.mean() == 0.0
+    assert stats.variance() == 0.0
+    assert not stats.is_full()
+
+
+def test_matches_numpy_over_the_last_values():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=50)
+    stats = SlidingStats(8)
+    for i, value in enumerate(values):
+        stats.push(value)
+        window = values[max(0, i - 7):i + 1]
+        assert stats.mean() == pytest.approx(window.mean())
+        assert stats.variance() == pytest.approx(window.var(), abs=1e-12)
+        assert stats.is_full() == (i >= 7)
+
+
+def test_no_rounding_error_left_by_large_values():
+    # the sums are recomputed once per window, so large values that left the
+    # window leave no rounding error behind in the statistics of small ones
+    rng = np.random.default_rng(1)
+    values = np.concatenate([1e8 + rng.normal(size=1000), rng.normal(size=37)])
+    stats = SlidingStats(16)
+    for value in values:
+        stats.push(value)
+    assert stats.mean() == pytest.approx(values[-16:].mean(), rel=1e-9)
+    assert stats.variance() == pytest.approx(values[-16:].var(), rel=1e-9)
+
+
+def test_reset_forgets_all_values():
+    stats = SlidingStats(3)
+    for value in [1.0, 2.0, 3.0]:
+        stats.push(value)
+    stats.reset()
+    stats.push(5.0)
+    assert stats.count == 1
+    assert stats.mean() == 5.0
+    assert stats.variance() == 0.0
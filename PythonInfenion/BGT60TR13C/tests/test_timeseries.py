@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from helpers.timeseries import Tier, TimeSeriesStore, metrics, query
+
+# small tiers: 100 s of 1 s buckets, 1000 s of 10 s, 10000 s of 100 s
+TIERS = [Tier("1s", 1, 100), Tier("10s", 10, 100), Tier("100s", 100, 100)]
+T0 = 1_000_000.0
+
+
+@pytest.fixture
+def directory(tmp_path):
+    # a value every 0.5 s for 300 s: frame i has the value i
+    store = TimeSeriesStore(str(tmp_path), TIERS)
+    for i in range(600):
+        store.add("people_count", i, T0 + 0.5 * i)
+    store.close()
+    return str(tmp_path)
+
+
+def test_metrics_are_listed(directory):
+    assert metrics(directory) == ["people_count"]
+
+
+def test_finest_tier_within_retention(directory):
+    result = query(directory, "people_count", T0 + 250, T0 + 299, tiers=TIERS)
+    assert result["tier"] == "1s"
+    assert len(result["time"]) == 50
+    assert result["time"][0] == T0 + 250
+    assert list(result["count"]) == [2] * 50
+    # values 500 and 501 in the first bucket
+    assert (result["min"][0], result["max"][0], result["mean"][0]) == (500, 501, 500.5)
+
+
+def test_span_over_max_points_uses_a_coarser_tier(directory):
+    result = query(directory, "people_count", T0 + 250, T0 + 299, max_points=10, tiers=TIERS)
+    assert result["tier"] == "10s"
+    assert len(result["time"]) == 5
+    assert list(result["count"]) == [20] * 5
+
+
+def test_start_older_than_the_ring_uses_a_coarser_tier(directory):
+    # fits into 100 buckets, but the 1 s buckets of that time are overwritten
+    result = query(directory, "people_count", T0 + 100, T0 + 150, tiers=TIERS)
+    assert result["tier"] == "10s"
+    assert result["time"][0] == T0 + 100
+    assert result["count"].sum() == 6 * 20
+    assert result["min"][0] == 200
+
+
+def test_whole_recording(directory):
+    result = query(directory, "people_count", T0, T0 + 299.5, tiers=TIERS)
+    assert result["tier"] == "10s"
+    assert result["count"].sum() == 600
+    assert np.sum(result["mean"] * result["count"]) == pytest.approx(np.sum(np.arange(600)))
+
+
+def test_coarsest_tier_beyond_all_retention(directory):
+    result = query(directory, "people_count", T0 - 1e6, T0 + 299.5, tiers=TIERS)
+    assert result["tier"] == "100s"
+    assert result["count"].sum() == 600
+
+
+def test_empty_span(directory):
+    result = query(directory, "people_count", T0 + 1000, T0 + 1010, tiers=TIERS)
+    assert len(result["time"]) == 0
+
+
+def test_nan_is_skipped_and_buckets_continue_after_a_restart(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), TIERS)
+    store.add("presence_score", 1.0, T0)
+    store.add("presence_score", float("nan"), T0 + 0.1)
+    store.close()
+    store = TimeSeriesStore(str(tmp_path), TIERS)
+    store.add("presence_score", 3.0, T0 + 0.5)
+    store.close()
+
+    result = query(str(tmp_path), "presence_score", T0, T0 + 1, tiers=TIERS)
+    assert list(result["count"]) == [2]
+    assert (result["min"][0], result["max"][0], result["mean"][0]) == (1.0, 3.0, 2.0)